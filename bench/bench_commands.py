@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_commands.py — стоимость выбора хендлера: цепочка фильтров aiogram против таблицы CommandRouter
+Роутеры с --commands командами (хендлеры пустые, сеть не нужна), апдейты уже разобраны и привязаны к боту.
+Два замера: Dispatcher.feed_update целиком (с middleware aiogram: FSM, контекст пользователя) и только
+выбор хендлера — router.propagate_event("message", ...):
+  • F.text       — как было в handlers.py: F.text == "/cmd" / F.text.startswith("/cmd ") на каждую команду
+  • Command      — как было в extras_commands.py (удалён): Command("cmd") на каждую команду
+  • table        — command_router.CommandRouter: один разбор текста + dict
+Смесь апдейтов: команды (равномерно, часть с @bot и аргументами), обычный текст --text-share, геопозиция --geo-share.
+Проверяется, что таблица выбирает те же хендлеры, что и фильтры.
+Запуск: python bench/bench_commands.py [--commands 60] [--updates 20000] [--text-share 0.3] [--geo-share 0.1]
+"""
+import os, sys, argparse, asyncio, random, time
+from collections import Counter
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.filters import Command
+from aiogram.types import Update, User
+from foody_bot.command_router import CommandRouter
+from foody_bot import logs
+
+BOT_USERNAME = "bench_bot"
+
+def make_handler(name: str, hits: Counter):
+    async def handler(m):
+        hits[name] += 1
+    handler.__name__ = name
+    return handler
+
+def build(kind: str, names: list[str], hits: Counter) -> Router:
+    router = CommandRouter() if kind == "table" else Router()
+    for name in names:
+        h = make_handler(name, hits)
+        if kind == "table":
+            router.command(name)(h)
+        elif kind == "Command":
+            router.message(Command(name))(h)
+        else:
+            # F.text не знает про @bot — как и было в handlers.py
+            router.message(F.text == f"/{name}")(h)
+            router.message(F.text.startswith(f"/{name} "))(h)
+    router.message(F.location)(make_handler("location", hits))
+    return router
+
+def make_updates(a, names: list[str], bot: Bot) -> list[Update]:
+    rnd = random.Random(a.seed)
+    out = []
+    for i in range(a.updates):
+        msg = {"message_id": i, "date": 0, "chat": {"id": i % 1000, "type": "private"},
+               "from": {"id": i % 1000, "is_bot": False, "first_name": "U"}}
+        r = rnd.random()
+        if r < a.geo_share:
+            msg["location"] = {"latitude": 55.75, "longitude": 37.62}
+        elif r < a.geo_share + a.text_share:
+            msg["text"] = rnd.choice(["привет", "сколько стоит?", "спасибо", "где забрать заказ"])
+        else:
+            name = rnd.choice(names)
+            form = rnd.random()
+            msg["text"] = f"/{name}" if form < 0.6 else f"/{name} arg{i}" if form < 0.85 else f"/{name}@{BOT_USERNAME}"
+        out.append(Update.model_validate({"update_id": i, "message": msg}, context={"bot": bot}))
+    return out
+
+async def run(kind: str, names, updates, bot) -> tuple[float, float, Counter]:
+    hits: Counter = Counter()
+    dp = Dispatcher()
+    router = build(kind, names, hits)
+    dp.include_router(router)
+    for u in updates[:200]:  # прогрев
+        await dp.feed_update(bot, u)
+    hits.clear()
+    t0 = time.perf_counter()
+    for u in updates:
+        await dp.feed_update(bot, u)
+    full = (time.perf_counter() - t0) / len(updates) * 1e6
+    t0 = time.perf_counter()
+    for u in updates:
+        await router.propagate_event("message", u.message, bot=bot)
+    select = (time.perf_counter() - t0) / len(updates) * 1e6
+    return full, select, hits
+
+async def main(a):
+    logs.setup_logging("plain", "WARNING")  # без строки лога aiogram на каждый апдейт
+    names = [f"cmd{i:02d}" for i in range(a.commands - 5)] + ["start", "offer", "rules", "nearby", "reserve"]
+    bot = Bot("123456:BENCH")
+    bot._me = User(id=123456, is_bot=True, first_name="Bench", username=BOT_USERNAME)  # без getMe по сети
+    updates = make_updates(a, names, bot)
+    print(f"{len(names)} commands, {len(updates)} updates (text {a.text_share:.0%}, geo {a.geo_share:.0%})")
+    results = {}
+    for kind in ("F.text", "Command", "table"):
+        full, select, hits = await run(kind, names, updates, bot)
+        results[kind] = hits
+        print(f"{kind:>8}: feed_update {full:7.1f} µs/update | handler selection {select:7.1f} µs | "
+              f"handled {sum(hits.values()) // 2}")
+    same = results["table"] == results["Command"]
+    print(f"table picks the same handlers as Command filters: {same}")
+    await bot.session.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--commands", type=int, default=60)
+    ap.add_argument("--updates", type=int, default=20000)
+    ap.add_argument("--text-share", type=float, default=0.3)
+    ap.add_argument("--geo-share", type=float, default=0.1)
+    ap.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(ap.parse_args()))
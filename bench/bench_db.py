@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_db.py — db.Repository на SQLite-заглушке: пакетная выборка против запроса на ресторан, размер пула
+База: scripts/seed_demo.sql (через db.seed_sqlite) + синтетика: --restaurants точек по --offers-per офферов.
+Замеры:
+  • офферы для --ids ресторанов: один запрос offers_for_restaurants против N запросов (по одному id, конкурентно через пул)
+  • --concurrency одновременных пакетных выборок при пуле 1 и DB_POOL_MAX соединений
+  • snapshot() — полный снимок для NearbyFeed
+Запуск: python bench/bench_db.py [--restaurants 20000] [--offers-per 3] [--ids 100] [--rounds 50] [--pool 10]
+"""
+import os, sys, argparse, asyncio, random, statistics, tempfile, time, sqlite3
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from foody_bot.db import Repository, SqliteDatabase, seed_sqlite
+
+def build(path: str, a):
+    if os.path.exists(path):
+        os.unlink(path)
+    with open(os.path.join(ROOT, "scripts", "seed_demo.sql"), encoding="utf-8") as f:
+        seed_sqlite(path, f.read())
+    rnd = random.Random(a.seed)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO restaurants VALUES (?, ?, ?, ?)",
+                     [(f"R{i}", f"Точка {i}", rnd.uniform(55.55, 55.95), rnd.uniform(37.35, 37.85))
+                      for i in range(a.restaurants)])
+    conn.executemany("INSERT INTO offers VALUES (?, ?, ?, ?, ?, ?, datetime('now', ?))",
+                     [(f"O{i}-{j}", f"R{i}", "Набор", 30000, 10, rnd.randint(0, 10), f"{rnd.randint(-60, 240):+d} minutes")
+                      for i in range(a.restaurants) for j in range(a.offers_per)])
+    conn.commit()
+    conn.close()
+
+async def timed(coro_fn, rounds: int) -> float:
+    xs = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        await coro_fn()
+        xs.append(time.perf_counter() - t0)
+    return statistics.median(xs) * 1000
+
+async def main(a):
+    path = os.path.join(tempfile.gettempdir(), "foody-bench-db.sqlite")
+    build(path, a)
+    rnd = random.Random(a.seed + 1)
+    ids = lambda: [f"R{rnd.randrange(a.restaurants)}" for _ in range(a.ids)]
+    print(f"restaurants={a.restaurants} offers={a.restaurants * a.offers_per} ids per request={a.ids}")
+
+    for pool in (1, a.pool):
+        repo = Repository(SqliteDatabase(path, pool))
+        await repo.connect()
+        bulk = await timed(lambda: repo.offers_for_restaurants(ids()), a.rounds)
+        per_id = await timed(lambda: asyncio.gather(*(repo.offers_for_restaurants([rid]) for rid in ids())), a.rounds)
+        conc = await timed(lambda: asyncio.gather(*(repo.offers_for_restaurants(ids()) for _ in range(a.concurrency))),
+                           max(1, a.rounds // 5))
+        snap = await timed(repo.snapshot, 3)
+        print(f"pool={pool:>2}: bulk {bulk:7.2f} ms | per-id x{a.ids} {per_id:8.2f} ms | "
+              f"{a.concurrency} concurrent bulk {conc:8.2f} ms | snapshot {snap:7.1f} ms | {repo.stats()}")
+        await repo.close()
+    os.unlink(path)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--restaurants", type=int, default=20000)
+    ap.add_argument("--offers-per", type=int, default=3)
+    ap.add_argument("--ids", type=int, default=100)
+    ap.add_argument("--rounds", type=int, default=50)
+    ap.add_argument("--concurrency", type=int, default=20)
+    ap.add_argument("--pool", type=int, default=10)
+    ap.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(ap.parse_args()))
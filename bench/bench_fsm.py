@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_fsm.py — память и скорость хранилища FSM: MemoryStorage aiogram против fsm_storage.BoundedStorage
+--users пользователей (личные чаты) получают состояние, доля --data-share — ещё и данные (rid, выбранный оффер);
+память — tracemalloc после заполнения, в пересчёте на 1M пользователей. Затем:
+  • get_state (как FSM middleware на каждом апдейте): попадания и промахи (пользователь без состояния)
+  • предел памяти: BoundedStorage с --cap-mb — сколько записей осталось и реальный размер против оценки
+  • журнал: сжатый снимок на диске и время проигрывания при старте
+Запуск: python bench/bench_fsm.py [--users 1000000] [--data-share 0.2] [--cap-mb 16]
+"""
+import os, sys, argparse, asyncio, gc, tempfile, time, tracemalloc
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from foody_bot.fsm_storage import BoundedStorage
+
+BOT_ID = 123456
+STATES = ("Onboarding:rid", "Onboarding:confirm", "Reserve:qty", "Reserve:confirm")
+
+def key(uid: int) -> StorageKey:
+    return StorageKey(bot_id=BOT_ID, chat_id=uid, user_id=uid)
+
+async def fill(storage, a, users: range):
+    every = round(1 / a.data_share) if a.data_share else 0
+    for uid in users:
+        k = key(uid)
+        await storage.set_state(k, STATES[uid % len(STATES)])
+        if every and uid % every == 0:
+            await storage.set_data(k, {"rid": f"r{uid % 5000}", "offer_id": f"o{uid}", "qty": 1 + uid % 3})
+
+async def measure(make, a) -> tuple[object, float, float]:
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    storage = make()
+    t0 = time.perf_counter()
+    await fill(storage, a, range(10_000_000, 10_000_000 + a.users))
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return storage, used, elapsed
+
+async def get_rate(storage, uids) -> float:
+    keys = [key(u) for u in uids]
+    t0 = time.perf_counter()
+    for k in keys:
+        await storage.get_state(k)
+    return len(keys) / (time.perf_counter() - t0)
+
+async def main(a):
+    per_m = 1_000_000 / a.users
+    print(f"{a.users:,} users, {a.data_share:.0%} with data")
+    results = {}
+    for name, make in (("MemoryStorage", MemoryStorage),
+                       ("BoundedStorage", lambda: BoundedStorage(BOT_ID, max_mb=4096, path=""))):
+        storage, used, elapsed = await measure(make, a)
+        hits = range(10_000_000, 10_000_000 + min(a.users, 200_000))
+        misses = range(1, 200_001)
+        print(f"{name:>15}: {used / 2**20 * per_m:7.1f} MB per 1M users ({used / a.users:5.0f} B/user), "
+              f"fill {a.users / elapsed:9,.0f} ops/s | get_state hit {await get_rate(storage, hits):9,.0f}/s, "
+              f"miss {await get_rate(storage, misses):9,.0f}/s")
+        results[name] = storage, used
+    bounded, used = results.pop("BoundedStorage")
+    print(f"{'':>15}  size estimate (FSM_MAX_MB is checked against it): {bounded.stats()['mb']} MB, "
+          f"tracemalloc {used / 2**20:.1f} MB")
+    del results, bounded
+    gc.collect()
+
+    capped = BoundedStorage(BOT_ID, max_mb=a.cap_mb, path="")
+    await fill(capped, a, range(10_000_000, 10_000_000 + a.users))
+    st = capped.stats()
+    print(f"cap {a.cap_mb} MB: kept {st['keys']:,} of {a.users:,} users, evicted {st['evicted']:,}, "
+          f"estimate {st['mb']} MB")
+    del capped
+    gc.collect()
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "fsm.jsonl")
+        s = BoundedStorage(BOT_ID, max_mb=4096, path=path)
+        s.restore()
+        await fill(s, a, range(10_000_000, 10_000_000 + a.users))
+        s.log.flush()
+        t0 = time.perf_counter()
+        s.log.compact(s._snapshot())
+        snap = time.perf_counter() - t0
+        size = os.path.getsize(path)
+        del s
+        gc.collect()
+        t0 = time.perf_counter()
+        r = BoundedStorage(BOT_ID, max_mb=4096, path=path)
+        r.restore()
+        print(f"journal: snapshot {size / 2**20:.1f} MB in {snap:.2f}s, restore {r.size:,} users in "
+              f"{time.perf_counter() - t0:.2f}s")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=1_000_000)
+    ap.add_argument("--data-share", type=float, default=0.2)
+    ap.add_argument("--cap-mb", type=float, default=16)
+    asyncio.run(main(ap.parse_args()))
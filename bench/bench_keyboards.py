@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_keyboards.py — микробенчмарк: клавиатура на каждое сообщение vs предсобранная (keyboards.freeze)
+Запуск: python bench/bench_keyboards.py [N]
+Меряет CPU на сборку клавиатуры + SendMessage + form-data и пиковые аллокации (tracemalloc, медиана) на одно сообщение.
+"""
+import os, sys, time, tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import SendMessage
+from aiogram.types import InlineKeyboardButton, WebAppInfo
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from foody_bot.keyboards import freeze, CachedMarkupSession
+
+MERCHANT, BUYER, API = "https://foody-reg.vercel.app", "https://foody-buyer.vercel.app", "https://foodyback-production.up.railway.app"
+
+def build_kb():
+    kb = InlineKeyboardBuilder()
+    kb.row(InlineKeyboardButton(text="👨‍🍳 ЛК партнёра", web_app=WebAppInfo(url=f"{MERCHANT}/?api={API}")))
+    kb.row(InlineKeyboardButton(text="🍽 Для покупателя", web_app=WebAppInfo(url=f"{BUYER}/?api={API}")))
+    kb.row(InlineKeyboardButton(text="📄 Материалы", web_app=WebAppInfo(url=f"{MERCHANT}/docs/index.html")))
+    return kb.as_markup()
+
+def run(n, bot, session, markup_fn):
+    for i in range(n):
+        method = SendMessage(chat_id=i, text="Foody: спасаем еду вместе.\nКоманды: /offer /rules", reply_markup=markup_fn())
+        session.build_form_data(bot=bot, method=method)
+
+def measure(name, n, session, markup_fn):
+    bot = Bot("123:ABC", session=session)
+    run(200, bot, session, markup_fn)  # прогрев (pydantic defer_build и т.п.)
+    t0 = time.perf_counter()
+    run(n, bot, session, markup_fn)
+    dt = time.perf_counter() - t0
+    tracemalloc.start()
+    peaks = []
+    for _ in range(500):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        run(1, bot, session, markup_fn)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    peaks.sort()
+    print(f"{name:<10} {dt / n * 1e6:8.1f} us/msg   peak alloc {peaks[len(peaks) // 2] / 1024:6.1f} KiB/msg")
+    return dt / n
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    frozen = freeze(build_kb())
+    a = measure("per-msg", n, AiohttpSession(), build_kb)
+    b = measure("frozen", n, CachedMarkupSession(), lambda: frozen)
+    print(f"speedup x{a / b:.2f}")
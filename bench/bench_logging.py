@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_logging.py — цена логирования на event loop: BotCore.handle_webhook с разными режимами logs.py
+Режимы: off (WARNING), plain (синхронный StreamHandler), json (очередь + поток), json с LOG_SAMPLE=1%.
+Апдейты — bench/updates.py, обработка inline (хендлер + sendMessage в фейковый Bot API отдельным процессом)
+с заданной конкурентностью; режимы чередуются в случайном порядке по раундам, в таблице — медианы.
+Sink: file — обычный файл; slow — файл с задержкой на каждый write (как stdout-пайп под нагрузкой у коллектора логов).
+Запуск: python bench/bench_logging.py [--updates 3000] [--concurrency 50] [--rounds 3] [--sink slow --write-delay-us 200]
+"""
+import os, sys, argparse, asyncio, random, socket, statistics, subprocess, tempfile, time
+BENCH = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(BENCH), BENCH]
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+os.environ.setdefault("SEND_GLOBAL_RATE", "100000")
+os.environ.setdefault("SEND_GLOBAL_BURST", "100000")
+
+from updates import UpdateGenerator
+from foody_bot import logs
+
+class SlowFile:
+    """Файл, каждый write которого ещё и ждёт delay секунд (блокирующе, как переполненный пайп)."""
+    def __init__(self, f, delay: float):
+        self.f, self.delay = f, delay
+
+    def write(self, s):
+        time.sleep(self.delay)
+        return self.f.write(s)
+
+    def flush(self):
+        self.f.flush()
+
+MODES = (
+    ("off", "plain", "WARNING", 1.0),
+    ("plain", "plain", "INFO", 1.0),
+    ("plain 1%", "plain", "INFO", 0.01),
+    ("json", "json", "INFO", 1.0),
+    ("json 1%", "json", "INFO", 0.01),
+)
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p / 100))] * 1000
+
+async def run(core, gen, a) -> tuple[list, float]:
+    lat = []
+    sem = asyncio.Semaphore(a.concurrency)
+
+    async def one(body):
+        async with sem:
+            t0 = time.perf_counter()
+            await core.handle_webhook(body, None)
+            lat.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(gen.next().body) for _ in range(a.updates)))
+    return lat, time.perf_counter() - t0
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def main(a):
+    # фейковый Bot API — отдельным процессом, чтобы его CPU не смешивался с event loop бота
+    port = free_port()
+    fake = subprocess.Popen([sys.executable, os.path.join(BENCH, "fake_bot_api.py"), "--port", str(port)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ["TELEGRAM_API_BASE"] = f"http://127.0.0.1:{port}"
+    from foody_bot.core import BotCore
+    core = BotCore("webapp", "inline")
+    gen = UpdateGenerator(seed=1)
+    path = os.path.join(tempfile.gettempdir(), "foody-bench-logging.log")
+    res = {name: [] for name, *_ in MODES}
+    quiet = open(os.devnull, "w")  # между замерами (и на прогреве с битым JSON) лог не нужен
+    try:
+        logs.setup_logging("plain", "WARNING", stream=quiet)
+        while True:
+            try:
+                await core.startup()
+                break
+            except Exception:
+                await asyncio.sleep(0.2)
+        await run(core, gen, a)  # прогрев
+        # режимы чередуются по раундам — дрейф машины не приписывается одному режиму
+        for _ in range(a.rounds):
+            for name, mode, level, sample in random.sample(MODES, len(MODES)):
+                with open(path, "w") as f:
+                    stream = SlowFile(f, a.write_delay_us / 1e6) if a.sink == "slow" else f
+                    logs.setup_logging(mode, level, stream=stream, sample=sample)
+                    lat, total = await run(core, gen, a)
+                    dropped = logs.stats()["dropped"]
+                    logs.stop_logging()  # дописываем очередь до подсчёта строк
+                    logs.setup_logging("plain", "WARNING", stream=quiet)
+                res[name].append((a.updates / total, pct(lat, 50), pct(lat, 99), sum(1 for _ in open(path)), dropped))
+    finally:
+        await core.shutdown()
+        fake.terminate()
+        if os.path.exists(path):
+            os.unlink(path)
+    print(f"sink={a.sink} updates={a.updates} concurrency={a.concurrency} rounds={a.rounds} (медианы по раундам)")
+    print(f"{'mode':>9} {'upd/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'lines':>7} {'dropped':>8}")
+    for name, *_ in MODES:
+        cols = list(zip(*res[name]))
+        ups, p50, p99, lines, dropped = (statistics.median(c) for c in cols)
+        print(f"{name:>9} {ups:8.0f} {p50:8.2f} {p99:8.2f} {lines:7.0f} {dropped:8.0f}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--updates", type=int, default=3000)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--sink", choices=("file", "slow"), default="file")
+    ap.add_argument("--write-delay-us", type=float, default=200)
+    asyncio.run(main(ap.parse_args()))
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_nearby.py — NearbyIndex: время поиска k ближайших и инкрементального снятия просроченных офферов
+Синтетика: N ресторанов в прямоугольнике Москвы, у части — живые офферы с разным сроком.
+Корректность поиска сверяется с полным перебором на части запросов.
+Запуск: python bench/bench_nearby.py [--restaurants 50000] [--offers 80000] [--queries 20000]
+"""
+import os, sys, argparse, random, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from foody_bot.nearby import NearbyIndex, Offer, distance_km
+from foody_bot.restaurants import Restaurant
+
+LAT, LNG = (55.55, 55.95), (37.35, 37.85)
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p / 100))]
+
+def brute(index: NearbyIndex, lat, lng, k, radius):
+    hits = sorted(
+        (distance_km(lat, lng, index.restaurants[rid].lat, index.restaurants[rid].lng), rid)
+        for rid in index.offers
+    )
+    return [rid for d, rid in hits if d <= radius][:k]
+
+def main(a):
+    rnd = random.Random(a.seed)
+    now = time.time()
+    restaurants = [Restaurant(f"R{i}", f"Точка {i}", rnd.uniform(*LAT), rnd.uniform(*LNG)) for i in range(a.restaurants)]
+    offers = [
+        Offer(f"O{i}", f"R{rnd.randrange(a.restaurants)}", "Набор", 35000, rnd.randint(1, 10),
+              now + rnd.uniform(60, a.horizon_min * 60))
+        for i in range(a.offers)
+    ]
+    index = NearbyIndex()
+    t0 = time.perf_counter()
+    index.load(restaurants, offers, now)
+    print(f"load: {time.perf_counter() - t0:.2f}s  {index.stats()}")
+
+    points = [(rnd.uniform(*LAT), rnd.uniform(*LNG)) for _ in range(a.queries)]
+    lat_us = []
+    for p in points:
+        t0 = time.perf_counter()
+        index.nearest(*p, k=a.k, radius_km=a.radius, now=now)
+        lat_us.append((time.perf_counter() - t0) * 1e6)
+    print(f"nearest(k={a.k}, r={a.radius}km): p50={pct(lat_us, 50):.0f}µs p99={pct(lat_us, 99):.0f}µs "
+          f"max={max(lat_us):.0f}µs")
+
+    bad = sum(
+        [h.restaurant.id for h in index.nearest(*p, k=a.k, radius_km=a.radius, now=now)] != brute(index, *p, a.k, a.radius)
+        for p in points[:200]
+    )
+    print(f"check vs brute force: {200 - bad}/200 match")
+
+    # время идёт: снимаем просроченное порциями, как это делает nearest() на каждом запросе
+    steps, exp_us = 0, []
+    for minute in range(1, a.horizon_min + 1, 5):
+        t0 = time.perf_counter()
+        n = index.expire(now + minute * 60)
+        exp_us.append((time.perf_counter() - t0) * 1e6 / max(1, n))
+        steps += 1
+    print(f"expire: {index.expired} offers in {steps} steps, ~{pct(exp_us, 50):.1f}µs per offer; left {index.stats()}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--restaurants", type=int, default=50000)
+    ap.add_argument("--offers", type=int, default=80000)
+    ap.add_argument("--queries", type=int, default=20000)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--radius", type=float, default=5)
+    ap.add_argument("--horizon-min", type=int, default=180)
+    ap.add_argument("--seed", type=int, default=1)
+    main(ap.parse_args())
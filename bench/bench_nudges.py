@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_nudges.py — TimingWheel против heapq с ленивой отменой и цена журнала nudges.py
+Сценарий: N таймеров на ближайшие часы (как напоминания за 30/10 мин до expires_at), отмена/перевзвод части
+(распродано, сдвинули срок), затем проход времени тиками по 1 с до конца горизонта.
+Журнал: N операций add → flush, затем проигрывание и сжатие, как при рестарте бота.
+Запуск: python bench/bench_nudges.py [--timers 500000] [--cancel 0.3] [--hours 6]
+"""
+import os, sys, argparse, heapq, random, tempfile, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+
+from foody_bot.nudges import TimingWheel, NudgeLog
+
+class HeapTimers:
+    """База для сравнения: куча (at, key) + словарь актуальных сроков, отменённые пропускаются при извлечении."""
+    def __init__(self):
+        self.heap, self.live = [], {}
+
+    def add(self, key, at):
+        self.live[key] = at
+        heapq.heappush(self.heap, (at, key))
+
+    def cancel(self, key):
+        return self.live.pop(key, None) is not None
+
+    def advance(self, now):
+        fired = []
+        while self.heap and self.heap[0][0] <= now:
+            at, key = heapq.heappop(self.heap)
+            if self.live.get(key) == at:
+                del self.live[key]
+                fired.append(key)
+        return fired
+
+def run(timers, plan, cancels, now, hours):
+    t0 = time.perf_counter()
+    for key, at in plan:
+        timers.add(key, at)
+    t_add = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for key in cancels:
+        timers.cancel(key)
+    t_cancel = time.perf_counter() - t0
+    fired, worst = 0, 0.0
+    t0 = time.perf_counter()
+    for s in range(1, hours * 3600 + 1):
+        t1 = time.perf_counter()
+        fired += len(timers.advance(now + s))
+        worst = max(worst, time.perf_counter() - t1)
+    t_adv = time.perf_counter() - t0
+    return t_add, t_cancel, t_adv, worst, fired
+
+def main(a):
+    rnd = random.Random(a.seed)
+    now = time.time()
+    plan = [(f"O{i}:{rnd.choice((30, 10))}", now + rnd.uniform(1, a.hours * 3600)) for i in range(a.timers)]
+    cancels = [k for k, _ in rnd.sample(plan, int(a.timers * a.cancel))]
+    n = len(plan)
+    print(f"timers={n} cancel={len(cancels)} horizon={a.hours}h tick=1s")
+    print(f"{'':>6} {'add ns/op':>10} {'cancel ns/op':>13} {'advance s':>10} {'worst tick ms':>14} {'fired':>8}")
+    for name, timers in (("wheel", TimingWheel(1.0, now=now)), ("heap", HeapTimers())):
+        t_add, t_cancel, t_adv, worst, fired = run(timers, plan, cancels, now, a.hours)
+        print(f"{name:>6} {t_add / n * 1e9:10.0f} {t_cancel / max(1, len(cancels)) * 1e9:13.0f} "
+              f"{t_adv:10.2f} {worst * 1000:14.2f} {fired:8}")
+
+    path = os.path.join(tempfile.gettempdir(), "foody-bench-nudges.jsonl")
+    journal = NudgeLog(path)
+    journal.compact(())
+    t0 = time.perf_counter()
+    for key, at in plan:
+        journal.append({"op": "add", "key": key, "at": at})
+    journal.flush()
+    t_write = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ops = journal.load()
+    t_load = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    journal.compact(ops)
+    t_compact = time.perf_counter() - t0
+    size = os.path.getsize(path)
+    journal.close()
+    os.unlink(path)
+    print(f"journal: append+flush {t_write:.2f}s, replay {t_load:.2f}s, compact {t_compact:.2f}s, {size / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--timers", type=int, default=500000)
+    ap.add_argument("--cancel", type=float, default=0.3)
+    ap.add_argument("--hours", type=int, default=6)
+    ap.add_argument("--seed", type=int, default=1)
+    main(ap.parse_args())
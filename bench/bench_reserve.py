@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_reserve.py — всплеск нажатий 🛒 на один оффер: Inventory (память + write-behind) против
+«каждое нажатие — транзакция в БД» (замок на оффер + запрос к бэкенду на нажатие, как UPDATE ... RETURNING)
+Бэкенд броней — фейк в этом же процессе с задержкой --db-latency-ms на запрос и своим остатком;
+--sold-elsewhere N: до всплеска N штук продано мимо бота (касса) — бот о них не знает, ловит сверка оверсейла.
+Нажатия идут через BotCore.handle_webhook (inline), ответы Bot API — bench/fake_bot_api.py в процессе.
+Запуск: python bench/bench_reserve.py [--taps 1000] [--qty 100] [--db-latency-ms 5] [--sold-elsewhere 10]
+"""
+import os, sys, argparse, asyncio, json, time
+BENCH = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(BENCH), BENCH]
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+os.environ.setdefault("SEND_GLOBAL_RATE", "100000")
+os.environ.setdefault("SEND_GLOBAL_BURST", "100000")
+os.environ.setdefault("NUDGES", "0")
+os.environ.setdefault("NEARBY", "1")
+os.environ.setdefault("RESERVE", "1")
+os.environ.setdefault("RID_LOOKUP", "0")
+
+from aiohttp import web
+from fake_bot_api import FakeBotAPI
+
+class FakeReservations:
+    """Бэкенд броней: POST {"ops": [...]} → {"rejected": [...], "qty_left": {...}}."""
+    def __init__(self, stock: dict, latency: float):
+        self.stock, self.latency = dict(stock), latency
+        self.held: set = set()
+        self.requests = 0
+
+    async def handle(self, request: web.Request):
+        ops = (await request.json())["ops"]
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        rejected = []
+        for op in ops:
+            if op["op"] == "reserve":
+                if self.stock.get(op["offer_id"], 0) > 0:
+                    self.stock[op["offer_id"]] -= 1
+                    self.held.add(op["id"])
+                else:
+                    rejected.append(op["id"])
+            elif op["id"] in self.held:
+                self.held.discard(op["id"])
+                self.stock[op["offer_id"]] += 1
+        return web.json_response({"rejected": rejected, "qty_left": {op["offer_id"]: self.stock[op["offer_id"]] for op in ops}})
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/batch", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/batch"
+
+def tap(i: int, oid: str) -> bytes:
+    user = {"id": 10_000 + i, "is_bot": False, "first_name": "U"}
+    return json.dumps({"update_id": 1_000_000 + i, "callback_query": {
+        "id": str(i), "chat_instance": "b", "data": f"rsv:{oid}", "from": user,
+        "message": {"message_id": 1, "date": 0, "chat": {"id": user["id"], "type": "private"}},
+    }}).encode()
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p / 100))] * 1000
+
+async def main(a):
+    from foody_bot.nearby import Offer
+    from foody_bot.reserve import BackendSink
+    from foody_bot.restaurants import Restaurant
+    fake = FakeBotAPI()
+    os.environ["TELEGRAM_API_BASE"] = await fake.start()
+    from foody_bot.core import BotCore
+    from foody_bot import logs
+    logs.setup_logging("plain", "WARNING")
+
+    offer = Offer("OFF_DEMO_1", "RID_DEMO", "Набор выпечки", 35000, a.qty, time.time() + 5400)
+    backend = FakeReservations({offer.id: a.qty - a.sold_elsewhere}, a.db_latency_ms / 1000)
+    url = await backend.start()
+
+    async def source():
+        return [Restaurant("RID_DEMO", "DEMO Bakery", 55.751, 37.618)], [offer]
+
+    core = BotCore("webapp", "inline")
+    core.nearby.source = source
+    core.inventory.sink = BackendSink(url)
+    await core.startup()
+    while not core.nearby.ready:
+        await asyncio.sleep(0.01)
+
+    lat = []
+    async def one(i):
+        t0 = time.perf_counter()
+        await core.handle_webhook(tap(i, offer.id), None)
+        lat.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(a.taps)))
+    burst = time.perf_counter() - t0
+    t1 = time.perf_counter()
+    while core.inventory.stats()["pending_ops"]:
+        await asyncio.sleep(0.005)
+    await core.inventory.flush()
+    synced = time.perf_counter() - t1 + core.inventory.interval
+    st = core.inventory.stats()
+    print(f"inventory: {a.taps} taps through handle_webhook in {burst * 1000:.0f} ms "
+          f"({a.taps / burst:.0f} upd/s, all at once: p50 {pct(lat, 50):.0f} ms, p99 {pct(lat, 99):.0f} ms), "
+          f"backend requests {backend.requests}, synced within ~{synced * 1000:.0f} ms")
+    print(f"  reserved {st['reserved']}, sold_out answers {st['sold_out']}, oversold (reconciled) {st['oversold']}, "
+          f"active {st['active']}, backend stock left {backend.stock[offer.id]}")
+    # сами решения Inventory, без разбора апдейта и хендлера aiogram
+    from foody_bot.reserve import Inventory, Stock
+    inv = Inventory(core.bot, core.nearby, sink=core.inventory.sink)
+    inv.stock[offer.id] = Stock(offer)
+    t0 = time.perf_counter()
+    for i in range(a.taps):
+        inv.reserve(offer.id, 10_000 + i, 10_000 + i)
+    print(f"  Inventory.reserve alone: {a.taps} calls in {(time.perf_counter() - t0) * 1000:.2f} ms")
+    await core.shutdown()
+
+    # база: каждое нажатие — запрос к бэкенду под замком оффера (проверка и списание в одной транзакции)
+    backend2 = FakeReservations({offer.id: a.qty - a.sold_elsewhere}, a.db_latency_ms / 1000)
+    sink = BackendSink(await backend2.start())
+    lock = asyncio.Lock()
+    granted = 0
+    async def naive(i):
+        nonlocal granted
+        async with lock:
+            res = await sink([{"op": "reserve", "id": f"n{i}", "offer_id": offer.id, "user_id": i, "qty": 1}])
+            granted += not res["rejected"]
+    t0 = time.perf_counter()
+    await asyncio.gather(*(naive(i) for i in range(a.taps)))
+    print(f"per-tap DB: {a.taps} taps in {(time.perf_counter() - t0) * 1000:.0f} ms, backend requests {backend2.requests}, "
+          f"reserved {granted}")
+    await sink.close()
+    await backend.runner.cleanup()
+    await backend2.runner.cleanup()
+    await fake.stop()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--taps", type=int, default=1000)
+    ap.add_argument("--qty", type=int, default=100)
+    ap.add_argument("--db-latency-ms", type=float, default=5)
+    ap.add_argument("--sold-elsewhere", type=int, default=10)
+    asyncio.run(main(ap.parse_args()))
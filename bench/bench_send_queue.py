@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_send_queue.py — офлайн-проверка SendScheduler против bench/fake_bot_api.py
+Сценарий: рассылка (BROADCAST) по многим чатам + всплеск ответов на команды (REPLY) в одни и те же чаты;
+фейковый API эмулирует per-chat flood control и случайные 429.
+Запуск: python bench/bench_send_queue.py [--chats 200] [--replies 300] [--rate-429 0.02]
+"""
+import os, sys, argparse, asyncio, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from fake_bot_api import FakeBotAPI
+from foody_bot.send_queue import SendScheduler, priority, PRIORITY_BROADCAST
+
+async def main(a):
+    fake = FakeBotAPI(latency=a.latency_ms / 1000, rate_429=a.rate_429, chat_rate=1.0)
+    url = await fake.start()
+    bot = Bot("123:ABC", session=AiohttpSession(api=TelegramAPIServer.from_base(url)))
+    sender = SendScheduler(global_rate=a.global_rate, global_burst=int(a.global_rate), chat_burst=1)
+    if not a.no_scheduler:
+        bot.session.middleware(sender)
+    lat = {"reply": [], "broadcast": []}
+    failed = 0
+
+    async def send(chat_id, kind):
+        nonlocal failed
+        t0 = time.perf_counter()
+        try:
+            if kind == "broadcast":
+                with priority(PRIORITY_BROADCAST):
+                    await bot.send_message(chat_id, "last chance")
+            else:
+                await bot.send_message(chat_id, "reply")
+        except Exception:
+            failed += 1
+            return
+        lat[kind].append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    jobs = [send(1000 + i, "broadcast") for i in range(a.chats)]
+    jobs += [send(1 + i % 50, "reply") for i in range(a.replies)]
+    await asyncio.gather(*jobs)
+    dt = time.perf_counter() - t0
+    await sender.close()
+    await bot.session.close()
+    await fake.stop()
+
+    for kind, v in lat.items():
+        v.sort()
+        if v:
+            print(f"{kind:<10} n={len(v):5d} p50={v[len(v) // 2] * 1000:8.1f}ms p99={v[int(len(v) * 0.99)] * 1000:8.1f}ms")
+    print(f"total {dt:.2f}s, delivered={len(fake.calls)}, 429 from API={fake.errors_429}, failed={failed}")
+    if not a.no_scheduler:
+        print("scheduler:", sender.stats())
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chats", type=int, default=200)
+    ap.add_argument("--replies", type=int, default=300)
+    ap.add_argument("--latency-ms", type=float, default=20)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--global-rate", type=float, default=30)
+    ap.add_argument("--no-scheduler", action="store_true")
+    asyncio.run(main(ap.parse_args()))
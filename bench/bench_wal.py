@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_wal.py — журнал принятых апдейтов (ingress_wal.py): пропускная способность при разном размере пачки fsync
+--concurrency одновременных «вебхуков» пишут --updates апдейтов (~размер реального message-апдейта), каждый
+ждёт fsync своей пачки (время до 200 Telegram), затем отмечает обработку. Для каждого INGRESS_WAL_BATCH из --batches:
+апдейтов/с, средний размер пачки, средний fsync, p50/p99 ожидания append. Отдельно — без fsync (INGRESS_WAL_FSYNC=0)
+и с INGRESS_WAL_DELAY_MS=--delay-ms.
+Каталог — --dir (по умолчанию текущий): /tmp часто tmpfs, где fsync ничего не стоит.
+Запуск: python bench/bench_wal.py [--updates 20000] [--concurrency 256] [--batches 1,8,32,128,512] [--dir .]
+"""
+import os, sys, argparse, asyncio, json, shutil, tempfile, time
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from foody_bot.ingress_wal import IngressWAL
+
+def make_raw(i: int) -> bytes:
+    return json.dumps({"update_id": i, "message": {
+        "message_id": i, "date": 1700000000, "text": "/start r_12345",
+        "chat": {"id": 10_000_000 + i % 5000, "type": "private", "first_name": "Иван"},
+        "from": {"id": 10_000_000 + i % 5000, "is_bot": False, "first_name": "Иван", "language_code": "ru"},
+        "entities": [{"type": "bot_command", "offset": 0, "length": 6}]}}, ensure_ascii=False).encode()
+
+async def run(a, path: str, **opts) -> tuple[float, list[float], dict]:
+    wal = IngressWAL(path, **opts)
+    wal.start()
+    raws = [make_raw(i) for i in range(a.updates)]
+    waits: list[float] = []
+
+    async def webhook(part):
+        for raw in part:
+            t0 = time.perf_counter()
+            seq = await wal.append(raw)
+            waits.append(time.perf_counter() - t0)
+            wal.done(seq)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(webhook(raws[k::a.concurrency]) for k in range(a.concurrency)))
+    elapsed = time.perf_counter() - t0
+    await wal.close()
+    waits.sort()
+    return a.updates / elapsed, waits, wal.stats()
+
+def pct(xs: list[float], p: float) -> float:
+    return xs[min(len(xs) - 1, int(len(xs) * p))] * 1000
+
+async def main(a):
+    base = tempfile.mkdtemp(prefix="bench_wal_", dir=a.dir)
+    print(f"{a.updates} updates (~{len(make_raw(0))} B), {a.concurrency} concurrent webhooks, dir {base}")
+    runs = [(f"fsync, batch {b}", {"batch": b}) for b in a.batches]
+    runs += [(f"fsync, batch {a.batches[-1]}, delay {a.delay_ms} ms", {"batch": a.batches[-1], "delay_ms": a.delay_ms}),
+             ("no fsync (page cache)", {"fsync": False})]
+    try:
+        for i, (name, opts) in enumerate(runs):
+            rate, waits, st = await run(a, os.path.join(base, str(i)), **opts)
+            print(f"{name:>32}: {rate:9,.0f} upd/s | avg batch {st['avg_batch']:6.1f}, fsync {st['avg_fsync_ms']:6.2f} ms | "
+                  f"wait p50 {pct(waits, 0.5):6.2f} ms, p99 {pct(waits, 0.99):6.2f} ms")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--updates", type=int, default=20000)
+    ap.add_argument("--concurrency", type=int, default=256)
+    ap.add_argument("--batches", type=lambda s: [int(x) for x in s.split(",")], default=[1, 8, 32, 128, 512])
+    ap.add_argument("--delay-ms", type=float, default=1.0)
+    ap.add_argument("--dir", default=".")
+    asyncio.run(main(ap.parse_args()))
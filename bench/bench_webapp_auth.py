@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_webapp_auth.py — проверка initData Mini App (webapp_auth.py): сколько проверок в секунду на ядро
+Замеры (один поток):
+  • наивно: ключ HMAC("WebAppData", token) выводится на каждый вызов, без кэша
+  • InitDataValidator, холодный кэш: каждая initData впервые — разбор + один HMAC
+  • InitDataValidator, тёплый кэш: повторные вызовы веб-аппа с той же строкой
+  • HTTP: POST WEBAPP_AUTH_PATH на aiohttp в этом процессе, --concurrency клиентов, каждая initData --repeat раз
+Запуск: python bench/bench_webapp_auth.py [--users 20000] [--repeat 5] [--requests 20000] [--concurrency 50]
+"""
+import os, sys, argparse, asyncio, hashlib, hmac, json, time
+from urllib.parse import parse_qsl, urlencode
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TOKEN = "123456:BENCH-webapp-auth"
+os.environ.setdefault("BOT_TOKEN", TOKEN)
+
+from foody_bot.webapp_auth import InitDataValidator, add_aiohttp_routes, WEBAPP_AUTH_PATH
+
+def sign(fields: dict, token: str = TOKEN) -> str:
+    """initData, как её собирает Telegram: поля + hash по data-check-string."""
+    secret = hmac.new(b"WebAppData", token.encode(), hashlib.sha256).digest()
+    check = "\n".join(f"{k}={fields[k]}" for k in sorted(fields))
+    return urlencode({**fields, "hash": hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()})
+
+def make_init_data(n: int) -> list[str]:
+    now = int(time.time())
+    return [sign({
+        "query_id": f"AAH{i:012d}",
+        "user": json.dumps({"id": 10_000_000 + i, "first_name": "Иван", "last_name": "Тестов", "username": f"user{i}",
+                            "language_code": "ru", "allows_write_to_pm": True}, ensure_ascii=False, separators=(",", ":")),
+        "auth_date": str(now - i % 3600),
+        "chat_type": "private",
+        "chat_instance": str(-8_000_000_000 + i),
+    }) for i in range(n)]
+
+def naive(init_data: str, token: str = TOKEN) -> dict:
+    fields = dict(parse_qsl(init_data, keep_blank_values=True))
+    got = fields.pop("hash")
+    secret = hmac.new(b"WebAppData", token.encode(), hashlib.sha256).digest()
+    check = "\n".join(f"{k}={fields[k]}" for k in sorted(fields))
+    if not hmac.compare_digest(hmac.new(secret, check.encode(), hashlib.sha256).hexdigest(), got):
+        raise ValueError("bad signature")
+    return {"user": json.loads(fields["user"]), "auth_date": int(fields["auth_date"])}
+
+def rate(fn, items) -> float:
+    t0 = time.perf_counter()
+    for x in items:
+        fn(x)
+    return len(items) / (time.perf_counter() - t0)
+
+async def http(a, items: list[str]) -> tuple[float, dict]:
+    import aiohttp
+    from aiohttp import web
+    validator = InitDataValidator(TOKEN, maxsize=len(items) * 2)
+    app = web.Application()
+    add_aiohttp_routes(app, validator)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}{WEBAPP_AUTH_PATH}"
+    # веб-апп шлёт одну и ту же initData несколько раз за сессию (загрузка страницы, API-вызовы)
+    seq = [items[(i // a.repeat) % len(items)] for i in range(a.requests)]
+    codes: dict = {}
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=a.concurrency)) as s:
+        async def worker(part):
+            for body in part:
+                async with s.post(url, data=body, headers={"Content-Type": "text/plain"}) as r:
+                    await r.read()
+                    codes[r.status] = codes.get(r.status, 0) + 1
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(seq[k::a.concurrency]) for k in range(a.concurrency)))
+        elapsed = time.perf_counter() - t0
+    await runner.cleanup()
+    return a.requests / elapsed, {"codes": codes, **validator.stats()}
+
+def main(a):
+    items = make_init_data(a.users)
+    print(f"initData: {a.users} users, avg {sum(map(len, items)) / len(items):.0f} bytes")
+    print(f"naive (key per call, no cache): {rate(naive, items):>10,.0f} /s")
+    v = InitDataValidator(TOKEN, maxsize=a.users * 2)
+    print(f"validator, cold cache:          {rate(v.validate, items):>10,.0f} /s")
+    print(f"validator, warm cache:          {rate(v.validate, items * a.repeat):>10,.0f} /s   {v.stats()}")
+    bad = [s[:-4] + "0000" for s in items[:1000]]
+    def reject(s):
+        try:
+            v.validate(s)
+        except ValueError:
+            pass
+    print(f"validator, forged hash:         {rate(reject, bad):>10,.0f} /s")
+    rps, st = asyncio.run(http(a, items))
+    print(f"HTTP {WEBAPP_AUTH_PATH}: {a.requests} requests x{a.concurrency} clients, each initData x{a.repeat}: "
+          f"{rps:,.0f} req/s {st}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=20000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--requests", type=int, default=20000)
+    ap.add_argument("--concurrency", type=int, default=50)
+    main(ap.parse_args())
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_webhook.py — нагрузочный прогон точек входа вебхука против фейкового Bot API
+• поднимает bench/fake_bot_api.py в этом процессе и каждую точку входа отдельным процессом
+  (TELEGRAM_API_BASE → фейк, вебхук у Telegram не ставится)
+• шлёт апдейты bench/updates.py на WEBHOOK_PATH с заданным RPS (открытая модель: не ждём ответов)
+• end-to-end задержка: от POST вебхука до sendMessage в фейк (или до ответа вебхука, если метод пришёл в теле)
+• отчёт: пропускная способность, p50/p95/p99 end-to-end и ответа вебхука, коды HTTP, потерянные ответы, RSS
+• результаты — JSON в bench/results/, сравнение прошлых прогонов: --compare
+Лимиты SendScheduler по умолчанию подняты (меряем бота, а не flood control Telegram) — см. --env.
+Запуск:
+  python bench/bench_webhook.py --entry bot_webhook_patched.py,main_webhook_aiohttp.py --rps 200 --duration 20
+  python bench/bench_webhook.py --entry main_webhook_aiohttp.py --env INLINE_REPLY=1 --latency-ms 80 --rate-429 0.01
+  python bench/bench_webhook.py --compare bench/results/*.json
+"""
+import os, sys, argparse, asyncio, json, subprocess, time
+BENCH = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH)
+sys.path[:0] = [ROOT, BENCH]
+
+import aiohttp
+from fake_bot_api import FakeBotAPI
+from updates import UpdateGenerator, parse_mix
+
+BENCH_ENV = {
+    "BOT_TOKEN": "123456:BENCH",
+    "BACKEND_PUBLIC": "",
+    "WEBHOOK_SECRET": "",
+    "SEND_GLOBAL_RATE": "100000",
+    "SEND_GLOBAL_BURST": "100000",
+    "SEND_CHAT_BURST": "10",
+    "PYTHONUNBUFFERED": "1",
+}
+
+def pct(xs: list, p: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p / 100))]
+
+def rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def ms(xs: list) -> dict:
+    return {f"p{p}_ms": round(pct(xs, p) * 1000, 2) for p in (50, 95, 99)} | {"max_ms": round(max(xs, default=0) * 1000, 2)}
+
+async def wait_ready(url: str, proc: subprocess.Popen, timeout: float = 90):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as s:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise SystemExit(f"entrypoint exited with {proc.returncode}")
+            try:
+                async with s.get(url) as r:
+                    if r.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"{url} not ready after {timeout}s")
+
+async def run_entry(entry: str, a) -> dict:
+    fake = FakeBotAPI(latency=a.latency_ms / 1000, rate_429=a.rate_429, retry_after=a.retry_after)
+    api = await fake.start()
+    sent_at: dict = {}
+    e2e: list = []
+
+    def on_call(call):
+        if call["method"] == "sendMessage":
+            t0 = sent_at.pop(int(call["chat_id"] or 0), None)
+            if t0 is not None:
+                e2e.append(time.perf_counter() - t0)
+    fake.on_call = on_call
+
+    env = dict(os.environ, **BENCH_ENV, TELEGRAM_API_BASE=api, PORT=str(a.port))
+    env.update(dict(kv.split("=", 1) for kv in a.env))
+    log = open(os.path.join(a.out, f"{os.path.splitext(entry)[0]}.log"), "w")
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, entry)], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{a.port}"
+    hook = base + env.get("WEBHOOK_PATH", "/tg/webhook")
+    try:
+        await wait_ready(base + "/", proc)
+        gen = UpdateGenerator(seed=a.seed, mix=parse_mix(a.mix))
+        statuses: dict = {}
+        hook_lat: list = []
+        rss: list = []
+        expected = 0
+        tasks = set()
+        conn = aiohttp.TCPConnector(limit=a.connections)
+        async with aiohttp.ClientSession(connector=conn, timeout=aiohttp.ClientTimeout(total=60)) as s:
+
+            async def post(sample):
+                t0 = time.perf_counter()
+                if sample.expects_reply:
+                    sent_at[sample.chat_id] = t0
+                try:
+                    async with s.post(hook, data=sample.body, headers={"Content-Type": "application/json"}) as r:
+                        body = await r.read()
+                        status = r.status
+                except Exception as e:
+                    status = type(e).__name__
+                    body = b""
+                t1 = time.perf_counter()
+                hook_lat.append(t1 - t0)
+                statuses[status] = statuses.get(status, 0) + 1
+                # INLINE_REPLY=1: ответ пришёл методом в теле вебхука, в фейк он не попадёт
+                if body[:1] == b"{" and sent_at.pop(sample.chat_id, None) is not None:
+                    e2e.append(t1 - t0)
+
+            t_start = time.perf_counter()
+            n = int(a.rps * a.duration)
+            next_rss = t_start
+            for i in range(n):
+                delay = t_start + i / a.rps - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                sample = gen.next()
+                expected += sample.expects_reply
+                t = asyncio.create_task(post(sample))
+                tasks.add(t)
+                t.add_done_callback(tasks.discard)
+                if time.perf_counter() >= next_rss:
+                    rss.append(rss_mb(proc.pid))
+                    next_rss += 0.5
+            send_time = time.perf_counter() - t_start
+            # дожидаемся ответов вебхука и хвоста исходящих сообщений
+            if tasks:
+                await asyncio.wait(tasks)
+            deadline = time.perf_counter() + a.grace
+            while sent_at and time.perf_counter() < deadline:
+                await asyncio.sleep(0.05)
+            rss.append(rss_mb(proc.pid))
+            total_time = time.perf_counter() - t_start
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+        await fake.stop()
+
+    return {
+        "entry": entry,
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {"rps": a.rps, "duration": a.duration, "latency_ms": a.latency_ms, "rate_429": a.rate_429,
+                   "mix": a.mix or "default", "connections": a.connections, "env": a.env},
+        "requests": n,
+        "achieved_rps": round(n / send_time, 1),
+        "http": {str(k): v for k, v in statuses.items()},
+        "replies_expected": expected,
+        "replies": len(e2e),
+        "replies_missing": len(sent_at),
+        "replies_per_s": round(len(e2e) / total_time, 1),
+        "e2e": ms(e2e),
+        "webhook": ms(hook_lat),
+        "fake_api": {"calls": len(fake.calls), "429": fake.errors_429},
+        "rss_mb": {"max": round(max(rss, default=0), 1), "end": round(rss[-1] if rss else 0, 1)},
+    }
+
+def compare(paths: list[str]):
+    rows = [json.load(open(p)) for p in paths]
+    cols = ("entry", "ts", "rps", "ok/s", "e2e p50", "e2e p99", "hook p99", "miss", "rss")
+    print("  ".join(f"{c:>22}" if i < 2 else f"{c:>9}" for i, c in enumerate(cols)))
+    for r in rows:
+        vals = (r["entry"], r["ts"], r["params"]["rps"], r["replies_per_s"], r["e2e"]["p50_ms"], r["e2e"]["p99_ms"],
+                r["webhook"]["p99_ms"], r["replies_missing"], r["rss_mb"]["max"])
+        print("  ".join(f"{str(v):>22}" if i < 2 else f"{str(v):>9}" for i, v in enumerate(vals)))
+
+async def main(a):
+    os.makedirs(a.out, exist_ok=True)
+    for entry in a.entry.split(","):
+        res = await run_entry(entry, a)
+        path = os.path.join(a.out, f"{os.path.splitext(entry)[0]}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, "w") as f:
+            json.dump(res, f, ensure_ascii=False, indent=2)
+        print(json.dumps(res, ensure_ascii=False))
+        print("→", path)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entry", default="bot_webhook_patched.py,main_webhook_aiohttp.py",
+                    help="точки входа через запятую (файлы в корне репозитория)")
+    ap.add_argument("--rps", type=float, default=100)
+    ap.add_argument("--duration", type=float, default=10)
+    ap.add_argument("--mix", default="", help="веса видов апдейтов, например start=50,offer=20,malformed=5")
+    ap.add_argument("--latency-ms", type=float, default=30, help="задержка ответа фейкового Bot API")
+    ap.add_argument("--rate-429", type=float, default=0)
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--connections", type=int, default=40, help="как max_connections вебхука у Telegram")
+    ap.add_argument("--grace", type=float, default=10, help="сколько ждать хвост ответов после отправки")
+    ap.add_argument("--port", type=int, default=8199)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--env", action="append", default=[], help="KEY=VAL для процесса точки входа (повторяемый)")
+    ap.add_argument("--out", default=os.path.join(BENCH, "results"))
+    ap.add_argument("--compare", nargs="+", help="вывести таблицу по сохранённым JSON и выйти")
+    a = ap.parse_args()
+    if a.compare:
+        compare(a.compare)
+    else:
+        asyncio.run(main(a))
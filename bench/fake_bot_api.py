@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+bench/fake_bot_api.py — локальный фейковый Telegram Bot API для офлайн-тестов и бенчмарков
+• POST/GET /bot<token>/<method>: принимает form-data, urlencoded и JSON, записывает вызовы
+• настраиваемая задержка ответа и инъекция 429 (retry_after)
+• опционально эмулирует flood control Telegram: >CHAT_RATE сообщений/с в чат → 429
+• помнит setWebhook / setMyCommands и отдаёт их в getWebhookInfo / getMyCommands
+• sendDocument / sendMediaGroup: загруженный файл получает file_id в ответе, отправка по file_id возвращает его же
+Запуск отдельно:
+  python bench/fake_bot_api.py --port 8081 --latency-ms 50 --rate-429 0.01
+В коде:
+  fake = FakeBotAPI(latency=0.05); url = await fake.start(); ...; await fake.stop()
+  Bot(token, session=AiohttpSession(api=TelegramAPIServer.from_base(url)))
+"""
+import argparse, asyncio, json, random, time
+from aiohttp import web
+
+def _json(v):
+    # form-data присылает вложенные объекты строкой JSON, application/json — уже разобранными
+    return json.loads(v) if isinstance(v, str) else v
+
+class FakeBotAPI:
+    def __init__(self, latency: float = 0.0, rate_429: float = 0.0, retry_after: int = 1,
+                 chat_rate: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.chat_rate = chat_rate
+        self.host, self.port = host, port
+        self.calls: list[dict] = []  # {"method", "chat_id", "t", "params"}
+        self.errors_429 = 0
+        self._last_sent: dict = {}
+        self._msg_id = 0
+        # состояние для идемпотентного старта бота: setWebhook/setMyCommands видны в getWebhookInfo/getMyCommands
+        self.webhook = {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        self.commands: list = []
+        self._runner: web.AppRunner | None = None
+        self.on_call = None  # callback(call) — например, для замера end-to-end задержки
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        app.router.add_get("/calls", lambda _: web.json_response({"calls": len(self.calls), "429": self.errors_429}))
+        return app
+
+    async def start(self) -> str:
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return f"http://{self.host}:{self.port}"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _params(self, request: web.Request) -> dict:
+        if request.content_type == "application/json":
+            return await request.json()
+        if request.method == "GET":
+            return dict(request.query)
+        form = await request.post()
+        # файлы формы не храним — только отметку attach://, как у ссылок на них в media
+        return {k: v if isinstance(v, str) else f"attach://{k}" for k, v in form.items()}
+
+    def _flood(self, method: str, chat_id) -> bool:
+        if self.rate_429 and random.random() < self.rate_429:
+            return True
+        if self.chat_rate and chat_id is not None and method.startswith("send"):
+            now = time.monotonic()
+            last = self._last_sent.get(chat_id)
+            self._last_sent[chat_id] = now
+            return last is not None and now - last < 1.0 / self.chat_rate
+        return False
+
+    async def handle(self, request: web.Request):
+        method = request.match_info["method"]
+        params = await self._params(request)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        chat_id = params.get("chat_id")
+        if self._flood(method, chat_id):
+            self.errors_429 += 1
+            return web.json_response({
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        call = {"method": method, "chat_id": chat_id, "t": time.time(), "params": params}
+        self.calls.append(call)
+        if self.on_call:
+            self.on_call(call)
+        return web.json_response({"ok": True, "result": self._result(method, params)})
+
+    def _result(self, method: str, params: dict):
+        if method == "sendMediaGroup":
+            return [self._message({**params, "document": m.get("media")}) for m in _json(params.get("media", "[]"))]
+        if method.startswith(("send", "copyMessage", "forwardMessage")):
+            return self._message(params)
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "FoodyFake", "username": "foody_fake_bot"}
+        if method == "getWebhookInfo":
+            return self.webhook
+        if method == "getMyCommands":
+            return self.commands
+        if method == "setWebhook":
+            self.webhook = {**self.webhook, "url": params.get("url", "")}
+            if "allowed_updates" in params:
+                self.webhook["allowed_updates"] = _json(params["allowed_updates"])
+        elif method == "deleteWebhook":
+            self.webhook = {**self.webhook, "url": ""}
+        elif method == "setMyCommands":
+            self.commands = _json(params.get("commands", "[]"))
+        return True
+
+    def _message(self, params: dict) -> dict:
+        self._msg_id += 1
+        chat_id = int(params.get("chat_id") or 0)
+        msg = {
+            "message_id": self._msg_id, "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+            "text": params.get("text", ""),
+        }
+        doc = params.get("document")
+        if doc is not None:
+            fid = doc if isinstance(doc, str) and not doc.startswith("attach://") else f"FILE{self._msg_id}"
+            msg["document"] = {"file_id": fid, "file_unique_id": fid}
+        return msg
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--latency-ms", type=float, default=0)
+    ap.add_argument("--rate-429", type=float, default=0)
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--chat-rate", type=float, default=0)
+    a = ap.parse_args()
+    fake = FakeBotAPI(a.latency_ms / 1000, a.rate_429, a.retry_after, a.chat_rate)
+    web.run_app(fake.make_app(), host=a.host, port=a.port)
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+bench/replay_capture.py — воспроизведение записанного трафика вебхука (foody_bot/capture.py) против фейкового Bot API
+• файлы WEBHOOK_CAPTURE.* (по одному на запуск и воркер; несколько сливаются по времени прихода)
+• --speed 1 — с исходными интервалами, N — в N раз быстрее, 0 — без пауз (максимальная скорость);
+  не больше --connections запросов одновременно, как max_connections вебхука у Telegram: если бот не успевает,
+  запрос уходит позже расписания — это видно в lag
+• --target http — POST WEBHOOK_PATH в make_app() (aiohttp в этом процессе), core — BotCore.handle_webhook без HTTP,
+  dp — сразу BotCore.process_update (разбор, feed_update, вызов метода) — без префильтра, дедупа и пула
+• отчёт: апдейтов/с, отставание от расписания, ответ вебхука p50/p90/p99, end-to-end (от отправки апдейта
+  до первого вызова Bot API в тот же чат), коды HTTP, вызовы фейка по методам; JSON в --out, сравнение: --compare
+Бэкенд не подменяется: по умолчанию NEARBY=0, RID_LOOKUP=0 (переопределяются --env).
+Запуск:
+  python bench/replay_capture.py capture.jsonl.gz.20261018-120000-4242 --speed 1
+  python bench/replay_capture.py capture.jsonl.gz.* --speed 0 --target core --env UPDATE_WORKERS=32
+  python bench/replay_capture.py --compare bench/results/replay-*.json
+"""
+import os, sys, argparse, asyncio, heapq, json, time
+from collections import Counter, deque
+BENCH = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH)
+sys.path[:0] = [ROOT, BENCH]
+
+from bench_webhook import BENCH_ENV, pct
+from fake_bot_api import FakeBotAPI
+
+REPLAY_ENV = {
+    **BENCH_ENV,
+    "WEBHOOK_CAPTURE": "",  # воспроизведение не пишет само себя
+    "NUDGE_STATE": "",
+    "FSM_STATE": "",
+    "INGRESS_WAL": "0",
+    "NEARBY": "0",
+    "RID_LOOKUP": "0",
+}
+
+def lat(xs: list) -> dict:
+    return {f"p{p}_ms": round(pct(xs, p) * 1000, 2) for p in (50, 90, 99)} | {"max_ms": round(max(xs, default=0) * 1000, 2)}
+
+def load(paths: list[str], limit: int) -> list[tuple[float, bytes]]:
+    from foody_bot.capture import read_capture
+    out = []
+    for rec in heapq.merge(*(read_capture(p) for p in paths), key=lambda r: r[0]):
+        out.append(rec)
+        if limit and len(out) >= limit:
+            break
+    return out
+
+async def replay(a, records: list[tuple[float, bytes]]) -> dict:
+    from foody_bot.fast_json import loads
+    from foody_bot.update_pool import chat_key
+    fake = FakeBotAPI(latency=a.latency_ms / 1000, rate_429=a.rate_429)
+    os.environ["TELEGRAM_API_BASE"] = await fake.start()
+    waiting: dict = {}  # чат → времена отправки апдейтов без ответа, по порядку
+    e2e: list = []
+
+    def on_call(call):
+        chat = call.get("chat_id")
+        q = waiting.get(int(chat) if isinstance(chat, str) and chat.lstrip("-").isdigit() else chat)
+        if q:
+            e2e.append(time.perf_counter() - q.popleft())
+    fake.on_call = on_call
+
+    from foody_bot.app import make_app
+    app = make_app("aiohttp", a.keyboard, a.processing)
+    core = app["core"]
+    runner = session = None
+    if a.target == "http":
+        import aiohttp
+        from aiohttp import web
+        from foody_bot import config
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()  # on_startup → core.startup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}{config.WEBHOOK_PATH}"
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=a.connections),
+                                        timeout=aiohttp.ClientTimeout(total=60))
+    else:
+        await core.startup()
+
+    async def deliver(raw: bytes):
+        if a.target == "http":
+            async with session.post(url, data=raw, headers={"Content-Type": "application/json"}) as r:
+                body = await r.read()
+                return r.status, body[:1] == b"{"
+        if a.target == "core":
+            status, body = await core.handle_webhook(raw, None)
+            return status, isinstance(body, dict)
+        try:
+            data = loads(raw)
+        except ValueError:
+            return "malformed", False  # вебхук ответил бы 200, в диспетчер такое не попадает
+        await core.process_update(data)
+        return 200, False
+
+    statuses: Counter = Counter()
+    hook: list = []
+    lag: list = []
+    gate = asyncio.Semaphore(a.connections)
+
+    async def post(raw: bytes, chat, due: float):
+        async with gate:
+            t0 = time.perf_counter()
+            lag.append(max(0.0, t0 - due))
+            if chat is not None:
+                waiting.setdefault(chat, deque()).append(t0)
+            try:
+                status, inline = await deliver(raw)
+            except Exception as e:
+                status, inline = type(e).__name__, False
+            t1 = time.perf_counter()
+            hook.append(t1 - t0)
+            statuses[status] += 1
+            q = waiting.get(chat)
+            if inline and q:
+                e2e.append(t1 - q.popleft())  # метод ушёл в теле ответа вебхука, в фейк он не попадёт
+
+    first = records[0][0]
+    tasks = []
+    start = time.perf_counter()
+    for t, raw in records:
+        due = start + (t - first) / a.speed if a.speed > 0 else start
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            data = loads(raw)
+            chat = chat_key(data) if isinstance(data, dict) else None
+        except ValueError:
+            chat = None
+        tasks.append(asyncio.create_task(post(raw, chat, due)))
+    await asyncio.gather(*tasks)
+    # фоновый пул бота дорабатывает принятые апдейты
+    deadline = time.perf_counter() + a.grace
+    while time.perf_counter() < deadline:
+        st = core.pool.stats()
+        if not st["busy"] and not st["queued"]:
+            break
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    health = core.health()
+    if session is not None:
+        await session.close()
+    if runner is not None:
+        await runner.cleanup()
+    else:
+        await core.shutdown()
+    await fake.stop()
+    span = records[-1][0] - first
+    return {
+        "captures": a.captures,
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {"speed": a.speed, "target": a.target, "connections": a.connections, "latency_ms": a.latency_ms,
+                   "rate_429": a.rate_429, "processing": a.processing, "env": a.env},
+        "updates": len(records),
+        "captured_span_s": round(span, 3),
+        "captured_rps": round(len(records) / span, 1) if span else None,
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_s": round(len(records) / elapsed, 1),
+        "lag": lat(lag),
+        "webhook": lat(hook),
+        "e2e": lat(e2e),
+        "replies": len(e2e),
+        "http": {str(k): v for k, v in statuses.items()},
+        "fake_api": dict(Counter(c["method"] for c in fake.calls)) | {"429": fake.errors_429},
+        "updates_pool": health["updates"],
+    }
+
+def compare(paths: list[str]):
+    cols = ("file", "speed", "target", "upd/s", "lag p99", "hook p50", "hook p99", "e2e p50", "e2e p99", "replies")
+    print("  ".join(f"{c:>28}" if i == 0 else f"{c:>9}" for i, c in enumerate(cols)))
+    for p in paths:
+        r = json.load(open(p))
+        vals = (os.path.basename(p), r["params"]["speed"], r["params"]["target"], r["updates_per_s"], r["lag"]["p99_ms"],
+                r["webhook"]["p50_ms"], r["webhook"]["p99_ms"], r["e2e"]["p50_ms"], r["e2e"]["p99_ms"], r["replies"])
+        print("  ".join(f"{str(v):>28}" if i == 0 else f"{str(v):>9}" for i, v in enumerate(vals)))
+
+def main(a):
+    if a.compare:
+        return compare(a.compare)
+    if not a.captures:
+        raise SystemExit("capture files are required (or --compare)")
+    os.environ.update(REPLAY_ENV)
+    os.environ.update(dict(kv.split("=", 1) for kv in a.env))
+    from foody_bot import logs
+    logs.setup_logging("plain", a.log_level)
+    records = load(a.captures, a.limit)
+    if not records:
+        raise SystemExit("no updates in capture")
+    res = asyncio.run(replay(a, records))
+    os.makedirs(a.out, exist_ok=True)
+    path = os.path.join(a.out, f"replay-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(res, f, ensure_ascii=False, indent=2)
+    print(json.dumps(res, ensure_ascii=False))
+    print("→", path)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("captures", nargs="*")
+    ap.add_argument("--speed", type=float, default=1.0, help="1 — как записано, N — в N раз быстрее, 0 — без пауз")
+    ap.add_argument("--target", choices=("http", "core", "dp"), default="http")
+    ap.add_argument("--connections", type=int, default=40, help="одновременных запросов (max_connections вебхука)")
+    ap.add_argument("--limit", type=int, default=0, help="первые N апдейтов")
+    ap.add_argument("--keyboard", default="webapp")
+    ap.add_argument("--processing", default="background", help="UPDATE_PROCESSING бота: background | inline")
+    ap.add_argument("--latency-ms", type=float, default=30, help="задержка ответа фейкового Bot API")
+    ap.add_argument("--rate-429", type=float, default=0)
+    ap.add_argument("--grace", type=float, default=30, help="сколько ждать, пока пул бота доработает очередь")
+    ap.add_argument("--env", action="append", default=[], help="KEY=VALUE для бота, можно несколько раз")
+    ap.add_argument("--log-level", default="WARNING")
+    ap.add_argument("--out", default=os.path.join(BENCH, "results"))
+    ap.add_argument("--compare", nargs="+")
+    main(ap.parse_args())
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+bench/updates.py — генератор синтетических апдейтов Telegram для нагрузочных тестов
+Виды: /start, /start <rid>, /offer, /rules, произвольный текст (бот не отвечает) и битый JSON.
+Каждый апдейт — из своего чата (chat_id уникален), чтобы ответ бота в фейковом Bot API
+однозначно сопоставлялся с запросом и не упирался в per-chat лимиты.
+Использование:
+  gen = UpdateGenerator(seed=1)
+  u = gen.next()   # Sample(kind, body: bytes, chat_id, expects_reply)
+"""
+import json, random
+from typing import NamedTuple
+
+# вид → (вес по умолчанию, отвечает ли бот)
+KINDS = {
+    "start": (40, True),
+    "start_rid": (20, True),
+    "offer": (10, True),
+    "rules": (10, True),
+    "text": (15, False),
+    "malformed": (5, False),
+}
+
+WORDS = ("привет", "когда", "открыто", "скидка", "хлеб", "спасибо", "где", "ресторан", "hello", "ok")
+
+class Sample(NamedTuple):
+    kind: str
+    body: bytes
+    chat_id: int | None
+    expects_reply: bool
+
+def parse_mix(spec: str) -> dict:
+    """'start=50,text=50' → {"start": 50, "text": 50}; пустая строка — веса по умолчанию."""
+    if not spec:
+        return {k: w for k, (w, _) in KINDS.items()}
+    mix = {}
+    for part in spec.split(","):
+        k, _, w = part.partition("=")
+        if k not in KINDS:
+            raise SystemExit(f"unknown update kind {k!r}, expected one of {tuple(KINDS)}")
+        mix[k] = float(w or 1)
+    return mix
+
+class UpdateGenerator:
+    def __init__(self, seed: int = 0, mix: dict | None = None, chat_base: int = 10_000_000):
+        self.rnd = random.Random(seed)
+        mix = mix or parse_mix("")
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.update_id = self.rnd.randrange(1, 1 << 30)
+        self.chat_id = chat_base
+
+    def text(self, kind: str) -> str:
+        if kind == "start":
+            return "/start"
+        if kind == "start_rid":
+            return f"/start RID_{self.rnd.randrange(1, 5000)}"
+        if kind == "offer":
+            return "/offer"
+        if kind == "rules":
+            return "/rules"
+        return " ".join(self.rnd.choices(WORDS, k=self.rnd.randint(1, 8)))
+
+    def update(self, kind: str, chat_id: int) -> dict:
+        self.update_id += 1
+        user = {"id": chat_id, "is_bot": False, "first_name": "Bench", "username": f"u{chat_id}", "language_code": "ru"}
+        return {
+            "update_id": self.update_id,
+            "message": {
+                "message_id": self.update_id,
+                "date": 1700000000,
+                "chat": {"id": chat_id, "type": "private", "first_name": "Bench", "username": f"u{chat_id}"},
+                "from": user,
+                "text": self.text(kind),
+            },
+        }
+
+    def next(self, kind: str | None = None) -> Sample:
+        kind = kind or self.rnd.choices(self.kinds, self.weights)[0]
+        if kind == "malformed":
+            body = json.dumps(self.update("text", 0)).encode()
+            return Sample(kind, body[: self.rnd.randrange(1, len(body) - 1)], None, False)
+        self.chat_id += 1
+        body = json.dumps(self.update(kind, self.chat_id), ensure_ascii=False).encode()
+        return Sample(kind, body, self.chat_id, KINDS[kind][1])
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+foody_bot — Telegram-бот Foody (aiogram v3)
+Один роутер (handlers.py), одно ядро (core.py) и фабрика make_app() (app.py);
+транспорт (aiohttp / FastAPI / polling) и режим клавиатур (webapp / url / url_uid) — из config.py.
+"""
+from .app import make_app, main
+
+__all__ = ["make_app", "main"]
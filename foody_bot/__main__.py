@@ -0,0 +1,4 @@
+# python -m foody_bot — запуск с транспортом и режимом клавиатур из ENV (TRANSPORT, KEYBOARD_MODE)
+from .app import main
+
+main()
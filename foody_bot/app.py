@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+app.py — фабрика приложения: один набор хендлеров, транспорт и режим клавиатур выбираются конфигом
+• make_app(transport, keyboard): aiohttp → web.Application, fastapi → FastAPI (нужен пакет fastapi)
+• /health — JSON-статистика, /metrics — Prometheus (metrics.py)
+• POST WEBAPP_AUTH_PATH — проверка initData Mini App для веб-аппов (webapp_auth.py)
+• main(): запуск выбранного транспорта; polling — без вебхука, через dp.start_polling;
+  aiohttp с WORKERS>1 — несколько процессов за одним портом (multiproc.py)
+Запуск:  python -m foody_bot   (или любой из старых bot_webhook_*.py / main*.py)
+ENV: см. config.py
+"""
+import asyncio, logging
+from typing import TYPE_CHECKING
+from aiohttp import web
+from . import config
+from .logs import setup_logging
+
+if TYPE_CHECKING:
+    from .core import BotCore
+
+setup_logging()  # LOG_MODE=json — JSON-строки из фонового потока, см. logs.py
+log = logging.getLogger("foody_bot")
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def make_aiohttp_app(core: "BotCore") -> web.Application:
+    from .metrics import METRICS
+
+    async def webhook_post(request: web.Request):
+        status, body = await core.handle_webhook(await request.read(), request.headers.get(SECRET_HEADER))
+        if isinstance(body, dict):
+            return web.json_response(body, status=status)
+        headers = {"Retry-After": "1"} if status == 503 else None
+        return web.Response(status=status, text=body, headers=headers)
+
+    async def ok(request: web.Request):
+        # Удобный пинг через браузер
+        return web.Response(text="OK")
+
+    async def health(request: web.Request):
+        return web.json_response(core.health())
+
+    async def prom(request: web.Request):
+        return web.Response(text=core.render_metrics(), content_type="text/plain", charset="utf-8")
+
+    async def dbg(request: web.Request):
+        try:
+            info = await core.bot.get_webhook_info()
+            return web.json_response(info.model_dump())
+        except Exception as e:
+            return web.json_response({"ok": False, "error": str(e)}, status=500)
+
+    async def on_startup(app: web.Application):
+        await core.startup()
+
+    async def on_shutdown(app: web.Application):
+        await core.shutdown()
+
+    app = web.Application()
+    app["core"] = core
+    app.router.add_get("/", ok)
+    app.router.add_get("/health", health)
+    if METRICS:
+        app.router.add_get("/metrics", prom)
+    app.router.add_get("/debug/webhookinfo", dbg)
+    app.router.add_post(config.WEBHOOK_PATH, webhook_post)
+    app.router.add_get(config.WEBHOOK_PATH, ok)
+    if core.webapp_auth:
+        from .webapp_auth import add_aiohttp_routes
+        add_aiohttp_routes(app, core.webapp_auth)
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    return app
+
+def make_fastapi_app(core: "BotCore"):
+    from contextlib import asynccontextmanager
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, PlainTextResponse, Response
+    from .metrics import METRICS
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await core.startup()
+        yield
+        await core.shutdown()
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.core = core
+
+    @app.get("/health")
+    def health():
+        return core.health()
+
+    if METRICS:
+        @app.get("/metrics", response_class=PlainTextResponse)
+        def prom():
+            return core.render_metrics()
+
+    @app.post(config.WEBHOOK_PATH)
+    async def tg_webhook(request: Request):
+        status, body = await core.handle_webhook(await request.body(), request.headers.get(SECRET_HEADER))
+        if isinstance(body, dict):
+            return JSONResponse(body, status_code=status)
+        return PlainTextResponse(body, status_code=status)
+
+    if core.webapp_auth:
+        from .webapp_auth import WEBAPP_AUTH_PATH
+
+        @app.post(WEBAPP_AUTH_PATH)
+        async def webapp_auth(request: Request):
+            status, payload, headers = core.webapp_auth.handle(
+                await request.body(), request.headers.get("Authorization"), request.headers.get("Origin"))
+            return JSONResponse(payload, status_code=status, headers=headers)
+
+        @app.options(WEBAPP_AUTH_PATH)
+        def webapp_auth_preflight(request: Request):
+            status, headers = core.webapp_auth.preflight(request.headers.get("Origin"))
+            return Response(status_code=status, headers=headers)
+
+    return app
+
+async def run_polling(core: "BotCore"):
+    await core.startup(polling=True)
+    try:
+        # сессию бота закрывает core.shutdown() — после рассылок и броней, которым она ещё нужна
+        await core.dp.start_polling(core.bot, allowed_updates=core.dp.resolve_used_update_types(),
+                                    close_bot_session=False)
+    finally:
+        await core.shutdown()
+
+def make_app(transport: str | None = None, keyboard: str | None = None, processing: str | None = None):
+    from .core import BotCore  # aiogram/pydantic грузятся только там, где нужен бот (не в акцепторе multiproc)
+    transport = transport or config.TRANSPORT
+    core = BotCore(keyboard or config.KEYBOARD_MODE, processing or config.UPDATE_PROCESSING)
+    if transport == "aiohttp":
+        return make_aiohttp_app(core)
+    if transport == "fastapi":
+        return make_fastapi_app(core)
+    raise SystemExit(f"make_app: transport must be aiohttp or fastapi, got {transport!r}")
+
+def main(transport: str | None = None, keyboard: str | None = None, processing: str | None = None):
+    transport = transport or config.TRANSPORT
+    if transport not in config.TRANSPORTS:
+        raise SystemExit(f"TRANSPORT must be one of {config.TRANSPORTS}, got {transport!r}")
+    if transport == "polling":
+        from .core import BotCore
+        # апдейты разбирает сам dp.start_polling — пул и журнал вебхука не нужны
+        asyncio.run(run_polling(BotCore(keyboard or config.KEYBOARD_MODE, "inline")))
+    elif transport == "fastapi":
+        import uvicorn
+        uvicorn.run(make_app("fastapi", keyboard, processing), host="0.0.0.0", port=config.PORT)
+    else:
+        from . import multiproc
+        if multiproc.WORKERS > 1:
+            multiproc.run_workers(multiproc.WORKERS, multiproc.WORKER_MODE,
+                                  keyboard or config.KEYBOARD_MODE, processing or config.UPDATE_PROCESSING)
+        else:
+            web.run_app(make_app("aiohttp", keyboard, processing), host="0.0.0.0", port=config.PORT)
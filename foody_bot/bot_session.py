@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+bot_session.py — общая фабрика HTTP-сессии Bot API для всех точек входа
+• один постоянный пул соединений к api.telegram.org: лимиты, TTL DNS-кэша, keep-alive
+• таймауты по методам (BOT_TIMEOUTS="sendMessage=10,getWebhookInfo=5"), остальное — BOT_TIMEOUT
+• счётчики: новые соединения (TCP+TLS handshake) vs переиспользованные из пула — в stats() / /health
+• TELEGRAM_API_BASE — другой адрес Bot API (локальный bot-api сервер или bench/fake_bot_api.py)
+Использование:
+  bot = make_bot(BOT_TOKEN, default=...)      # вместо Bot(BOT_TOKEN, ...)
+  app.on_cleanup.append(close_session(bot))  # aiohttp; в FastAPI — await bot.session.close()
+ENV:
+  BOT_HTTP_POOL=100, BOT_HTTP_PER_HOST=0 (без лимита), BOT_DNS_TTL=300, BOT_KEEPALIVE=60,
+  BOT_TIMEOUT=60, BOT_TIMEOUTS, TELEGRAM_API_BASE
+"""
+import os
+from aiohttp import ClientSession, TraceConfig
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+from aiogram import Bot, __version__ as aiogram_version
+from aiogram.client.telegram import TelegramAPIServer
+from .fast_json import loads
+from .keyboards import CachedMarkupSession
+
+BOT_HTTP_POOL = int(os.getenv("BOT_HTTP_POOL", "100"))
+BOT_HTTP_PER_HOST = int(os.getenv("BOT_HTTP_PER_HOST", "0"))
+BOT_DNS_TTL = int(os.getenv("BOT_DNS_TTL", "300"))
+BOT_KEEPALIVE = float(os.getenv("BOT_KEEPALIVE", "60"))
+BOT_TIMEOUT = float(os.getenv("BOT_TIMEOUT", "60"))
+BOT_TIMEOUTS = os.getenv("BOT_TIMEOUTS", "")
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "")
+
+def parse_timeouts(spec: str) -> dict:
+    out = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            out[name.strip()] = float(value)
+    return out
+
+class PooledSession(CachedMarkupSession):
+    def __init__(self, pool: int = BOT_HTTP_POOL, per_host: int = BOT_HTTP_PER_HOST,
+                 dns_ttl: int = BOT_DNS_TTL, keepalive: float = BOT_KEEPALIVE,
+                 timeouts: dict | None = None, **kwargs):
+        kwargs.setdefault("timeout", BOT_TIMEOUT)
+        kwargs.setdefault("json_loads", loads)
+        super().__init__(**kwargs)
+        self._connector_init.update(
+            limit=pool,
+            limit_per_host=per_host,
+            ttl_dns_cache=dns_ttl,
+            keepalive_timeout=keepalive,
+        )
+        self.timeouts = parse_timeouts(BOT_TIMEOUTS) if timeouts is None else timeouts
+        self.requests = 0
+        self.conn_new = 0
+        self.conn_reused = 0
+        self.dns_misses = 0
+
+    def _trace(self) -> TraceConfig:
+        tc = TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            self.requests += 1
+
+        async def on_conn_create(session, ctx, params):
+            self.conn_new += 1
+
+        async def on_conn_reuse(session, ctx, params):
+            self.conn_reused += 1
+
+        async def on_dns_miss(session, ctx, params):
+            self.dns_misses += 1
+
+        tc.on_request_start.append(on_request_start)
+        tc.on_connection_create_end.append(on_conn_create)
+        tc.on_connection_reuseconn.append(on_conn_reuse)
+        tc.on_dns_cache_miss.append(on_dns_miss)
+        return tc
+
+    async def create_session(self) -> ClientSession:
+        # как AiohttpSession.create_session, плюс trace_configs для счётчиков пула
+        if self._should_reset_connector:
+            await self.close()
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=self._connector_type(**self._connector_init),
+                headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{aiogram_version}"},
+                trace_configs=[self._trace()],
+            )
+            self._should_reset_connector = False
+        return self._session
+
+    async def make_request(self, bot, method, timeout=None):
+        if timeout is None:
+            timeout = self.timeouts.get(method.__api_method__)
+        return await super().make_request(bot, method, timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "conn_new": self.conn_new,
+            "conn_reused": self.conn_reused,
+            "dns_misses": self.dns_misses,
+            "pool": self._connector_init.get("limit"),
+        }
+
+def make_session(**kwargs) -> PooledSession:
+    if TELEGRAM_API_BASE and "api" not in kwargs:
+        kwargs["api"] = TelegramAPIServer.from_base(TELEGRAM_API_BASE)
+    return PooledSession(**kwargs)
+
+def make_bot(token: str, **kwargs) -> Bot:
+    return Bot(token, session=make_session(), **kwargs)
+
+def close_session(bot: Bot):
+    async def _close(app):
+        await bot.session.close()
+    return _close
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+capture.py — запись входящих апдейтов вебхука для воспроизведения нагрузки (bench/replay_capture.py)
+• WEBHOOK_CAPTURE=<путь>: сырое тело каждого апдейта, прошедшего проверку секрета, и время прихода —
+  в gzip-файл JSON-строк {"t": unix, "body": "..."} (тело не в UTF-8 — "b64"); первая строка — заголовок
+  {"capture": 1, "started", "sample", "worker"}
+• выборка WEBHOOK_CAPTURE_SAMPLE — по чату, не по апдейту: попавший в выборку чат пишется целиком,
+  диалоги и порядок внутри чата сохраняются
+• record() только кладёт строку в буфер; раз в WEBHOOK_CAPTURE_FLUSH с буфер сжимается и дописывается
+  в отдельном потоке с Z_SYNC_FLUSH — файл читается (zcat, read_capture) и пока запись идёт,
+  оборванный хвост после падения пропускается
+• каждый старт процесса пишет новый файл WEBHOOK_CAPTURE.<время старта>-<pid>: дописывание к файлу, оборванному
+  падением, оставило бы новый gzip-поток за испорченным, и чтение остановилось бы на обрыве
+• WEBHOOK_CAPTURE_MB — предел сжатого файла, дальше запись останавливается (в /health — "full")
+• несколько воркеров (multiproc.py): файл у каждого свой (WEBHOOK_CAPTURE.<i>.<время>-<pid>), replay_capture
+  сливает их по времени (python bench/replay_capture.py capture.jsonl.gz.*)
+• в файле — сообщения пользователей как есть: хранить как прод-данные, не коммитить
+ENV:
+  WEBHOOK_CAPTURE (пусто — выключено), WEBHOOK_CAPTURE_SAMPLE=1.0, WEBHOOK_CAPTURE_MB=512, WEBHOOK_CAPTURE_FLUSH=1
+"""
+import os, asyncio, base64, gzip, logging, time, zlib
+from .fast_json import loads, dumps
+from .update_pool import chat_key
+
+log = logging.getLogger("foody_bot")
+
+WEBHOOK_CAPTURE = os.getenv("WEBHOOK_CAPTURE", "")
+WEBHOOK_CAPTURE_SAMPLE = float(os.getenv("WEBHOOK_CAPTURE_SAMPLE", "1.0"))
+WEBHOOK_CAPTURE_MB = float(os.getenv("WEBHOOK_CAPTURE_MB", "512"))
+WEBHOOK_CAPTURE_FLUSH = float(os.getenv("WEBHOOK_CAPTURE_FLUSH", "1"))
+
+SAMPLE_SCALE = 10_000
+
+class CaptureWriter:
+    def __init__(self, path: str = WEBHOOK_CAPTURE, sample: float = WEBHOOK_CAPTURE_SAMPLE,
+                 max_mb: float = WEBHOOK_CAPTURE_MB, flush: float = WEBHOOK_CAPTURE_FLUSH, worker: int | None = None):
+        self.path, self.flush = path, flush
+        self.file: str | None = None  # файл этого запуска, создаётся с первой записью
+        self.sample = min(1.0, max(0.0, sample))
+        self.max_bytes = int(max_mb * 2**20)
+        self.worker = worker
+        self._threshold = int(self.sample * SAMPLE_SCALE)
+        self._buf: list[str] = []
+        self._raw = None
+        self._gz = None
+        self._task: asyncio.Task | None = None
+        self.full = False
+        self.recorded = self.skipped = self.written_bytes = 0
+
+    def _keep(self, data) -> bool:
+        if self._threshold >= SAMPLE_SCALE:
+            return True
+        key = chat_key(data) if isinstance(data, dict) else None
+        if key is None:
+            key = data.get("update_id", 0) if isinstance(data, dict) else 0
+        if not isinstance(key, int):
+            key = zlib.crc32(str(key).encode())  # не hash(): у строк он свой в каждом процессе
+        # перемешивание Кнута: соседние chat_id не попадают в выборку пачками
+        return key * 2654435761 % 2**32 % SAMPLE_SCALE < self._threshold
+
+    def record(self, raw: bytes, data):
+        if self.full or not self._keep(data):
+            self.skipped += 1
+            return
+        t = round(time.time(), 6)
+        try:
+            self._buf.append(dumps({"t": t, "body": raw.decode()}))
+        except UnicodeDecodeError:
+            self._buf.append(dumps({"t": t, "b64": base64.b64encode(raw).decode()}))
+        self.recorded += 1
+
+    def _open(self):
+        self.file = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self._raw = open(self.file, "xb")
+        self._gz = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        self._gz.write((dumps({"capture": 1, "started": time.time(), "sample": self.sample,
+                               "worker": self.worker}) + "\n").encode())
+
+    def _write(self, lines: list[str]):
+        if self._gz is None:
+            self._open()
+        self._gz.write(("\n".join(lines) + "\n").encode())
+        self._gz.flush(zlib.Z_SYNC_FLUSH)
+        self._raw.flush()
+        self.written_bytes = self._raw.tell()
+
+    async def _drain(self):
+        lines, self._buf = self._buf, []
+        if not lines:
+            return
+        await asyncio.to_thread(self._write, lines)
+        if self.written_bytes >= self.max_bytes and not self.full:
+            self.full = True
+            log.warning("webhook capture %s reached %s MB, recording stopped", self.file, self.max_bytes // 2**20)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush)
+            try:
+                await self._drain()
+            except Exception:
+                log.exception("webhook capture write failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._drain()
+        if self._gz is not None:
+            await asyncio.to_thread(self._gz.close)
+            self._raw.close()
+            self._gz = self._raw = None
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "file": self.file,
+            "sample": self.sample,
+            "recorded": self.recorded,
+            "skipped": self.skipped,
+            "buffered": len(self._buf),
+            "mb": round(self.written_bytes / 2**20, 2),
+            "full": self.full,
+        }
+
+def read_capture(path: str):
+    """(t, raw) записей файла по порядку; обрыв сжатого потока (файл ещё пишется или процесс упал) — конец."""
+    with gzip.open(path, "rb") as f:
+        try:
+            for line in f:
+                try:
+                    rec = loads(line)
+                except ValueError:
+                    continue  # недописанная строка
+                if "t" not in rec:
+                    continue  # заголовок
+                body = rec.get("body")
+                yield rec["t"], body.encode() if body is not None else base64.b64decode(rec.get("b64", ""))
+        except (EOFError, zlib.error, gzip.BadGzipFile):
+            return
+
+def make_capture(worker: int | None = None) -> CaptureWriter | None:
+    if not WEBHOOK_CAPTURE:
+        return None
+    path = f"{WEBHOOK_CAPTURE}.{worker}" if worker is not None else WEBHOOK_CAPTURE
+    return CaptureWriter(path, worker=worker)
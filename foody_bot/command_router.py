@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+command_router.py — команды бота одной таблицей вместо цепочки фильтров F.text == "/..." / Command(...)
+• CommandRouter: Router, у которого message-обсервер сначала разбирает текст один раз
+  ("/name[@bot] args") и берёт хендлер из dict по имени команды — O(1) при любом числе команд;
+  слова без слэша ("start") — отдельный dict точных совпадений
+• router.command("start", args=False, words=("start",)) — регистрация; args=False — только без аргументов,
+  True — только с аргументами, None — оба случая. Хендлер получает command_args (строка после команды) и,
+  если просит, command (CommandObject, как у aiogram Command)
+• @mention чужого бота — не наша команда (как Command в aiogram; username — из bot.me(), кэшируется aiogram)
+• сообщения, не попавшие в таблицу (геопозиция, обычный текст, незнакомая команда), проверяются только
+  обычными хендлерами роутера (router.message(F.location)) — фильтры команд на них не считаются
+• хендлер из таблицы вызывается тем же путём, что и в aiogram: inner-middleware роутеров (metrics.HandlerTimer
+  видит его имя), SkipHandler передаёт событие дальше
+"""
+from aiogram import Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.filters.command import CommandObject
+
+class CommandObserver(TelegramEventObserver):
+    def __init__(self, router: Router, event_name: str):
+        super().__init__(router, event_name)
+        self.commands: dict[str, list[HandlerObject | None]] = {}  # имя → [без аргументов, с аргументами]
+        self.words: dict[str, HandlerObject] = {}
+        self.rest: list[HandlerObject] = []  # хендлеры с фильтрами — для всего, что не команда из таблицы
+
+    def register(self, callback, *filters, flags=None, **kwargs):
+        callback = super().register(callback, *filters, flags=flags, **kwargs)
+        self.rest.append(self.handlers[-1])
+        return callback
+
+    def command(self, *names: str, args: bool | None = None, words=()):
+        def wrapper(callback):
+            handler = HandlerObject(callback=callback, filters=None)
+            # в общем списке — для resolve_used_update_types и интроспекции; в проверку фильтров не попадает
+            self.handlers.append(handler)
+            for name in names:
+                slots = self.commands.setdefault(name, [None, None])
+                if args is not True:
+                    slots[0] = handler
+                if args is not False:
+                    slots[1] = handler
+            for word in words:
+                self.words[word] = handler
+            return callback
+        return wrapper
+
+    async def _lookup(self, event, kwargs: dict) -> HandlerObject | None:
+        text = getattr(event, "text", None)
+        if not text:
+            return None
+        if text[0] != "/":
+            return self.words.get(text)
+        head, *tail = text.split(maxsplit=1)
+        name, _, mention = head[1:].partition("@")
+        slots = self.commands.get(name)
+        if slots is None:
+            return None
+        args = tail[0] if tail else ""
+        handler = slots[1] if args else slots[0]
+        if handler is None:
+            return None
+        if mention:
+            me = await kwargs["bot"].me()
+            if me.username and mention.lower() != me.username.lower():
+                return None
+        kwargs["command_args"] = args
+        if "command" in handler.params:
+            kwargs["command"] = CommandObject(prefix="/", command=name, mention=mention or None, args=args or None)
+        return handler
+
+    async def _call(self, handler: HandlerObject, event, kwargs: dict):
+        kwargs["handler"] = handler
+        wrapped = self.outer_middleware.wrap_middlewares(self._resolve_middlewares(), handler.call)
+        return await wrapped(event, kwargs)
+
+    async def trigger(self, event, **kwargs):
+        handler = await self._lookup(event, kwargs)
+        if handler is not None:
+            try:
+                return await self._call(handler, event, kwargs)
+            except SkipHandler:
+                pass
+        for handler in self.rest:
+            kwargs["handler"] = handler
+            result, data = await handler.check(event, **kwargs)
+            if result:
+                kwargs.update(data)
+                try:
+                    return await self._call(handler, event, kwargs)
+                except SkipHandler:
+                    continue
+        return UNHANDLED
+
+class CommandRouter(Router):
+    def __init__(self, *, name: str | None = None):
+        super().__init__(name=name)
+        self.message = self.observers["message"] = CommandObserver(self, "message")
+
+    def command(self, *names: str, args: bool | None = None, words=()):
+        """@router.command("offer") — хендлер команды /offer (и /offer@bot, /offer <args>)."""
+        return self.message.command(*names, args=args, words=words)
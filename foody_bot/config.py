@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+config.py — настройки бота из ENV (общие для всех транспортов и режимов клавиатур)
+ENV:
+  BOT_TOKEN (обяз.), BACKEND_PUBLIC, WEBHOOK_PATH=/tg/webhook, WEBHOOK_SECRET (опц.),
+  WEBHOOK_FORCE_SET=0 (1 — переустановить вебхук на старте, например после смены WEBHOOK_SECRET),
+  API_URL, WEBAPP_MERCHANT_URL, WEBAPP_BUYER_URL,
+  TRANSPORT=aiohttp | fastapi | polling
+  KEYBOARD_MODE=webapp | url | url_uid (по умолчанию webapp, или url при USE_WEBAPP=0)
+  UPDATE_PROCESSING=background (пул воркеров, сразу 200 OK) | inline (await в запросе вебхука)
+  PORT=8000
+"""
+import os, time
+
+BOOT = time.monotonic()  # отсчёт time-to-ready: config импортируется первым во всех точках входа
+
+BOT_TOKEN = os.getenv("BOT_TOKEN", "")
+
+BACKEND_PUBLIC = os.getenv("BACKEND_PUBLIC", "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/tg/webhook")
+WEBHOOK_URL = f"{BACKEND_PUBLIC}{WEBHOOK_PATH}" if BACKEND_PUBLIC else ""
+SECRET_TOKEN = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_FORCE_SET = os.getenv("WEBHOOK_FORCE_SET", "0") in ("1","true","True")
+
+WEBAPP_MERCHANT_URL = os.getenv("WEBAPP_MERCHANT_URL", "https://foody-reg.vercel.app")
+WEBAPP_BUYER_URL = os.getenv("WEBAPP_BUYER_URL", "https://foody-buyer.vercel.app")
+API_URL = os.getenv("API_URL", "https://foodyback-production.up.railway.app")
+
+USE_WEBAPP = os.getenv("USE_WEBAPP", "1") not in ("0","false","False")
+
+TRANSPORTS = ("aiohttp", "fastapi", "polling")
+KEYBOARD_MODES = ("webapp", "url", "url_uid")
+
+TRANSPORT = os.getenv("TRANSPORT", "aiohttp")
+KEYBOARD_MODE = os.getenv("KEYBOARD_MODE") or ("webapp" if USE_WEBAPP else "url")
+UPDATE_PROCESSING = os.getenv("UPDATE_PROCESSING", "background")
+
+PORT = int(os.getenv("PORT", "8000"))
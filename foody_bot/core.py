@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+core.py — ядро бота, общее для всех транспортов
+• Bot (общая сессия + SendScheduler), Dispatcher с роутером handlers, режимом клавиатур
+  и хранилищем FSM с пределом памяти (fsm_storage.py)
+• handle_webhook(raw, secret): проверка секрета, быстрый JSON, префильтр, дедуп по update_id,
+  журнал принятых апдейтов (ingress_wal.py, INGRESS_WAL=1) до ответа, запись нагрузки (capture.py, WEBHOOK_CAPTURE), пул воркеров / inline-обработка,
+  ответ методом в теле вебхука — транспорт (aiohttp / FastAPI) только упаковывает (status, body)
+• startup(): проигрывание необработанных апдейтов из журнала, вебхук и команды меню (только leader) — сверка с текущими, запись только при отличии,
+  без сброса очереди апдейтов; time-to-ready в логе и /health; startup(polling=True) — вебхук снимается
+• shutdown(): дренаж пула, закрытие сессии
+"""
+import asyncio, logging, time
+from aiogram import Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+from . import config
+from .bot_session import make_bot
+from .capture import make_capture
+from .db import make_repository
+from .dedup import make_dedup
+from .fsm_storage import make_fsm_storage
+from .fast_json import loads, preview, UpdatePrefilter
+from .handlers import make_router, COMMANDS
+from .ingress_wal import make_ingress_wal
+from .inline_reply import InlineReply, INLINE_REPLY
+from .nearby import make_nearby
+from .nudges import make_nudges
+from .offer_docs import make_offer_docs
+from .reserve import make_inventory
+from .restaurants import make_resolver
+from . import logs, metrics
+from .send_queue import SendScheduler
+from .update_pool import make_pool, UPDATE_DRAIN_TIMEOUT
+from .webapp_auth import make_webapp_auth
+
+log = logging.getLogger("foody_bot")
+ulog = logging.getLogger("foody_bot.updates")  # построчные логи апдейтов, сэмплируются (logs.py)
+
+def make_dispatcher(keyboard: str, storage=None, **workflow) -> Dispatcher:
+    dp = Dispatcher(storage=storage, keyboard_mode=keyboard, **workflow)
+    dp.update.outer_middleware(logs.sample_middleware)  # сэмплирование логов — одно решение на апдейт
+    dp.include_router(make_router())
+    return dp
+
+class BotCore:
+    def __init__(self, keyboard: str = config.KEYBOARD_MODE, processing: str = config.UPDATE_PROCESSING,
+                 leader: bool = True, worker: int | None = None):
+        if not config.BOT_TOKEN:
+            raise SystemExit("BOT_TOKEN env is required")
+        if keyboard not in config.KEYBOARD_MODES:
+            raise SystemExit(f"KEYBOARD_MODE must be one of {config.KEYBOARD_MODES}, got {keyboard!r}")
+        self.keyboard = keyboard
+        self.processing = processing
+        # в многопроцессном режиме вебхук и команды настраивает только один воркер (multiproc.py)
+        self.leader = leader
+        self.worker = worker
+        self.created = time.monotonic()
+        self.boot: dict = {}
+        self.bot = make_bot(config.BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+        self.sender = SendScheduler()  # лимиты Telegram, приоритеты и retry_after для исходящих
+        self._sending: set[asyncio.Task] = set()  # ответы на апдейты, ждущие отправки
+        self.bot.session.middleware(self.sender)
+        self.db = make_repository()  # None — данные через HTTP бэкенда
+        self.restaurants = make_resolver(self.db)
+        self.nearby = make_nearby(self.db)
+        self.nudges = make_nudges(self.bot, self.nearby, keyboard, worker)
+        self.inventory = make_inventory(self.bot, self.nearby, self.db)
+        self.docs = make_offer_docs(self.bot, leader)
+        self.webapp_auth = make_webapp_auth()  # POST WEBAPP_AUTH_PATH — initData веб-аппов, см. app.py
+        self.fsm = make_fsm_storage(self.bot.id, worker)  # None — MemoryStorage aiogram
+        self.dp = make_dispatcher(keyboard, self.fsm, restaurants=self.restaurants, nearby_feed=self.nearby, nudges=self.nudges,
+                                  inventory=self.inventory, offer_docs=self.docs)
+        if metrics.METRICS:
+            self.bot.session.middleware(metrics.ApiTimer())  # после sender — без ожидания в очереди
+            metrics.HandlerTimer().setup(self.dp)
+        self.pool = make_pool(self.process_update)
+        # в inline-режиме 200 уходит после обработки — журнал не нужен
+        self.wal = make_ingress_wal(worker) if processing != "inline" else None
+        self.capture = make_capture(worker)  # апдейты с временем прихода для bench/replay_capture.py
+        self.dedup = make_dedup(self.bot.id)
+        # пропускаемое — из хендлеров роутеров: команды, "start" без слэша, геопозиция для /nearby
+        self.prefilter = UpdatePrefilter.for_dispatcher(self.dp)
+
+    async def process_update(self, data: dict, reply: InlineReply | None = None, seq: int | None = None):
+        sending = None
+        try:
+            t0 = time.perf_counter()
+            update = Update.model_validate(data)
+            metrics.VALIDATE.observe(time.perf_counter() - t0)
+            result = await self.dp.feed_update(self.bot, update)
+            if isinstance(result, TelegramMethod) and not (reply and reply.offer(self.bot, result)):
+                # ответ ждёт лимитов Telegram в SendScheduler, воркер пула берёт следующий апдейт
+                sending = self._send_later(result)
+        except Exception as e:
+            metrics.ERRORS.inc(type(e).__name__)
+            log.exception("update processing failed: %s", e)
+        finally:
+            if reply:
+                reply.close()
+        # отменённый (drain по таймауту) апдейт не отмечается — он проиграется из журнала при следующем старте
+        if seq is not None:
+            if sending is None:
+                self.wal.done(seq)
+            else:
+                sending.add_done_callback(lambda t: t.cancelled() or self.wal.done(seq))
+
+    def _send_later(self, method: TelegramMethod) -> asyncio.Task:
+        task = asyncio.ensure_future(self._send(method))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+        return task
+
+    async def _send(self, method: TelegramMethod):
+        try:
+            await self.bot(method)
+        except Exception as e:
+            metrics.ERRORS.inc(type(e).__name__)
+            log.exception("update reply failed: %s", e)
+
+    async def handle_webhook(self, raw: bytes, secret: str | None):
+        """→ (status, body): body — dict (вызов метода в ответе на вебхук) или текст."""
+        t0 = time.perf_counter()
+        try:
+            return await self._handle_webhook(raw, secret)
+        finally:
+            metrics.INGRESS.observe(time.perf_counter() - t0)
+
+    async def _handle_webhook(self, raw: bytes, secret: str | None):
+        # секретный заголовок от Telegram (если настроен)
+        if config.SECRET_TOKEN and secret != config.SECRET_TOKEN:
+            metrics.FORBIDDEN.inc()
+            return 403, "forbidden"
+        try:
+            data = loads(raw)
+        except Exception:
+            if self.capture:
+                self.capture.record(raw, None)
+            log.error("non-json payload: %s", preview(raw, 500))
+            metrics.UPDATES.inc("malformed")
+            return 200, "OK"
+        if self.capture:
+            self.capture.record(raw, data)
+        if isinstance(data, dict):
+            metrics.UPDATES.inc(metrics.update_type(data))
+            logs.sample_update(data.get("update_id"))
+        ulog.info("update: %s", preview(raw, 800))
+        if not self.prefilter(data):
+            return 200, "OK"
+        uid = data.get("update_id")
+        if self.dedup and await self.dedup.seen(uid):
+            # повторная доставка уже принятого апдейта — подтверждаем и не обрабатываем
+            return 200, "OK"
+        seq = None
+        if self.wal:
+            try:
+                seq = await self.wal.append(raw)  # 200 — только когда апдейт на диске
+            except OSError:
+                if self.dedup:
+                    await self.dedup.forget(uid)
+                return 503, "busy"
+        reply = InlineReply() if INLINE_REPLY else None
+        if self.processing == "inline":
+            await self.process_update(data, reply)
+        elif not self.pool.submit(data, reply, seq):
+            # очередь полна → 503, Telegram повторит доставку позже (и она не должна считаться повтором)
+            if seq is not None:
+                self.wal.done(seq)
+            if self.dedup:
+                await self.dedup.forget(uid)
+            return 503, "busy"
+        if reply:
+            payload = await reply.wait()
+            if payload is not None:
+                return 200, payload
+        return 200, "OK"
+
+    async def replay_wal(self):
+        pending = self.wal.open()
+        self.wal.start()
+        for seq, raw in pending:
+            try:
+                data = loads(raw)
+            except Exception:
+                self.wal.done(seq)
+                continue
+            if self.dedup:
+                await self.dedup.seen(data.get("update_id"))  # Telegram мог не получить наш 200 и повторить
+            if not self.pool.submit(data, None, seq):
+                await self.process_update(data, None, seq)  # очередь полна — по одному, пока освобождается
+        if pending:
+            log.info("ingress WAL: replayed %s unprocessed updates", len(pending))
+
+    async def setup_webhook(self) -> str:
+        """Сверяет get_webhook_info с нужным и ставит вебхук только при отличии; очередь апдейтов не сбрасывается."""
+        if not config.WEBHOOK_URL:
+            log.warning("BACKEND_PUBLIC not set — webhook not configured")
+            return "skipped"
+        allowed = self.dp.resolve_used_update_types()
+        try:
+            info = await self.bot.get_webhook_info()
+            # секрет из get_webhook_info не прочитать: если Telegram получает от нас 403 — секрет разошёлся
+            rejected = "403" in (info.last_error_message or "")
+            if (info.url == config.WEBHOOK_URL and set(info.allowed_updates or ()) == set(allowed)
+                    and not rejected and not config.WEBHOOK_FORCE_SET):
+                log.info("Webhook unchanged: %s (pending=%s)", info.url, info.pending_update_count)
+                return "unchanged"
+            await self.bot.set_webhook(
+                url=config.WEBHOOK_URL,
+                secret_token=config.SECRET_TOKEN or None,
+                allowed_updates=allowed,
+                drop_pending_updates=False,
+            )
+            log.info("Webhook set to %s (secret=%s, pending=%s)", config.WEBHOOK_URL, bool(config.SECRET_TOKEN),
+                     info.pending_update_count)
+            return "set"
+        except Exception as e:
+            log.exception("set_webhook failed: %s", e)
+            return "failed"
+
+    async def delete_webhook(self) -> str:
+        """Для polling: вебхук и getUpdates взаимоисключающие — снимаем вебхук, очередь апдейтов не трогаем."""
+        try:
+            await self.bot.delete_webhook(drop_pending_updates=False)
+            return "deleted"
+        except Exception as e:
+            log.exception("delete_webhook failed: %s", e)
+            return "failed"
+
+    async def setup_commands(self) -> str:
+        try:
+            current = await self.bot.get_my_commands()
+            if [(c.command, c.description) for c in current] == [(c.command, c.description) for c in COMMANDS]:
+                return "unchanged"
+            await self.bot.set_my_commands(COMMANDS)
+            return "set"
+        except Exception as e:
+            log.exception("set_my_commands failed: %s", e)
+            return "failed"
+
+    async def startup(self, polling: bool = False):
+        t0 = time.monotonic()
+        self.pool.start()
+        if self.capture:
+            self.capture.start()
+        if self.db:
+            await self.db.connect()
+        if self.fsm:
+            self.fsm.start()  # журнал FSM проигрывается до первого апдейта
+        if self.nudges:
+            self.nudges.start()  # журнал проигрывается до первого снимка офферов
+        if self.inventory:
+            self.inventory.start()
+        if self.nearby:
+            self.nearby.start()  # индекс у каждого воркера свой, первая загрузка — в фоне
+        if self.docs:
+            self.docs.start()  # хэши материалов и file_id — в фоне, до готовности /offer отвечает URL-кнопками
+        if self.wal:
+            await self.replay_wal()  # до установки вебхука: новые апдейты чата встанут в полосу после старых
+        if self.leader:
+            # вебхук и команды независимы — read-compare-write обоих параллельно
+            webhook, commands = await asyncio.gather(self.delete_webhook() if polling else self.setup_webhook(),
+                                                     self.setup_commands())
+        else:
+            webhook = commands = "follower"
+        now = time.monotonic()
+        self.boot = {
+            "ready_s": round(now - config.BOOT, 3),
+            "import_s": round(self.created - config.BOOT, 3),
+            "startup_s": round(now - t0, 3),
+            "webhook": webhook,
+            "commands": commands,
+        }
+        log.info("ready in %(ready_s).2fs (imports %(import_s).2fs, startup %(startup_s).2fs, "
+                 "webhook=%(webhook)s, commands=%(commands)s)", self.boot)
+
+    async def shutdown(self):
+        await self.pool.drain()
+        if self._sending:
+            # ответы уже обработанных апдейтов: их отправка отмечает апдейт в журнале
+            await asyncio.wait(self._sending, timeout=UPDATE_DRAIN_TIMEOUT)
+        if self.wal:
+            await self.wal.close()  # не дождавшиеся drain апдейты останутся в журнале до следующего старта
+        if self.capture:
+            await self.capture.close()
+        # фоновые рассылки отменяются до остановки SendScheduler — иначе их отправки ждали бы его вечно
+        if self.nudges:
+            await self.nudges.close()
+        if self.inventory:
+            await self.inventory.close()  # недописанные брони — в бэкенд до закрытия сессии бота
+        if self.docs:
+            await self.docs.close()
+        await self.sender.close()
+        if self.restaurants:
+            await self.restaurants.close()
+        if self.nearby:
+            await self.nearby.close()
+        if self.dedup:
+            await self.dedup.close()
+        if self.fsm:
+            await self.fsm.close()
+        if self.db:
+            await self.db.close()
+        await self.bot.session.close()
+
+    def render_metrics(self) -> str:
+        pool = self.pool.stats()
+        return metrics.render({
+            "foody_updates_in_flight": pool["busy"],
+            "foody_updates_queued": pool["queued"],
+            "foody_send_queued": self.sender.stats()["queued"],
+            "foody_startup_seconds": self.boot.get("ready_s", 0),
+            "foody_nudge_timers": len(self.nudges.wheel) if self.nudges else 0,
+            "foody_reserve_pending_ops": self.inventory.stats()["pending_ops"] if self.inventory else 0,
+        })
+
+    def health(self) -> dict:
+        return {
+            "ok": True,
+            "worker": self.worker,
+            "boot": self.boot,
+            "webhook": config.WEBHOOK_URL or None,
+            "keyboard": self.keyboard,
+            "processing": self.processing,
+            "updates": self.pool.stats(),
+            "prefilter": self.prefilter.stats(),
+            "dedup": self.dedup.stats() if self.dedup else None,
+            "ingress_wal": self.wal.stats() if self.wal else None,
+            "capture": self.capture.stats() if self.capture else None,
+            "fsm": self.fsm.stats() if self.fsm else None,
+            "restaurants": self.restaurants.stats() if self.restaurants else None,
+            "nearby": self.nearby.stats() if self.nearby else None,
+            "nudges": self.nudges.stats() if self.nudges else None,
+            "reserve": self.inventory.stats() if self.inventory else None,
+            "offer_docs": self.docs.stats() if self.docs else None,
+            "webapp_auth": self.webapp_auth.stats() if self.webapp_auth else None,
+            "db": self.db.stats() if self.db else None,
+            "send": self.sender.stats(),
+            "http": self.bot.session.stats(),
+            "logs": logs.stats(),
+        }
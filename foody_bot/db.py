@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+db.py — собственный доступ бота к таблицам restaurants / offers (схема — scripts/seed_demo.sql)
+• DATABASE_URL=postgres://... — asyncpg (опциональная зависимость): пул DB_POOL_MIN..DB_POOL_MAX соединений,
+  подготовленные выражения кэшируются на соединении (DB_STATEMENT_CACHE); текст каждого запроса фиксирован,
+  поэтому повторный вызов — всегда попадание в кэш
+• DATABASE_URL=sqlite:///path — stdlib sqlite3 для локального запуска, тестов и бенчмарков: DB_POOL_MAX соединений
+  в очереди, запросы — в пуле потоков того же размера (event loop не ждёт диск), cached_statements на соединении
+• списки id передаются одним параметром (Postgres: = ANY($1), SQLite: IN (SELECT value FROM json_each(?))) —
+  офферы сотни ресторанов — один запрос с одним текстом, а не N запросов и не N вариантов IN (?, ?, ...)
+• Repository: restaurant / restaurants_by_ids / offers_for_restaurants / snapshot (источник NearbyFeed) /
+  apply_reservations (пачка броней reserve.py в одной транзакции: блокировка остатков, решение, одна запись)
+• без DATABASE_URL бот работает как раньше — через HTTP бэкенда API_URL
+• python -m foody_bot.db --seed scripts/seed_demo.sql — создать схему и залить seed в SQLite (диалект
+  NOW() AT TIME ZONE 'UTC' + INTERVAL переводится в datetime('now', ...))
+ENV:
+  DATABASE_URL (postgres://... | sqlite:///foody.db), DB_POOL_MIN=1, DB_POOL_MAX=10, DB_TIMEOUT=5, DB_STATEMENT_CACHE=100
+"""
+import os, re, asyncio, json, logging, sqlite3, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from .nearby import Offer
+from .restaurants import Restaurant
+
+log = logging.getLogger("foody_bot")
+
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "5"))
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "100"))
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS restaurants (
+    id TEXT PRIMARY KEY, title TEXT NOT NULL, lat REAL, lng REAL
+);
+CREATE TABLE IF NOT EXISTS offers (
+    id TEXT PRIMARY KEY, restaurant_id TEXT NOT NULL REFERENCES restaurants(id), title TEXT NOT NULL,
+    price_cents INTEGER NOT NULL, qty_total INTEGER NOT NULL, qty_left INTEGER NOT NULL, expires_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS offers_restaurant_id ON offers (restaurant_id);
+"""
+
+# expires_at сразу в unix-секундах на стороне БД — разбор дат в Python дороже самого запроса на снимке
+_OFFER_COLS = "id, restaurant_id, title, price_cents, qty_left, {epoch}"
+
+# timestamp без зоны — UTC (seed: NOW() AT TIME ZONE 'UTC'), EXTRACT(EPOCH) и strftime('%s') так его и читают
+_PG_OFFER = _OFFER_COLS.format(epoch="EXTRACT(EPOCH FROM expires_at)::float8")
+_SQLITE_OFFER = _OFFER_COLS.format(epoch="CAST(strftime('%s', expires_at) AS REAL)")
+
+PG_SQL = {
+    "restaurant": "SELECT id, title, lat, lng FROM restaurants WHERE id = $1",
+    "restaurants": "SELECT id, title, lat, lng FROM restaurants WHERE id = ANY($1::text[])",
+    "all_restaurants": "SELECT id, title, lat, lng FROM restaurants",
+    "offers_for": f"SELECT {_PG_OFFER} FROM offers WHERE restaurant_id = ANY($1::text[]) "
+                  "AND qty_left > 0 AND expires_at > $2 ORDER BY expires_at",
+    "live_offers": f"SELECT {_PG_OFFER} FROM offers WHERE qty_left > 0 AND expires_at > $1",
+    "lock_stock": "SELECT id, qty_left FROM offers WHERE id = ANY($1::text[]) FOR UPDATE",
+    "set_stock": "UPDATE offers SET qty_left = v.qty FROM unnest($1::text[], $2::int[]) AS v(id, qty) "
+                 "WHERE offers.id = v.id",
+}
+
+SQLITE_SQL = {
+    "restaurant": "SELECT id, title, lat, lng FROM restaurants WHERE id = ?",
+    "restaurants": "SELECT id, title, lat, lng FROM restaurants WHERE id IN (SELECT value FROM json_each(?))",
+    "all_restaurants": "SELECT id, title, lat, lng FROM restaurants",
+    "offers_for": f"SELECT {_SQLITE_OFFER} FROM offers WHERE restaurant_id IN (SELECT value FROM json_each(?)) "
+                  "AND qty_left > 0 AND expires_at > ? ORDER BY expires_at",
+    "live_offers": f"SELECT {_SQLITE_OFFER} FROM offers WHERE qty_left > 0 AND expires_at > ?",
+    "lock_stock": "SELECT id, qty_left FROM offers WHERE id IN (SELECT value FROM json_each(?))",
+    "set_stock": "UPDATE offers SET qty_left = ? WHERE id = ?",
+}
+
+def _utc(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+
+class PgDatabase:
+    sql = PG_SQL
+
+    def __init__(self, url: str, min_size: int = DB_POOL_MIN, max_size: int = DB_POOL_MAX):
+        self.url, self.min_size, self.max_size = url, min_size, max_size
+        self.pool = None
+        self.queries = 0
+
+    async def connect(self):
+        import asyncpg  # опциональная зависимость: нужна только с DATABASE_URL=postgres://...
+        self.pool = await asyncpg.create_pool(self.url, min_size=self.min_size, max_size=self.max_size,
+                                              command_timeout=DB_TIMEOUT, statement_cache_size=DB_STATEMENT_CACHE)
+
+    def ids(self, ids) -> list:
+        return list(ids)
+
+    def ts(self, t: float) -> datetime:
+        return _utc(t)
+
+    async def fetch(self, name: str, *args) -> list:
+        self.queries += 1
+        async with self.pool.acquire(timeout=DB_TIMEOUT) as conn:
+            return [tuple(r) for r in await conn.fetch(self.sql[name], *args)]
+
+    async def update_stock(self, ids: list, decide) -> dict:
+        """В одной транзакции: остатки ids под FOR UPDATE → decide(stock) → новые остатки одной записью."""
+        self.queries += 2
+        async with self.pool.acquire(timeout=DB_TIMEOUT) as conn, conn.transaction():
+            stock = {r[0]: r[1] for r in await conn.fetch(self.sql["lock_stock"], ids)}
+            new = decide(dict(stock))
+            changed = {k: v for k, v in new.items() if stock.get(k) != v}
+            if changed:
+                await conn.execute(self.sql["set_stock"], list(changed), list(changed.values()))
+        return new
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    def stats(self) -> dict:
+        p = self.pool
+        return {"driver": "asyncpg", "queries": self.queries,
+                "size": p.get_size() if p else 0, "idle": p.get_idle_size() if p else 0}
+
+class SqliteDatabase:
+    """Пул sqlite3-соединений: очередь свободных + потоки того же размера; ожидание соединения — без блокировки loop."""
+    sql = SQLITE_SQL
+
+    def __init__(self, path: str, size: int = DB_POOL_MAX):
+        self.path, self.size = path, max(1, size)
+        self._free: asyncio.Queue | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self.queries = 0
+        self.wait_max = 0.0
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=DB_TIMEOUT, check_same_thread=False,
+                               cached_statements=DB_STATEMENT_CACHE, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")  # читатели не ждут писателя
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    async def connect(self):
+        self._executor = ThreadPoolExecutor(self.size, thread_name_prefix="foody-db")
+        self._free = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        first = await loop.run_in_executor(self._executor, self._open)
+        await loop.run_in_executor(self._executor, first.executescript, SQLITE_SCHEMA)
+        self._free.put_nowait(first)
+        for _ in range(self.size - 1):
+            self._free.put_nowait(await loop.run_in_executor(self._executor, self._open))
+
+    def ids(self, ids) -> str:
+        return json.dumps(list(ids))
+
+    def ts(self, t: float) -> str:
+        return _utc(t).strftime("%Y-%m-%d %H:%M:%S")
+
+    @asynccontextmanager
+    async def _conn(self):
+        t0 = time.monotonic()
+        conn = await asyncio.wait_for(self._free.get(), DB_TIMEOUT)
+        self.wait_max = max(self.wait_max, time.monotonic() - t0)
+        try:
+            yield conn
+        finally:
+            self._free.put_nowait(conn)
+
+    async def _run(self, fn, *args):
+        async with self._conn() as conn:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, conn, *args)
+
+    async def fetch(self, name: str, *args) -> list:
+        self.queries += 1
+        sql = self.sql[name]
+        return await self._run(lambda conn: conn.execute(sql, args).fetchall())
+
+    async def update_stock(self, ids: list, decide) -> dict:
+        self.queries += 2
+
+        def tx(conn: sqlite3.Connection) -> dict:
+            conn.execute("BEGIN IMMEDIATE")  # писатель один — остатки не поменяются между чтением и записью
+            try:
+                stock = dict(conn.execute(self.sql["lock_stock"], (self.ids(ids),)).fetchall())
+                new = decide(dict(stock))
+                conn.executemany(self.sql["set_stock"], [(v, k) for k, v in new.items() if stock.get(k) != v])
+                conn.execute("COMMIT")
+                return new
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        return await self._run(tx)
+
+    async def close(self):
+        if self._free is not None:
+            while not self._free.empty():
+                self._free.get_nowait().close()
+            self._free = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {"driver": "sqlite3", "queries": self.queries, "size": self.size,
+                "idle": self._free.qsize() if self._free else 0, "wait_max_ms": round(self.wait_max * 1000, 1)}
+
+def _restaurant(r) -> Restaurant:
+    return Restaurant(r[0], r[1], r[2], r[3])
+
+def _offer(r) -> Offer:
+    return Offer._make(r)
+
+class Repository:
+    def __init__(self, db):
+        self.db = db
+
+    async def connect(self):
+        await self.db.connect()
+
+    async def restaurant(self, rid: str) -> Restaurant | None:
+        rows = await self.db.fetch("restaurant", rid)
+        return _restaurant(rows[0]) if rows else None
+
+    async def restaurants_by_ids(self, ids) -> dict[str, Restaurant]:
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+        return {r[0]: _restaurant(r) for r in await self.db.fetch("restaurants", self.db.ids(ids))}
+
+    async def offers_for_restaurants(self, ids, now: float | None = None) -> dict[str, list[Offer]]:
+        """Живые офферы (qty_left > 0, не истекли) всех ids одним запросом, по возрастанию expires_at."""
+        ids = list(dict.fromkeys(ids))
+        out: dict[str, list[Offer]] = {rid: [] for rid in ids}
+        if ids:
+            for r in await self.db.fetch("offers_for", self.db.ids(ids), self.db.ts(now or time.time())):
+                out[r[1]].append(_offer(r))
+        return out
+
+    async def snapshot(self):
+        """Источник для NearbyFeed: (рестораны, живые офферы) двумя запросами параллельно."""
+        rs, ofs = await asyncio.gather(self.db.fetch("all_restaurants"),
+                                       self.db.fetch("live_offers", self.db.ts(time.time())))
+        return [_restaurant(r) for r in rs], [_offer(r) for r in ofs]
+
+    async def apply_reservations(self, ops: list[dict]) -> dict:
+        """Sink для reserve.Inventory: брони по порядку, пока хватает остатка; отмена броней, отклонённых
+        в этой же пачке, остаток не возвращает. Ответ — как у бэкенда: {"rejected": [...], "qty_left": {...}}."""
+        rejected: list[str] = []
+
+        def decide(stock: dict) -> dict:
+            refused = set()
+            for op in ops:
+                oid = op["offer_id"]
+                if oid not in stock:
+                    if op["op"] == "reserve":
+                        refused.add(op["id"])
+                elif op["op"] == "reserve":
+                    if stock[oid] >= op["qty"]:
+                        stock[oid] -= op["qty"]
+                    else:
+                        refused.add(op["id"])
+                elif op["id"] not in refused:
+                    stock[oid] += op["qty"]
+            rejected.extend(refused)
+            return stock
+
+        qty = await self.db.update_stock(sorted({op["offer_id"] for op in ops}), decide)
+        return {"rejected": rejected, "qty_left": qty}
+
+    async def close(self):
+        await self.db.close()
+
+    def stats(self) -> dict:
+        return self.db.stats()
+
+def make_database(url: str):
+    if url.startswith(("postgres://", "postgresql://")):
+        return PgDatabase(url)
+    if url.startswith("sqlite:///"):
+        return SqliteDatabase(url.removeprefix("sqlite:///"))
+    raise SystemExit(f"DATABASE_URL must be postgres://... or sqlite:///path, got {url!r}")
+
+def make_repository(url: str = DATABASE_URL) -> Repository | None:
+    return Repository(make_database(url)) if url else None
+
+_INTERVAL_RE = re.compile(r"NOW\(\)\s+AT\s+TIME\s+ZONE\s+'UTC'\s*([+-])\s*INTERVAL\s+'([^']+)'", re.I)
+
+def seed_sqlite(path: str, script: str):
+    """Схема + seed-скрипт Postgres в SQLite-файл (для локального запуска и бенчмарков)."""
+    sql = _INTERVAL_RE.sub(lambda m: f"datetime('now', '{m.group(1)}{m.group(2)}')", script)
+    sql = re.sub(r"NOW\(\)\s+AT\s+TIME\s+ZONE\s+'UTC'", "datetime('now')", sql, flags=re.I)
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(SQLITE_SCHEMA)
+        conn.executescript(sql)
+        conn.commit()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="SQLite stand-in: схема и seed")
+    ap.add_argument("--url", default=DATABASE_URL or "sqlite:///foody.db")
+    ap.add_argument("--seed", default=os.path.join(os.path.dirname(__file__), "..", "scripts", "seed_demo.sql"))
+    a = ap.parse_args()
+    if not a.url.startswith("sqlite:///"):
+        raise SystemExit("--seed is for the SQLite stand-in; apply seed_demo.sql to Postgres with psql")
+    with open(a.seed, encoding="utf-8") as f:
+        seed_sqlite(a.url.removeprefix("sqlite:///"), f.read())
+    print(f"seeded {a.url} from {a.seed}")
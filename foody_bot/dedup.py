@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+dedup.py — отбрасываем повторные доставки апдейтов по update_id (до pydantic-валидации)
+• Telegram повторяет апдейт, если ответ на вебхук медленный или не 2xx — без дедупа /start отвечается дважды
+• локально: битовая карта-кольцо на DEDUP_WINDOW последних update_id (update_id растут монотонно) — O(1), 8 КиБ;
+  update_id ниже окна — сброс счётчика Telegram (после ~недели без апдейтов он начинается заново со случайного
+  значения): окно очищается и начинается с нового id, апдейт принимается
+• для нескольких реплик: общий Redis-совместимый бэкенд (SET key 1 NX EX ttl); MemoryRedis — фейк в процессе
+• forget(): если апдейт не приняли (503), отметку снимаем — повторная доставка должна пройти
+ENV:
+  DEDUP=1 (по умолчанию включён), DEDUP_WINDOW=65536, DEDUP_REDIS_URL (опц.), DEDUP_TTL=3600
+"""
+import os, time, logging
+
+log = logging.getLogger("foody_bot")
+
+DEDUP = os.getenv("DEDUP", "1") not in ("0","false","False")
+DEDUP_WINDOW = int(os.getenv("DEDUP_WINDOW", "65536"))
+DEDUP_REDIS_URL = os.getenv("DEDUP_REDIS_URL", "")
+DEDUP_TTL = int(os.getenv("DEDUP_TTL", "3600"))
+
+class UpdateWindow:
+    """Битовая карта-кольцо: update_id в окне (top - size, top]; id ниже окна — сброс счётчика, окно заново."""
+    def __init__(self, size: int = DEDUP_WINDOW):
+        self.size = max(8, size - size % 8)
+        self.bits = bytearray(self.size // 8)
+        self.top = None
+        self.resets = 0
+
+    def _clear(self, lo: int, hi: int):
+        # освобождаем слоты (lo, hi] при сдвиге окна вперёд
+        if hi - lo >= self.size:
+            self.bits = bytearray(self.size // 8)
+            return
+        for uid in range(lo + 1, hi + 1):
+            i = uid % self.size
+            self.bits[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+    def add(self, uid: int) -> bool:
+        """True — update_id новый (и теперь отмечен), False — повтор."""
+        if self.top is None:
+            self.top = uid
+        elif uid > self.top:
+            self._clear(self.top, uid)
+            self.top = uid
+        elif uid <= self.top - self.size:
+            # повтор так поздно не приходит — Telegram начал update_id заново
+            log.warning("update_id went back from %s to %s: dedup window reset", self.top, uid)
+            self.bits = bytearray(self.size // 8)
+            self.top = uid
+            self.resets += 1
+        i = uid % self.size
+        mask = 1 << (i & 7)
+        if self.bits[i >> 3] & mask:
+            return False
+        self.bits[i >> 3] |= mask
+        return True
+
+    def discard(self, uid: int):
+        if self.top is not None and self.top - self.size < uid <= self.top:
+            i = uid % self.size
+            self.bits[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+class MemoryRedis:
+    """Минимальный in-process фейк Redis (SET NX EX / DELETE) для тестов и одиночного инстанса."""
+    def __init__(self):
+        self._data: dict = {}
+        self._ops = 0
+
+    async def set(self, name, value, ex=None, nx=False):
+        now = time.monotonic()
+        self._ops += 1
+        if self._ops % 4096 == 0:
+            # ленивое удаление просроченных ключей
+            self._data = {k: v for k, v in self._data.items() if v[1] is None or v[1] > now}
+        exp = self._data.get(name)
+        if nx and exp is not None and (exp[1] is None or exp[1] > now):
+            return None
+        self._data[name] = (value, now + ex if ex else None)
+        return True
+
+    async def delete(self, *names):
+        return sum(self._data.pop(n, None) is not None for n in names)
+
+class UpdateDedup:
+    def __init__(self, window: int = DEDUP_WINDOW, backend=None, ttl: int = DEDUP_TTL, prefix: str = "foody:upd:"):
+        self.window = UpdateWindow(window)
+        self.backend = backend
+        self.ttl = ttl
+        self.prefix = prefix
+        self.duplicates = 0
+
+    async def seen(self, uid) -> bool:
+        """True — апдейт уже был (его надо молча подтвердить 200 OK и не обрабатывать)."""
+        if not isinstance(uid, int):
+            return False
+        if not self.window.add(uid):
+            self.duplicates += 1
+            return True
+        if self.backend is not None:
+            try:
+                ok = await self.backend.set(f"{self.prefix}{uid}", 1, ex=self.ttl, nx=True)
+            except Exception as e:
+                log.warning("dedup backend failed, local only: %s", e)
+                return False
+            if not ok:
+                self.duplicates += 1
+                return True
+        return False
+
+    async def forget(self, uid):
+        if not isinstance(uid, int):
+            return
+        self.window.discard(uid)
+        if self.backend is not None:
+            try:
+                await self.backend.delete(f"{self.prefix}{uid}")
+            except Exception as e:
+                log.warning("dedup backend delete failed: %s", e)
+
+    async def close(self):
+        close = getattr(self.backend, "aclose", None)
+        if close:
+            await close()
+
+    def stats(self) -> dict:
+        return {"duplicates": self.duplicates, "top": self.window.top, "resets": self.window.resets, "shared": self.backend is not None}
+
+def make_dedup(bot_id: int) -> UpdateDedup | None:
+    if not DEDUP:
+        return None
+    backend = None
+    if DEDUP_REDIS_URL:
+        import redis.asyncio as redis  # опциональная зависимость, нужна только для нескольких реплик
+        backend = redis.from_url(DEDUP_REDIS_URL)
+    return UpdateDedup(backend=backend, prefix=f"foody:upd:{bot_id}:")
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+fast_json.py — быстрый разбор тела вебхука и дешёвый префильтр апдейтов
+• loads(): orjson → msgspec → stdlib json (что установлено); JSON_BACKEND=json — принудительно stdlib
+• dumps(): тем же бэкендом в str — для JSON-логов (logs.py)
+• preview(): для лога режем сырые байты тела, а не json.dumps(data) всего апдейта
+• UpdatePrefilter: по сырому dict отбрасывает апдейты, которые не поймает ни один роутер dp,
+  ещё до Update.model_validate (pydantic); что пропускать, берётся из зарегистрированных хендлеров
+  (for_dispatcher): таблицы CommandRouter — команды и слова, F.<поле> — сообщения с этим полем;
+  любой другой хендлер сообщений (обычный текст, состояние FSM, свой фильтр) — сообщения не сужаются
+ENV:
+  JSON_BACKEND (auto|orjson|msgspec|json), UPDATE_PREFILTER=1 (по умолчанию включён)
+"""
+import os, json
+
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto")
+UPDATE_PREFILTER = os.getenv("UPDATE_PREFILTER", "1") not in ("0","false","False")
+
+def _pick_loads():
+    if JSON_BACKEND in ("auto", "orjson"):
+        try:
+            import orjson
+            return "orjson", orjson.loads
+        except ImportError:
+            pass
+    if JSON_BACKEND in ("auto", "msgspec"):
+        try:
+            import msgspec
+            return "msgspec", msgspec.json.Decoder().decode
+        except ImportError:
+            pass
+    return "json", json.loads
+
+backend, loads = _pick_loads()
+
+def _pick_dumps():
+    # тот же бэкенд, что и для loads; результат — str (для логов JSON-строками)
+    if backend == "orjson":
+        import orjson
+        return lambda obj: orjson.dumps(obj, default=str).decode()
+    if backend == "msgspec":
+        import msgspec
+        enc = msgspec.json.Encoder(enc_hook=str)
+        return lambda obj: enc.encode(obj).decode()
+    return lambda obj: json.dumps(obj, ensure_ascii=False, default=str)
+
+dumps = _pick_dumps()
+
+def preview(raw: bytes, limit: int = 800) -> str:
+    return raw[:limit].decode("utf-8", "replace")
+
+# виды апдейтов, где есть текст сообщения
+MESSAGE_KINDS = ("message", "edited_message", "channel_post", "edited_channel_post", "business_message")
+
+def _required_field(filters) -> str | None:
+    """Поле сообщения, без которого хендлер не сработает: фильтр ровно F.<поле>; иначе None."""
+    from magic_filter.operations import GetAttributeOperation
+    for f in filters or ():
+        ops = getattr(getattr(f, "magic", None), "_operations", ())
+        if len(ops) == 1 and isinstance(ops[0], GetAttributeOperation):
+            return ops[0].name
+    return None
+
+class UpdatePrefilter:
+    """
+    kinds     — виды апдейтов, на которые есть хендлеры (dp.resolve_used_update_types())
+    texts     — если задано: для сообщений пропускаем только команды ("/...") и эти слова;
+                сообщения без текста (стикеры, фото) отбрасываем
+    fields    — поля сообщения без текста, на которые есть хендлеры (например, {"location"})
+    """
+    def __init__(self, kinds, texts: set | None = None, fields: set | None = None):
+        self.kinds = frozenset(kinds)
+        self.texts = frozenset(texts) if texts is not None else None
+        self.fields = frozenset(fields or ())
+        self.passed = 0
+        self.dropped = 0
+
+    @classmethod
+    def for_dispatcher(cls, dp):
+        kinds = dp.resolve_used_update_types()
+        texts, fields = set(), set()
+        for router in dp.chain_tail:
+            for kind in MESSAGE_KINDS:
+                observer = router.observers.get(kind)
+                if observer is None:
+                    continue
+                table = getattr(observer, "words", None)  # command_router.CommandObserver
+                texts.update(table or ())
+                for handler in observer.handlers:
+                    if handler.filters is None and table is not None:
+                        continue  # команда из таблицы: "/..." пропускается всегда
+                    field = _required_field(handler.filters)
+                    if field is None or field in ("text", "caption"):
+                        return cls(kinds)  # хендлер может поймать любое сообщение — не сужаем
+                    fields.add(field)
+        return cls(kinds, texts, fields)
+
+    def __call__(self, data) -> bool:
+        ok = self._match(data) if UPDATE_PREFILTER else True
+        if ok:
+            self.passed += 1
+        else:
+            self.dropped += 1
+        return ok
+
+    def _match(self, data) -> bool:
+        if not isinstance(data, dict):
+            return False
+        kind = next((k for k in data if k != "update_id"), None)
+        if kind not in self.kinds:
+            return False
+        if self.texts is not None and kind in MESSAGE_KINDS:
+            msg = data[kind] or {}
+            text = msg.get("text")
+            if not isinstance(text, str):
+                return any(f in msg for f in self.fields)
+            return text.startswith("/") or text in self.texts
+        return True
+
+    def stats(self) -> dict:
+        return {"passed": self.passed, "dropped": self.dropped, "json": backend}
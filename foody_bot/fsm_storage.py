@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+fsm_storage.py — хранилище FSM aiogram с ограничением памяти вместо MemoryStorage (тот никогда не вытесняет)
+• запись на пользователя компактная: ключ личного чата — одно число user_id (группа — (chat_id, user_id),
+  прочее — полный кортеж StorageKey), значение — строка состояния (одна на все записи с этим состоянием)
+  или (state, data в JSON-строке); пустое состояние без данных — записи нет вовсе
+• поколения: записи лежат в dict-ах по интервалам времени FSM_TTL / 16; чтение или запись переносит запись
+  в текущее поколение, поколение целиком старше FSM_TTL удаляется за одно del — без таймстемпа на запись
+  и без кучи; запись живёт от FSM_TTL до FSM_TTL + 1/16 с последнего обращения
+• жёсткий предел FSM_MAX_MB (оценка по размеру записей): при превышении вытесняются записи самых старых
+  поколений (LRU с точностью до поколения) до 95% предела
+• данные FSM должны сериализоваться в JSON (как в RedisStorage); get_data отдаёт новый dict на каждый вызов
+• FSM_STATE — журнал JSON-строк (формат nudges.NudgeLog): изменения дописываются раз в FSM_FLUSH с,
+  при старте журнал проигрывается (истёкшие записи пропускаются) и сжимается в снимок, при росте — тоже;
+  время чтений попадает в файл только со снимком, вытеснения не пишутся — при старте предел применяется заново
+• несколько воркеров (multiproc.py): файл у каждого свой (FSM_STATE.<i>), чат всегда приходит в один воркер
+ENV:
+  FSM_STORAGE=memory (MemoryStorage aiogram) | bounded, FSM_TTL=86400 (0 — без срока, только предел памяти),
+  FSM_MAX_MB=64, FSM_STATE (пусто — без файла; например fsm.jsonl), FSM_FLUSH=1, FSM_COMPACT=100000
+"""
+import os, asyncio, logging, time
+from typing import Any
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType, DEFAULT_DESTINY
+from .fast_json import loads, dumps
+from .nudges import NudgeLog
+
+log = logging.getLogger("foody_bot")
+
+FSM_STORAGE = os.getenv("FSM_STORAGE", "memory")
+FSM_TTL = float(os.getenv("FSM_TTL", "86400"))
+FSM_MAX_MB = float(os.getenv("FSM_MAX_MB", "64"))
+FSM_STATE = os.getenv("FSM_STATE", "")
+FSM_FLUSH = float(os.getenv("FSM_FLUSH", "1"))
+FSM_COMPACT = int(os.getenv("FSM_COMPACT", "100000"))
+
+GENERATIONS = 16
+MAX_GENERATIONS = 2 * GENERATIONS  # без TTL старые поколения сливаются, чтобы поиск не удлинялся
+# оценка байт на запись (bench/bench_fsm.py): слот dict + ключ-число; кортеж (state, data) + строка — сверху
+ENTRY_BYTES = 90
+DATA_BYTES = 105
+TUPLE_KEY_BYTES = 80
+
+def _size(key, value) -> int:
+    n = ENTRY_BYTES if type(key) is int else ENTRY_BYTES + TUPLE_KEY_BYTES
+    return n if type(value) is str else n + DATA_BYTES + len(value[1])
+
+class BoundedStorage(BaseStorage):
+    def __init__(self, bot_id: int = 0, ttl: float = FSM_TTL, max_mb: float = FSM_MAX_MB, path: str = FSM_STATE,
+                 flush: float = FSM_FLUSH):
+        self.bot_id, self.ttl, self.flush = bot_id, ttl, flush
+        self.max_bytes = int(max_mb * 2**20)
+        self.step = ttl / GENERATIONS if ttl > 0 else 3600.0
+        self.gens: dict[int, dict] = {}  # номер поколения → {ключ: значение}, от старых к новым
+        self.cur = int(time.time() // self.step)
+        self.bytes = 0
+        self.log = NudgeLog(path)
+        self._states: dict[str, str] = {}
+        self.hits = self.misses = self.expired = self.evicted = 0
+        self._task: asyncio.Task | None = None
+
+    @property
+    def size(self) -> int:
+        # не __len__: пустое хранилище не должно быть ложным (Dispatcher и BotCore проверяют его через or / if)
+        return sum(map(len, self.gens.values()))
+
+    # ---------- ключи и значения ----------
+    def _key(self, k: StorageKey):
+        if (k.thread_id is None and k.business_connection_id is None and k.destiny == DEFAULT_DESTINY
+                and k.bot_id == self.bot_id):
+            return k.user_id if k.chat_id == k.user_id else (k.chat_id, k.user_id)
+        return (k.bot_id, k.chat_id, k.user_id, k.thread_id, k.business_connection_id, k.destiny)
+
+    def _value(self, state: str | None, data: str | None):
+        if state is not None:
+            state = self._states.setdefault(state, state)
+        if data is None:
+            return state
+        return (state, data)
+
+    # ---------- поколения ----------
+    def _tick(self, now: float | None = None):
+        g = int((now or time.time()) // self.step)
+        if g > self.cur:
+            self.cur = g
+            self._expire()
+
+    def _expire(self):
+        if self.ttl > 0:
+            edge = self.cur - GENERATIONS  # поколение edge и старше закончилось больше FSM_TTL назад
+            for g in [g for g in self.gens if g < edge]:
+                d = self.gens.pop(g)
+                self.expired += len(d)
+                self.bytes -= sum(_size(k, v) for k, v in d.items())
+        while len(self.gens) > MAX_GENERATIONS:
+            oldest, nxt = list(self.gens)[:2]
+            merged = self.gens.pop(oldest)  # старые записи — в начале слитого поколения, их вытеснение первым
+            merged.update(self.gens[nxt])
+            self.gens[nxt] = merged
+
+    def _get(self, key):
+        found = None
+        for g, d in reversed(self.gens.items()):
+            value = d.get(key)
+            if value is not None:
+                found = g
+                break
+        if found is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if found != self.cur:
+            # обращение продлевает запись: переезд в текущее поколение
+            del d[key]
+            if not d:
+                del self.gens[found]
+            self.gens.setdefault(self.cur, {})[key] = value
+        return value
+
+    def _put(self, key, state: str | None, data: str | None):
+        for d in reversed(self.gens.values()):
+            old = d.pop(key, None)
+            if old is not None:
+                self.bytes -= _size(key, old)
+                break
+        self.log.append([key, state, data, int(time.time())])
+        if state is None and data is None:
+            return
+        value = self._value(state, data)
+        self.gens.setdefault(self.cur, {})[key] = value
+        self.bytes += _size(key, value)
+        if self.bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        target = self.max_bytes * 0.95
+        for g in list(self.gens):
+            d = self.gens[g]
+            while d and self.bytes > target:
+                key = next(iter(d))  # самый давний в поколении; popitem() взял бы свежий
+                value = d.pop(key)
+                self.bytes -= _size(key, value)
+                self.evicted += 1
+            if not d:
+                del self.gens[g]
+            if self.bytes <= target:
+                break
+
+    # ---------- BaseStorage ----------
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self._tick()
+        k = self._key(key)
+        old = self._get(k)
+        state = state.state if isinstance(state, State) else state
+        self._put(k, state, None if old is None or type(old) is str else old[1])
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        self._tick()
+        value = self._get(self._key(key))
+        return value if value is None or type(value) is str else value[0]
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        self._tick()
+        k = self._key(key)
+        old = self._get(k)
+        self._put(k, old if old is None or type(old) is str else old[0], dumps(data) if data else None)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        self._tick()
+        value = self._get(self._key(key))
+        return {} if value is None or type(value) is str else loads(value[1])
+
+    # ---------- журнал ----------
+    def _snapshot(self):
+        for g, d in self.gens.items():
+            t = (g + 0.5) * self.step
+            for key, value in d.items():
+                if type(value) is str:
+                    yield [key, value, None, t]
+                else:
+                    yield [key, value[0], value[1], t]
+
+    def restore(self, now: float | None = None):
+        now = now or time.time()
+        ops = self.log.load()
+        live: dict = {}
+        for op in ops:
+            try:
+                key, state, data, t = op
+            except (TypeError, ValueError):
+                continue
+            if isinstance(key, list):
+                key = tuple(key)
+            if state is None and data is None:
+                live.pop(key, None)
+            else:
+                live[key] = (state, data, t)
+        self.cur = int(now // self.step)
+        gens: dict[int, dict] = {}
+        for key, (state, data, t) in live.items():
+            g = min(int(t // self.step), self.cur)
+            value = self._value(state, data)
+            gens.setdefault(g, {})[key] = value
+            self.bytes += _size(key, value)
+        self.gens = dict(sorted(gens.items()))
+        self._expire()
+        if self.bytes > self.max_bytes:
+            self._evict()
+        self.log.compact(self._snapshot())
+        if ops:
+            log.info("fsm restored: %s keys from %s ops (%s expired, %s evicted)", self.size, len(ops),
+                     self.expired, self.evicted)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush)
+            try:
+                self._tick()
+                self.log.flush()
+                if self.log.ops > max(FSM_COMPACT, 2 * self.size):
+                    self.log.compact(self._snapshot())
+            except Exception:
+                log.exception("fsm journal flush failed")
+
+    def start(self):
+        if self._task is None:
+            self.restore()
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        # зовут и Dispatcher (FSM middleware на shutdown), и BotCore.shutdown
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.log.close()
+
+    def stats(self) -> dict:
+        return {
+            "keys": self.size,
+            "generations": len(self.gens),
+            "mb": round(self.bytes / 2**20, 2),
+            "max_mb": round(self.max_bytes / 2**20, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "journal_ops": self.log.ops,
+        }
+
+def make_fsm_storage(bot_id: int, worker: int | None = None) -> BoundedStorage | None:
+    if FSM_STORAGE != "bounded":
+        return None  # Dispatcher возьмёт MemoryStorage
+    path = f"{FSM_STATE}.{worker}" if FSM_STATE and worker is not None else FSM_STATE
+    return BoundedStorage(bot_id, path=path)
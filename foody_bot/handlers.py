@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+handlers.py — единый роутер команд Foody (для всех транспортов и режимов клавиатур)
+• /start, /start <rid> (deep-link; rid проверяется по бэкенду через restaurants.py), /offer, /rules
+• /offer — URL-кнопки на материалы или, с OFFER_DOCS_MODE=file_id, сами документы по file_id (offer_docs.py)
+• /nearby → запрос геопозиции; присланная геопозиция → ближайшие живые предложения (nearby.py)
+• 🔔 под ними (callback nudge:<rid>) — подписка/отписка на напоминания о конце предложений точки (nudges.py)
+• 🛒 (rsv:<offer_id>) — бронь из остатков в памяти (reserve.py), ✖ (rsvx:<offer_id>) — отмена; /reserve <offer_id> — карточка
+• хендлеры возвращают метод (return m.answer(...)), а не await-ят его: так ответ можно отдать
+  прямо в теле ответа на вебхук (INLINE_REPLY), иначе его отправит обработчик апдейта
+• команды — таблицей CommandRouter (command_router.py): один разбор текста и поиск в dict вместо фильтра
+  на каждую команду; /cmd@bot и /cmd <args> — тот же хендлер, аргументы — в command_args
+• режим клавиатур и резолвер rid приходят из workflow data диспетчера: Dispatcher(keyboard_mode=..., restaurants=..., nearby_feed=..., nudges=..., inventory=...,
+  offer_docs=...)
+"""
+import logging, time
+from aiogram import F
+from aiogram.types import CallbackQuery, Message, BotCommand
+from aiogram.utils.markdown import html_decoration as html
+from .command_router import CommandRouter
+from .keyboards import kb_main, kb_rules, kb_buyer, kb_nearby, KB_OFFER, KB_LOCATION, NUDGE_CB
+from .nearby import Nearby, NearbyFeed, NEARBY, NEARBY_RADIUS_KM
+from .nudges import NudgeScheduler
+from .offer_docs import OfferDocs
+from .reserve import Inventory, offer_buttons, RESERVE, RESERVE_CB, RESERVE_CANCEL_CB
+from .restaurants import RestaurantLookupError, RestaurantNotFound, RestaurantResolver
+
+log = logging.getLogger("foody_bot.updates")  # строка на каждый апдейт — сэмплируется (logs.py)
+
+COMMANDS = [
+    BotCommand(command="start", description="Старт"),
+    BotCommand(command="offer", description="Материалы (PDF/XLSX)"),
+    BotCommand(command="rules", description="Правила для ресторанов"),
+]
+# в меню — только включённые функции (бронь живёт на остатках из снимков /nearby)
+if NEARBY:
+    COMMANDS.append(BotCommand(command="nearby", description="Предложения рядом"))
+    if RESERVE:
+        COMMANDS.append(BotCommand(command="reserve", description="Забронировать предложение"))
+
+async def start(m: Message, keyboard_mode: str):
+    log.info("start (keyboard=%s) chat=%s", keyboard_mode, m.chat.id)
+    return m.answer("Foody: спасаем еду вместе.\nКоманды: /offer /rules", reply_markup=kb_main(keyboard_mode, m))
+
+async def start_with_arg(m: Message, keyboard_mode: str, restaurants: RestaurantResolver | None = None,
+                         command_args: str = ""):
+    # формат: "/start <payload>", где payload используем как rid
+    payload = command_args.strip()
+    log.info("start (with arg) chat=%s rid=%s", m.chat.id, payload)
+    if payload and restaurants is not None:
+        try:
+            place = await restaurants.resolve(payload)
+        except RestaurantNotFound:
+            # точки нет — битый rid в ссылку ЛК не передаём
+            return m.answer(
+                "Foody: точка по ссылке не найдена. Откройте ЛК партнёра:",
+                reply_markup=kb_main(keyboard_mode, m),
+            )
+        except RestaurantLookupError:
+            pass  # бэкенд недоступен — как раньше, rid без проверки
+        else:
+            return m.answer(
+                f"Foody: точка «{html.quote(place.title)}» передана через deep-link. Откройте ЛК партнёра:",
+                reply_markup=kb_main(keyboard_mode, m, place.id),
+            )
+    return m.answer(
+        "Foody: точка передана через deep-link. Откройте ЛК партнёра:",
+        reply_markup=kb_main(keyboard_mode, m, payload or None),
+    )
+
+def format_nearby(hits: list[Nearby], now: float) -> str:
+    lines = ["Рядом с вами:"]
+    for i, h in enumerate(hits, 1):
+        lines.append(f"\n{i}. <b>{html.quote(h.restaurant.title)}</b> — {h.km:.1f} км")
+        for o in h.offers[:3]:
+            mins = max(1, int((o.expires_at - now) // 60))
+            lines.append(f"   • {html.quote(o.title)} — {o.price_cents / 100:.0f} ₽, осталось {o.qty_left}, ещё {mins} мин")
+    return "\n".join(lines)
+
+async def nearby(m: Message):
+    log.info("/nearby chat=%s", m.chat.id)
+    return m.answer("Поделитесь геопозицией — покажем ближайшие предложения:", reply_markup=KB_LOCATION)
+
+async def location(m: Message, keyboard_mode: str, nearby_feed: NearbyFeed | None = None,
+                   nudges: NudgeScheduler | None = None, inventory: Inventory | None = None):
+    log.info("location chat=%s", m.chat.id)
+    if nearby_feed is None or not nearby_feed.ready:
+        return m.answer("Поиск рядом пока недоступен, загляните на витрину:", reply_markup=kb_buyer(keyboard_mode))
+    now = time.time()
+    hits = nearby_feed.index.nearest(m.location.latitude, m.location.longitude, now=now)
+    if not hits:
+        return m.answer(f"В радиусе {NEARBY_RADIUS_KM:g} км сейчас нет предложений. Загляните на витрину:",
+                        reply_markup=kb_buyer(keyboard_mode))
+    text = format_nearby(hits, now)
+    places = tuple((h.restaurant.id, h.restaurant.title) for h in hits) if nudges else ()
+    offers = offer_buttons(o for h in hits for o in h.offers[:3]) if inventory else ()
+    if nudges:
+        text += "\n\n🔔 — напомним, пока предложения точки не закончились"
+    return m.answer(text, reply_markup=kb_nearby(keyboard_mode, places, offers))
+
+async def nudge_toggle(c: CallbackQuery, nudges: NudgeScheduler | None = None):
+    log.info("nudge chat=%s %s", c.from_user.id, c.data)
+    if nudges is None:
+        return c.answer("Напоминания сейчас выключены")
+    on = nudges.toggle(c.from_user.id, c.data.removeprefix(NUDGE_CB))
+    if on is None:
+        return c.answer("Слишком много подписок — отключите ненужные повторным нажатием", show_alert=True)
+    if on:
+        return c.answer(f"🔔 Напомним за {', '.join(map(str, nudges.before))} мин до конца предложений")
+    return c.answer("🔕 Напоминания по этой точке выключены")
+
+async def reserve(m: Message, keyboard_mode: str, inventory: Inventory | None = None, command_args: str = ""):
+    log.info("/reserve chat=%s", m.chat.id)
+    oid = command_args.strip()
+    s = inventory.stock.get(oid) if inventory and oid else None
+    if s is None or s.qty_left <= 0 or s.offer.expires_at <= time.time():
+        return m.answer("Выберите предложение в /nearby или в напоминании — кнопка 🛒 под ним.")
+    o = s.offer
+    return m.answer(
+        f"<b>{html.quote(o.title)}</b> — {o.price_cents / 100:.0f} ₽, осталось {s.qty_left}",
+        reply_markup=kb_nearby(keyboard_mode, (), offer_buttons([o])),
+    )
+
+async def reserve_tap(c: CallbackQuery, inventory: Inventory | None = None):
+    log.info("reserve chat=%s %s", c.from_user.id, c.data)
+    if inventory is None:
+        return c.answer("Бронирование сейчас недоступно")
+    chat_id = c.message.chat.id if c.message else c.from_user.id
+    status, r = inventory.reserve(c.data.removeprefix(RESERVE_CB), c.from_user.id, chat_id)
+    if status == "ok":
+        title = inventory.stock[r.offer_id].offer.title
+        # подтверждение с кнопкой отмены — отдельным сообщением в фоне, ответ на нажатие — сразу в теле вебхука
+        inventory.notify(chat_id, f"✅ Забронировано: <b>{html.quote(title)}</b>\nКод брони: <code>{r.id}</code>",
+                         cancel_offer=r.offer_id)
+        return c.answer(f"✅ Забронировано! Код брони: {r.id}", show_alert=True)
+    if status == "already":
+        return c.answer(f"У вас уже есть бронь: {r.id}", show_alert=True)
+    if status == "sold_out":
+        return c.answer("😔 Уже всё разобрали", show_alert=True)
+    if status == "busy":
+        return c.answer("Бронирование временно недоступно, попробуйте через минуту", show_alert=True)
+    return c.answer("Предложение закончилось", show_alert=True)
+
+async def reserve_cancel(c: CallbackQuery, inventory: Inventory | None = None):
+    log.info("reserve cancel chat=%s %s", c.from_user.id, c.data)
+    r = inventory.cancel(c.data.removeprefix(RESERVE_CANCEL_CB), c.from_user.id) if inventory else None
+    if r is None:
+        return c.answer("Активной брони нет")
+    return c.answer(f"Бронь {r.id} отменена")
+
+async def offer(m: Message, offer_docs: OfferDocs | None = None):
+    log.info("/offer chat=%s", m.chat.id)
+    if offer_docs is None or not offer_docs.ready:
+        return m.answer("Материалы:", reply_markup=KB_OFFER)
+    return await offer_docs.answer(m)
+
+async def rules(m: Message, keyboard_mode: str):
+    log.info("/rules chat=%s", m.chat.id)
+    return m.answer("Правила для ресторанов:", reply_markup=kb_rules(keyboard_mode))
+
+def make_router() -> CommandRouter:
+    # новый Router на каждый Dispatcher: роутер можно подключить только к одному родителю
+    router = CommandRouter(name="foody")
+    router.command("start", args=False, words=("start",))(start)
+    router.command("start", args=True)(start_with_arg)
+    router.command("offer")(offer)
+    router.command("rules")(rules)
+    router.command("nearby")(nearby)
+    router.command("reserve")(reserve)
+    router.message(F.location)(location)
+    router.callback_query(F.data.startswith(NUDGE_CB))(nudge_toggle)
+    router.callback_query(F.data.startswith(RESERVE_CB))(reserve_tap)
+    router.callback_query(F.data.startswith(RESERVE_CANCEL_CB))(reserve_cancel)
+    return router
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+ingress_wal.py — журнал принятых апдейтов на диске: быстрый 200 вебхуку без потери апдейта при падении процесса
+• вебхук (пул, UPDATE_PROCESSING=background) отвечает 200 до обработки — без журнала апдейты из очереди пула
+  и in-flight пропадают вместе с процессом, Telegram их уже не повторит
+• append(raw): сырое тело апдейта дописывается в текущий сегмент, 200 — только после fsync;
+  групповая запись: одновременные вебхуки ждут общий fsync (до INGRESS_WAL_BATCH записей за раз,
+  INGRESS_WAL_DELAY_MS — сколько первая запись может ждать попутчиков), fsync — в отдельном потоке,
+  пока он идёт, следующая пачка набирается
+• done(seq) после feed_update — отметка без ожидания fsync, уходит на диск с ближайшей пачкой
+  (потерянная отметка — только повтор апдейта после рестарта)
+• сегменты по INGRESS_WAL_SEGMENT_MB; сегмент удаляется, когда все апдейты в нём и в более старых обработаны
+• при старте необработанные апдейты проигрываются в пул до установки вебхука, update_id отмечается в дедупе —
+  доставка at-least-once (хендлер может увидеть апдейт повторно, если упали между обработкой и отметкой)
+• запись: заголовок (тип, seq, длина, crc32) + тело; оборванный хвост сегмента после падения отбрасывается
+• ошибка записи пачки (OSError, например ENOSPC): её апдейты получают 503, хвост сегмента обрезается
+  до последней целой пачки (не вышло — новый сегмент), иначе следующие записи легли бы за обрывом и не читались
+• несколько воркеров (multiproc.py): каталог у каждого свой (INGRESS_WAL_DIR/<i>)
+ENV:
+  INGRESS_WAL=0, INGRESS_WAL_DIR=wal, INGRESS_WAL_SEGMENT_MB=64, INGRESS_WAL_BATCH=256,
+  INGRESS_WAL_DELAY_MS=0, INGRESS_WAL_FSYNC=1 (0 — только запись в page cache: переживает падение процесса,
+  но не ОС)
+"""
+import os, asyncio, logging, struct, time, zlib
+
+log = logging.getLogger("foody_bot")
+
+INGRESS_WAL = os.getenv("INGRESS_WAL", "0") in ("1","true","True")
+INGRESS_WAL_DIR = os.getenv("INGRESS_WAL_DIR", "wal")
+INGRESS_WAL_SEGMENT_MB = float(os.getenv("INGRESS_WAL_SEGMENT_MB", "64"))
+INGRESS_WAL_BATCH = int(os.getenv("INGRESS_WAL_BATCH", "256"))
+INGRESS_WAL_DELAY_MS = float(os.getenv("INGRESS_WAL_DELAY_MS", "0"))
+INGRESS_WAL_FSYNC = os.getenv("INGRESS_WAL_FSYNC", "1") not in ("0","false","False")
+
+HEADER = struct.Struct("<BQII")  # тип, seq, длина тела, crc32 тела
+UPDATE, DONE = 1, 2
+_sync = getattr(os, "fdatasync", os.fsync)
+
+def read_segment(path: str):
+    """(тип, seq, тело) записей сегмента до первой оборванной или испорченной."""
+    with open(path, "rb") as f:
+        data = f.read()
+    pos, end = 0, len(data)
+    while pos + HEADER.size <= end:
+        kind, seq, n, crc = HEADER.unpack_from(data, pos)
+        body = data[pos + HEADER.size:pos + HEADER.size + n]
+        if kind not in (UPDATE, DONE) or len(body) != n or zlib.crc32(body) != crc:
+            break
+        yield kind, seq, body
+        pos += HEADER.size + n
+
+class IngressWAL:
+    def __init__(self, path: str = INGRESS_WAL_DIR, segment_mb: float = INGRESS_WAL_SEGMENT_MB,
+                 batch: int = INGRESS_WAL_BATCH, delay_ms: float = INGRESS_WAL_DELAY_MS, fsync: bool = INGRESS_WAL_FSYNC):
+        self.path = path
+        self.segment_bytes = int(segment_mb * 2**20)
+        self.batch, self.delay, self.fsync = max(1, batch), delay_ms / 1000, fsync
+        self.seq = 0
+        self._pending: list[tuple[int, bytes, asyncio.Future]] = []  # ждут записи
+        self._marks: list[bytes] = []  # отметки done до следующей пачки
+        self._segments: dict[int, int] = {}  # номер сегмента → необработанных апдейтов, от старых к новым
+        self._seg_of: dict[int, int] = {}  # seq → сегмент, пока апдейт не обработан
+        self._seg = 0
+        self._f = None
+        self._size = 0
+        self._wake = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self.appended = self.completed = self.commits = self.replayed = self.errors = 0
+        self.fsync_s = 0.0
+
+    def _seg_path(self, n: int) -> str:
+        return os.path.join(self.path, f"{n:010d}.wal")
+
+    # ---------- старт ----------
+    def open(self) -> list[tuple[int, bytes]]:
+        """Читает сегменты, открывает новый; → необработанные апдейты (seq, raw) по порядку."""
+        os.makedirs(self.path, exist_ok=True)
+        pending: dict[int, tuple[int, bytes]] = {}
+        for name in sorted(f for f in os.listdir(self.path) if f.endswith(".wal")):
+            n = int(name[:-4])
+            self._segments[n] = 0
+            self._seg = max(self._seg, n)
+            for kind, seq, body in read_segment(os.path.join(self.path, name)):
+                self.seq = max(self.seq, seq)
+                if kind == UPDATE:
+                    pending[seq] = (n, body)
+                else:
+                    pending.pop(seq, None)
+        for seq, (n, _) in pending.items():
+            self._seg_of[seq] = n
+            self._segments[n] += 1
+        self._seg += 1
+        self._open_segment()
+        self._trim()
+        self.replayed = len(pending)
+        return [(seq, body) for seq, (_, body) in sorted(pending.items())]
+
+    def _open_segment(self):
+        self._f = open(self._seg_path(self._seg), "ab")
+        self._size = self._f.tell()
+        self._segments.setdefault(self._seg, 0)
+
+    def _trim(self):
+        # только с головы: отметка done лежит в том же или более позднем сегменте, что и сам апдейт
+        for n in list(self._segments):
+            if n == self._seg or self._segments[n] > 0:
+                break
+            del self._segments[n]
+            try:
+                os.unlink(self._seg_path(n))
+            except OSError as e:
+                log.warning("ingress WAL: cannot remove segment %s: %s", n, e)
+
+    # ---------- запись ----------
+    async def append(self, raw: bytes) -> int:
+        """Записывает апдейт и ждёт fsync его пачки; → seq для done(). OSError — апдейт не записан."""
+        self.seq += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((self.seq, HEADER.pack(UPDATE, self.seq, len(raw), zlib.crc32(raw)) + raw, fut))
+        self._wake.set()
+        if len(self._pending) >= self.batch:
+            self._full.set()
+        return await fut
+
+    def done(self, seq: int):
+        n = self._seg_of.pop(seq, None)
+        if n is None:
+            return
+        self._marks.append(HEADER.pack(DONE, seq, 0, 0))
+        self._segments[n] -= 1
+        self.completed += 1
+
+    def _write(self, data: bytes) -> float:
+        self._f.write(data)
+        self._f.flush()
+        if not self.fsync:
+            return 0.0
+        t0 = time.perf_counter()
+        _sync(self._f.fileno())
+        return time.perf_counter() - t0
+
+    async def _commit(self):
+        take = self._pending[:self.batch]
+        del self._pending[:self.batch]
+        marks, self._marks = self._marks, []
+        data = b"".join(marks + [rec for _, rec, _ in take])
+        try:
+            if self._f is None:
+                self._open_segment()  # после прошлого сбоя сегмент не открылся заново
+            if self.fsync:
+                self.fsync_s += await asyncio.to_thread(self._write, data)
+            else:
+                self._write(data)
+        except OSError as e:
+            self.errors += 1
+            log.error("ingress WAL write failed: %s", e)
+            self._marks[:0] = marks
+            self._rollback()
+            for _, _, fut in take:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        self._size += len(data)
+        self.commits += 1
+        self.appended += len(take)
+        for seq, _, fut in take:
+            self._seg_of[seq] = self._seg
+            self._segments[self._seg] += 1
+            if fut.done():
+                self.done(seq)  # вебхук уже отменён — Telegram доставит апдейт повторно сам
+            else:
+                fut.set_result(seq)
+        if self._size >= self.segment_bytes:
+            self._f.close()
+            self._seg += 1
+            self._open_segment()
+            self._trim()
+
+    def _rollback(self):
+        # часть пачки могла лечь на диск: обрезаем до self._size — конца последней подтверждённой пачки
+        f, self._f = self._f, None
+        if f is not None:
+            try:
+                f.close()  # недописанный буфер выбрасывается вместе с ошибкой flush
+            except OSError:
+                pass
+        try:
+            with open(self._seg_path(self._seg), "r+b") as t:
+                t.truncate(self._size)
+        except OSError as e:
+            log.error("ingress WAL: cannot truncate segment %s, starting a new one: %s", self._seg, e)
+            self._seg += 1
+        try:
+            self._open_segment()
+        except OSError as e:
+            log.error("ingress WAL: cannot reopen segment %s: %s", self._seg, e)
+
+    async def _loop(self):
+        while True:
+            if not self._pending:
+                if self._closing:
+                    return
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            if self.delay and len(self._pending) < self.batch:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.delay)
+                except asyncio.TimeoutError:
+                    pass
+            await self._commit()
+
+    def start(self):
+        if self._f is None:
+            self.open()
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        # пачка не прерывается посреди fsync: цикл дописывает очередь и выходит сам
+        self._closing = True
+        self._wake.set()
+        self._full.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._f is not None:
+            if self._marks:
+                self._write(b"".join(self._marks))
+                self._marks = []
+            self._f.close()
+            self._f = None
+            self._trim()
+
+    def stats(self) -> dict:
+        return {
+            "unprocessed": len(self._seg_of),
+            "waiting_fsync": len(self._pending),
+            "segments": len(self._segments),
+            "appended": self.appended,
+            "completed": self.completed,
+            "replayed": self.replayed,
+            "commits": self.commits,
+            "avg_batch": round(self.appended / self.commits, 1) if self.commits else 0,
+            "avg_fsync_ms": round(self.fsync_s / self.commits * 1000, 3) if self.commits else 0,
+            "errors": self.errors,
+        }
+
+def make_ingress_wal(worker: int | None = None) -> IngressWAL | None:
+    if not INGRESS_WAL:
+        return None
+    return IngressWAL(os.path.join(INGRESS_WAL_DIR, str(worker)) if worker is not None else INGRESS_WAL_DIR)
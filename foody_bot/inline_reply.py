@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+inline_reply.py — ответ на команду прямо в теле ответа на вебхук (без отдельного HTTPS sendMessage)
+• Telegram разрешает вернуть в ответе на вебхук один вызов Bot API: {"method": "sendMessage", ...}
+• Хендлер возвращает метод (return m.answer(...)), а не await-ит его; если обработка уложилась
+  в INLINE_REPLY_TIMEOUT, метод уходит в ответе на вебхук, иначе — обычным вызовом из воркера
+• Результат такого вызова боту недоступен, файлы (InputFile) так не отправить — для них обычный вызов
+ENV:
+  INLINE_REPLY=0 (по умолчанию выключено), INLINE_REPLY_TIMEOUT=0.5 (сек)
+"""
+import os, asyncio
+
+INLINE_REPLY = os.getenv("INLINE_REPLY", "0") not in ("0","false","False")
+INLINE_REPLY_TIMEOUT = float(os.getenv("INLINE_REPLY_TIMEOUT", "0.5"))
+
+class InlineReply:
+    def __init__(self):
+        self._fut = asyncio.get_running_loop().create_future()
+
+    def offer(self, bot, method) -> bool:
+        """False — вебхук уже ответил или метод нельзя вернуть инлайн; тогда вызывающий шлёт его сам."""
+        if self._fut.done():
+            return False
+        fields, files = bot.session.prepare_fields(bot, method)
+        if files:
+            return False
+        self._fut.set_result({"method": method.__api_method__, **fields})
+        return True
+
+    def close(self):
+        if not self._fut.done():
+            self._fut.set_result(None)
+
+    async def wait(self, timeout: float = INLINE_REPLY_TIMEOUT) -> dict | None:
+        """Тело ответа на вебхук ({"method": ..., ...}) или None — тогда просто 200 OK."""
+        done, _ = await asyncio.wait({self._fut}, timeout=timeout)
+        if not done:
+            self._fut.cancel()  # опоздавший offer() вернёт False → обычный вызов
+            return None
+        return self._fut.result()
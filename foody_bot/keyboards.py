@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+keyboards.py — предсобранные inline-клавиатуры
+• freeze(markup) — клавиатура собирается один раз при старте, JSON для sendMessage сериализуется тогда же
+• CachedMarkupSession — AiohttpSession, которая подставляет готовый JSON вместо model_dump + json.dumps
+• KB_CACHE_SIZE — размер LRU для клавиатур с deep-link rid и персональных (режим url_uid с tg_uid и т.п.)
+• Меню Foody: kb_main(mode, m, rid), KB_OFFER (из offer_docs.OFFER_DOCS), kb_rules(mode), kb_buyer(mode);
+  mode = webapp | url | url_uid
+• KB_LOCATION — reply-клавиатура с запросом геопозиции для /nearby
+• kb_nearby(mode, places, offers) — 🔔 подписка на напоминания по точкам из ответа /nearby (callback NUDGE_CB<rid>),
+  🛒 бронь офферов (RESERVE_CB<offer_id>) + витрина; kb_reserved(offer_id) — ✖ отмена брони
+"""
+import os, json, urllib.parse
+from functools import lru_cache
+from aiohttp import FormData
+from pydantic import PrivateAttr
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.types import (
+    InlineKeyboardMarkup, InlineKeyboardButton, KeyboardButton, Message, ReplyKeyboardMarkup, WebAppInfo,
+)
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from .config import API_URL, WEBAPP_MERCHANT_URL, WEBAPP_BUYER_URL
+from .offer_docs import OFFER_DOCS, doc_url
+from .reserve import RESERVE_CB, RESERVE_CANCEL_CB
+
+KB_CACHE_SIZE = int(os.getenv("KB_CACHE_SIZE", "10000"))
+
+class FrozenMarkup(InlineKeyboardMarkup):
+    _json: str = PrivateAttr(default="")
+
+def freeze(markup: InlineKeyboardMarkup) -> FrozenMarkup:
+    fm = FrozenMarkup(inline_keyboard=markup.inline_keyboard)
+    # тот же вид, что даёт BaseSession.prepare_value: без None-полей, json.dumps
+    fm._json = json.dumps(markup.model_dump(exclude_none=True, warnings=False))
+    return fm
+
+class CachedMarkupSession(AiohttpSession):
+    def prepare_fields(self, bot, method) -> tuple[dict, dict]:
+        # поля запроса как в AiohttpSession.build_form_data; замороженная клавиатура — готовой строкой
+        markup = getattr(method, "reply_markup", None)
+        frozen = isinstance(markup, FrozenMarkup)
+        fields, files = {}, {}
+        for key, value in method.model_dump(warnings=False, exclude={"reply_markup"} if frozen else None).items():
+            value = self.prepare_value(value, bot=bot, files=files)
+            if not value:
+                continue
+            fields[key] = value
+        if frozen:
+            fields["reply_markup"] = markup._json
+        return fields, files
+
+    def build_form_data(self, bot, method) -> FormData:
+        fields, files = self.prepare_fields(bot, method)
+        form = FormData(quote_fields=False)
+        for key, value in fields.items():
+            form.add_field(key, value)
+        for key, value in files.items():
+            form.add_field(key, value.read(bot), filename=value.filename or key)
+        return form
+
+# ---------- Меню Foody ----------
+# web_app-кнопки доступны ТОЛЬКО в приватных чатах; BotFather должен иметь /setdomain на доменах веб-аппов
+
+def make_params(uid, uname: str, first: str, extra: dict | None = None) -> str:
+    q = {
+        "api": API_URL,
+        "tg_uid": uid,
+        "tg_uname": uname,
+        "tg_first": first,
+    }
+    if extra: q.update(extra)
+    return urllib.parse.urlencode(q, doseq=False, safe="")
+
+def _button(text: str, url: str, webapp: bool) -> InlineKeyboardButton:
+    if webapp:
+        return InlineKeyboardButton(text=text, web_app=WebAppInfo(url=url))
+    return InlineKeyboardButton(text=text, url=url)
+
+def _column(*buttons) -> FrozenMarkup:
+    kb = InlineKeyboardBuilder()
+    for b in buttons:
+        kb.row(b)
+    return freeze(kb.as_markup())
+
+@lru_cache(maxsize=KB_CACHE_SIZE)
+def _kb_main(mode: str, rid: str | None) -> FrozenMarkup:
+    webapp = mode == "webapp"
+    rid_q = f"&{urllib.parse.urlencode({'rid': rid})}" if rid else ""
+    return _column(
+        _button("👨‍🍳 ЛК партнёра", f"{WEBAPP_MERCHANT_URL}/?api={API_URL}{rid_q}", webapp),
+        _button("🍽 Для покупателя", f"{WEBAPP_BUYER_URL}/?api={API_URL}", webapp),
+        _button("📄 Материалы", f"{WEBAPP_MERCHANT_URL}/docs/index.html", webapp),
+    )
+
+# клавиатура зависит только от (uid, uname, first, rid) — повторные /start не пересобирают её
+@lru_cache(maxsize=KB_CACHE_SIZE)
+def _kb_main_uid(uid, uname: str, first: str, rid: str | None) -> FrozenMarkup:
+    extra = {"rid": rid} if rid else None
+    return _column(
+        _button("👨‍🍳 ЛК партнёра", f"{WEBAPP_MERCHANT_URL}/?{make_params(uid, uname, first, extra)}", False),
+        _button("🍽 Для покупателя", f"{WEBAPP_BUYER_URL}/?{make_params(uid, uname, first)}", False),
+        _button("📄 Материалы", f"{WEBAPP_MERCHANT_URL}/docs/index.html", False),
+    )
+
+def kb_main(mode: str, m: Message, rid: str | None = None) -> FrozenMarkup:
+    if mode != "url_uid":
+        return _kb_main(mode, rid)
+    u = m.from_user
+    if not u:
+        return _kb_main_uid("", "", "", rid)
+    return _kb_main_uid(u.id, u.username or "", u.first_name or "", rid)
+
+# PDF/XLSX пусть открываются во внешнем браузере — URL (список файлов — offer_docs.OFFER_DOCS)
+KB_OFFER = _column(*(_button(d.caption, doc_url(d), False) for d in OFFER_DOCS))
+
+@lru_cache(maxsize=None)
+def kb_rules(mode: str) -> FrozenMarkup:
+    # в режиме webapp правила открываем как web_app, чтобы оставаться внутри Telegram
+    return _column(_button("📘 Открыть правила", f"{WEBAPP_MERCHANT_URL}/docs/rules.html", mode == "webapp"))
+
+# /nearby: геопозицию умеет запросить только обычная (reply) клавиатура; после отправки она скрывается
+KB_LOCATION = ReplyKeyboardMarkup(
+    keyboard=[[KeyboardButton(text="📍 Отправить геопозицию", request_location=True)]],
+    resize_keyboard=True,
+    one_time_keyboard=True,
+)
+
+@lru_cache(maxsize=None)
+def kb_buyer(mode: str) -> FrozenMarkup:
+    return _column(_button("🍽 Открыть витрину", f"{WEBAPP_BUYER_URL}/?api={API_URL}", mode == "webapp"))
+
+NUDGE_CB = "nudge:"
+
+@lru_cache(maxsize=KB_CACHE_SIZE)
+def kb_nearby(mode: str, places: tuple, offers: tuple = ()) -> FrozenMarkup:
+    """places — ((rid, title), ...), offers — ((offer_id, подпись), ...) из reserve.offer_buttons;
+    callback_data длиннее 64 байт Telegram не примет — такую точку без кнопки."""
+    buttons = [
+        InlineKeyboardButton(text=text, callback_data=f"{RESERVE_CB}{oid}") for oid, text in offers
+    ] + [
+        InlineKeyboardButton(text=f"🔔 {title[:40]}", callback_data=f"{NUDGE_CB}{rid}")
+        for rid, title in places
+        if len(f"{NUDGE_CB}{rid}".encode()) <= 64
+    ]
+    return _column(*buttons, *kb_buyer(mode).inline_keyboard[0])
+
+@lru_cache(maxsize=KB_CACHE_SIZE)
+def kb_reserved(offer_id: str) -> FrozenMarkup:
+    return _column(InlineKeyboardButton(text="✖ Отменить бронь", callback_data=f"{RESERVE_CANCEL_CB}{offer_id}"))
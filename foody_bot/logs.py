@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+logs.py — настройка логирования процесса (вызывается из app.py при импорте)
+• LOG_MODE=plain (по умолчанию): как раньше — текст в stderr синхронно из event loop
+• LOG_MODE=json: запись кладётся в ограниченную очередь (QueueHandler), отдельный поток (QueueListener)
+  форматирует её в JSON-строку (fast_json.dumps) и пишет в stderr — event loop не ждёт ни write(), ни форматирования;
+  msg % args тоже собирается в потоке (аргументы логов — строки и числа), extra=... попадает полями JSON
+• очередь переполнена: DEBUG/INFO отбрасываются, WARNING и выше вытесняют самую старую запись очереди —
+  event loop не ждёт никогда; всё выброшенное — в счётчике dropped
+• сэмплирование построчных логов апдейтов: на логгеры LOG_SAMPLED (тело апдейта и строки хендлеров —
+  foody_bot.updates, «Update id=... is handled» — aiogram.event) ставится SampleFilter с долей LOG_SAMPLE;
+  решение одно на апдейт — по хэшу update_id (sample_update() в core и middleware диспетчера кладут его
+  в contextvar): строки апдейта пишутся или выбрасываются вместе, в том числе в разных задачах;
+  WARNING и выше проходят всегда
+ENV:
+  LOG_MODE=plain|json, LOG_LEVEL=INFO, LOG_SAMPLE=1 (доля 0..1, 0.01 — 1%),
+  LOG_SAMPLED=foody_bot.updates,aiogram.event, LOG_QUEUE_MAX=10000
+"""
+import atexit, logging, os, queue, random, sys
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from .fast_json import dumps
+
+LOG_MODES = ("plain", "json")
+LOG_MODE = os.getenv("LOG_MODE", "plain")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE = float(os.getenv("LOG_SAMPLE", "1"))
+LOG_SAMPLED = tuple(n for n in os.getenv("LOG_SAMPLED", "foody_bot.updates,aiogram.event").split(",") if n)
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))
+
+PLAIN_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+
+# стандартные атрибуты LogRecord; всё остальное пришло через extra=...
+_RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for k, v in record.__dict__.items():
+            if k not in _RESERVED:
+                out[k] = v
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return dumps(out)
+
+# update_id апдейта, который сейчас обрабатывается в этой задаче — по нему SampleFilter решает за весь апдейт
+_update_id: ContextVar[int | None] = ContextVar("log_update_id", default=None)
+
+def sample_update(update_id) -> None:
+    """Отмечает текущий апдейт: дальнейшие логи этой задачи сэмплируются вместе."""
+    _update_id.set(update_id if isinstance(update_id, int) else None)
+
+async def sample_middleware(handler, update, data):
+    """Outer middleware dp.update: polling и пул воркеров — строки хендлеров и aiogram.event того же апдейта."""
+    sample_update(update.update_id)
+    return await handler(update, data)
+
+class SampleFilter(logging.Filter):
+    """Пропускает долю rate записей ниже WARNING; решение — в вызывающем потоке, до очереди и форматирования."""
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self._threshold = int(rate * 2**32)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        uid = _update_id.get()
+        if uid is None:
+            return random.random() < self.rate  # вне апдейта — построчно
+        # мультипликативный хэш Кнута: соседние update_id расходятся по всему диапазону
+        return uid * 2654435761 % 2**32 < self._threshold
+
+class BoundedQueueHandler(QueueHandler):
+    def __init__(self, maxsize: int = LOG_QUEUE_MAX):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # в отличие от QueueHandler.prepare не форматируем в вызывающем потоке — это делает листенер
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        # вызывается из event loop — никаких блокирующих put: место для важной записи освобождается за счёт старой
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            self.dropped += 1
+            if record.levelno < logging.WARNING:
+                return
+        try:
+            self.queue.get_nowait()
+            self.queue.task_done()
+        except queue.Empty:
+            pass  # листенер успел разобрать очередь
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass  # место заняли из другого потока — эта запись и есть выброшенная
+
+_listener: QueueListener | None = None
+_handler: BoundedQueueHandler | None = None
+_mode = "plain"
+
+def setup_logging(mode: str = LOG_MODE, level: str = LOG_LEVEL, stream=None, sample: float | None = None):
+    """(Пере)настраивает корневой логгер; повторный вызов снимает прежние хендлеры и останавливает поток."""
+    global _listener, _handler, _mode, LOG_SAMPLE
+    if mode not in LOG_MODES:
+        raise SystemExit(f"LOG_MODE must be one of {LOG_MODES}, got {mode!r}")
+    if sample is not None:
+        LOG_SAMPLE = sample
+    stop_logging()
+    _mode = mode
+    for name in LOG_SAMPLED:
+        logger = logging.getLogger(name)
+        for f in [f for f in logger.filters if isinstance(f, SampleFilter)]:
+            logger.removeFilter(f)
+        if LOG_SAMPLE < 1:
+            logger.addFilter(SampleFilter(LOG_SAMPLE))
+    if mode == "plain":
+        logging.basicConfig(level=level, format=PLAIN_FORMAT, stream=stream, force=True)
+        return
+    out = logging.StreamHandler(stream or sys.stderr)
+    out.setFormatter(JsonFormatter())
+    _handler = BoundedQueueHandler(LOG_QUEUE_MAX)
+    _listener = QueueListener(_handler.queue, out, respect_handler_level=True)
+    _listener.start()
+    root = logging.getLogger()
+    for h in root.handlers[:]:
+        root.removeHandler(h)
+        h.close()
+    root.setLevel(level)
+    root.addHandler(_handler)
+
+def stop_logging():
+    """Дописывает очередь и останавливает поток листенера (на выходе процесса — через atexit)."""
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+
+atexit.register(stop_logging)
+
+def stats() -> dict:
+    return {
+        "mode": _mode,
+        "sample": LOG_SAMPLE,
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0,
+    }
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+metrics.py — метрики в текстовом формате Prometheus (/metrics), без внешних зависимостей
+• Histogram / Counter: запись — поиск корзины bisect + инкремент в списке, без блокировок
+  (всё пишется из одного event loop процесса; в многопроцессном режиме у каждого воркера свои метрики)
+• что меряем: время вебхука целиком, Update.model_validate, каждый хендлер (по имени функции),
+  вызовы Bot API по методу; счётчики типов апдейтов, исключений в process_update и 403 по секрету
+• HandlerTimer — внутренний middleware aiogram (ставится на диспетчер и действует на вложенные роутеры),
+  ApiTimer — middleware сессии Bot API (регистрируется после SendScheduler, ожидание в очереди не входит)
+ENV:
+  METRICS=1 (по умолчанию включены; 0 — /metrics отдаёт 404, таймеры хендлеров и Bot API не ставятся)
+"""
+import os, time
+from bisect import bisect_left
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+METRICS = os.getenv("METRICS", "1") not in ("0","false","False")
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _labels(name: str | None, value) -> str:
+    if name is None:
+        return ""
+    v = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'{name}="{v}"'
+
+class Counter:
+    def __init__(self, name: str, help: str, label: str | None = None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.values: dict = {}
+
+    def inc(self, value=None, n: int = 1):
+        self.values[value] = self.values.get(value, 0) + n
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for value, n in self.values.items():
+            lbl = _labels(self.label, value)
+            out.append(f"{self.name}{{{lbl}}} {n}" if lbl else f"{self.name} {n}")
+        return out
+
+class Histogram:
+    """Кумулятивные корзины считаются при рендере; observe() — O(log корзин)."""
+    def __init__(self, name: str, help: str, label: str | None = None, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self.series: dict = {}  # значение метки → [counts по корзинам + [+Inf]], sum
+
+    def observe(self, seconds: float, value=None):
+        s = self.series.get(value)
+        if s is None:
+            s = self.series[value] = [[0] * (len(self.buckets) + 1), 0.0]
+        s[0][bisect_left(self.buckets, seconds)] += 1
+        s[1] += seconds
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for value, (counts, total) in self.series.items():
+            lbl = _labels(self.label, value)
+            sep = "," if lbl else ""
+            acc = 0
+            for le, n in zip(self.buckets + ("+Inf",), counts):
+                acc += n
+                out.append(f'{self.name}_bucket{{{lbl}{sep}le="{le}"}} {acc}')
+            suffix = f"{{{lbl}}}" if lbl else ""
+            out.append(f"{self.name}_sum{suffix} {total}")
+            out.append(f"{self.name}_count{suffix} {acc}")
+        return out
+
+INGRESS = Histogram("foody_webhook_seconds", "Webhook request handling time (ingress to response)")
+VALIDATE = Histogram("foody_update_validate_seconds", "Update.model_validate time")
+HANDLER = Histogram("foody_handler_seconds", "Handler execution time", label="handler")
+API = Histogram("foody_bot_api_seconds", "Outgoing Bot API call latency", label="method")
+UPDATES = Counter("foody_updates_total", "Incoming updates by type", label="type")
+ERRORS = Counter("foody_update_errors_total", "Exceptions caught in process_update", label="exception")
+API_ERRORS = Counter("foody_bot_api_errors_total", "Failed Bot API calls", label="method")
+FORBIDDEN = Counter("foody_webhook_forbidden_total", "Webhook requests rejected by the secret token check")
+
+REGISTRY = (INGRESS, VALIDATE, HANDLER, API, UPDATES, ERRORS, API_ERRORS, FORBIDDEN)
+
+# типы апдейтов Bot API: метка — только из этого списка, ключи чужого JSON не плодят серии
+UPDATE_TYPES = frozenset((
+    "message", "edited_message", "channel_post", "edited_channel_post", "business_connection", "business_message",
+    "edited_business_message", "deleted_business_messages", "message_reaction", "message_reaction_count",
+    "inline_query", "chosen_inline_result", "callback_query", "shipping_query", "pre_checkout_query", "poll",
+    "poll_answer", "my_chat_member", "chat_member", "chat_join_request", "chat_boost", "removed_chat_boost",
+))
+
+def update_type(data: dict) -> str:
+    for k in data:
+        if k != "update_id":
+            return k if k in UPDATE_TYPES else "other"
+    return "other"
+
+def render(gauges: dict | None = None) -> str:
+    """gauges: {имя: значение} — мгновенные значения (in-flight, очередь), снимаются в момент запроса."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for name, value in (gauges or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+class HandlerTimer:
+    """Внутренний middleware: время вызова хендлера, метка — имя функции (start, offer, rules, ...)."""
+    async def __call__(self, handler, event, data):
+        t0 = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            h = data.get("handler")
+            HANDLER.observe(time.perf_counter() - t0, getattr(getattr(h, "callback", None), "__name__", "unknown"))
+
+    def setup(self, dp):
+        for name, observer in dp.observers.items():
+            if name not in ("update", "error"):
+                observer.middleware(self)
+
+class ApiTimer(BaseRequestMiddleware):
+    async def __call__(self, make_request, bot, method):
+        name = method.__api_method__
+        t0 = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            API_ERRORS.inc(name)
+            raise
+        finally:
+            API.observe(time.perf_counter() - t0, name)
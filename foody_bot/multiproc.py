@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+multiproc.py — несколько процессов-воркеров за одним портом вебхука (только транспорт aiohttp)
+• WORKER_MODE=reuseport: N процессов слушают один порт через SO_REUSEPORT, соединения делит ядро ОС;
+  порядок апдейтов одного чата между процессами не гарантирован, дедуп повторов — нужен DEDUP_REDIS_URL
+• WORKER_MODE=hash: фронт-акцептор в главном процессе только парсит JSON (orjson) и по chat.id
+  пересылает сырое тело воркеру на unix-сокет — чат всегда в одном процессе, порядок и локальный дедуп держатся;
+  кнопки брони (reserve.py) — по offer_id, чтобы остаток оффера жил в одном процессе;
+  ответ воркера (в т.ч. метод в теле вебхука и 503) возвращается Telegram как есть;
+  /health собирает статистику всех воркеров, /metrics?worker=i проксирует метрики воркера i;
+  initData веб-аппов (WEBAPP_AUTH_PATH) акцептор проверяет сам — воркерам не пересылается
+• скоординированный старт: сверку и установку вебхука и команд (set_webhook/set_my_commands) делает только воркер 0 (leader);
+  перезапущенный после падения воркер их не повторяет
+• глобальный лимит исходящих SEND_GLOBAL_RATE/BURST делится между воркерами
+ENV:
+  WORKERS=1 (1 — обычный однопроцессный режим), WORKER_MODE=hash|reuseport,
+  WORKER_SOCKET_DIR (по умолчанию системный tmp), WORKER_FORWARD_TIMEOUT=30, WORKER_START_TIMEOUT=60
+"""
+import asyncio, itertools, logging, multiprocessing, os, signal, tempfile, time
+import aiohttp
+from aiohttp import web
+from . import config
+from .fast_json import loads
+from .reserve import shard_key
+from .webapp_auth import add_aiohttp_routes, make_webapp_auth
+
+log = logging.getLogger("foody_bot")
+
+WORKERS = int(os.getenv("WORKERS", "1"))
+WORKER_MODE = os.getenv("WORKER_MODE", "hash")
+WORKER_MODES = ("hash", "reuseport")
+WORKER_SOCKET_DIR = os.getenv("WORKER_SOCKET_DIR", "") or tempfile.gettempdir()
+WORKER_FORWARD_TIMEOUT = float(os.getenv("WORKER_FORWARD_TIMEOUT", "30"))
+WORKER_START_TIMEOUT = float(os.getenv("WORKER_START_TIMEOUT", "60"))
+
+FORWARD_HEADERS = ("X-Telegram-Bot-Api-Secret-Token",)
+
+def worker_socket(i: int, port: int = config.PORT) -> str:
+    return os.path.join(WORKER_SOCKET_DIR, f"foody-{port}-{i}.sock")
+
+def _share_send_limits(n: int):
+    # дочерние процессы (spawn) прочитают ENV заново — отдаём каждому свою долю глобального лимита Telegram
+    from .send_queue import SEND_GLOBAL_RATE, SEND_GLOBAL_BURST
+    os.environ["SEND_GLOBAL_RATE"] = str(SEND_GLOBAL_RATE / n)
+    os.environ["SEND_GLOBAL_BURST"] = str(max(1, SEND_GLOBAL_BURST // n))
+
+def _worker_main(i: int, mode: str, keyboard: str, processing: str, leader: bool):
+    from .app import make_aiohttp_app
+    from .core import BotCore
+    app = make_aiohttp_app(BotCore(keyboard, processing, leader=leader, worker=i))
+    if mode == "reuseport":
+        web.run_app(app, host="0.0.0.0", port=config.PORT, reuse_port=True, print=None)
+    else:
+        path = worker_socket(i)
+        if os.path.exists(path):
+            os.unlink(path)  # сокет от упавшего предыдущего процесса
+        web.run_app(app, path=path, print=None)
+
+class Acceptor:
+    """Фронт для WORKER_MODE=hash: апдейт → воркер hash(chat.id) % N, без pydantic и хендлеров."""
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.sessions: list[aiohttp.ClientSession] = []
+        self._rr = itertools.count()
+        self.forwarded = [0] * workers
+        self.failed = 0
+        self.webapp_auth = make_webapp_auth()
+
+    async def start(self, app=None):
+        timeout = aiohttp.ClientTimeout(total=WORKER_FORWARD_TIMEOUT)
+        self.sessions = [
+            aiohttp.ClientSession(connector=aiohttp.UnixConnector(path=worker_socket(i)), timeout=timeout)
+            for i in range(self.workers)
+        ]
+        # порт акцептора открывается после on_startup — ждём воркеров, чтобы не отвечать Telegram 503 на старте
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        for i in range(self.workers):
+            while True:
+                try:
+                    await self.forward(i, "GET", "/health")
+                    break
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    if time.monotonic() > deadline:
+                        log.warning("worker %d is not ready after %ss", i, WORKER_START_TIMEOUT)
+                        break
+                    await asyncio.sleep(0.2)
+
+    async def close(self, app=None):
+        for s in self.sessions:
+            await s.close()
+
+    def route(self, raw: bytes) -> int:
+        try:
+            key = shard_key(loads(raw))
+        except Exception:
+            key = None  # битый JSON — отдаём любому воркеру, он залогирует и ответит 200
+        if key is None:
+            return next(self._rr) % self.workers
+        return hash(key) % self.workers
+
+    async def forward(self, i: int, method: str, path: str, raw: bytes = b"", headers=None):
+        async with self.sessions[i].request(method, f"http://worker{path}", data=raw, headers=headers) as resp:
+            return resp.status, await resp.read(), resp.headers
+
+    async def webhook(self, request: web.Request):
+        raw = await request.read()
+        i = self.route(raw)
+        headers = {h: request.headers[h] for h in FORWARD_HEADERS if h in request.headers}
+        try:
+            status, body, h = await self.forward(i, "POST", config.WEBHOOK_PATH, raw, headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # воркер перезапускается — Telegram повторит доставку
+            self.failed += 1
+            log.warning("worker %d unavailable: %s", i, e)
+            return web.Response(status=503, text="busy", headers={"Retry-After": "1"})
+        self.forwarded[i] += 1
+        out = {k: h[k] for k in ("Content-Type", "Retry-After") if k in h}
+        return web.Response(status=status, body=body, headers=out)
+
+    async def health(self, request: web.Request):
+        workers = []
+        for i in range(self.workers):
+            try:
+                _, body, _ = await self.forward(i, "GET", "/health")
+                workers.append(loads(body))
+            except Exception as e:
+                workers.append({"ok": False, "error": str(e)})
+        return web.json_response({
+            "ok": all(w.get("ok") for w in workers),
+            "mode": "hash",
+            "forwarded": self.forwarded,
+            "failed": self.failed,
+            "webapp_auth": self.webapp_auth.stats() if self.webapp_auth else None,
+            "workers": workers,
+        })
+
+    async def metrics(self, request: web.Request):
+        # метрики у каждого воркера свои: Prometheus скрейпит /metrics?worker=0..N-1
+        i = int(request.query.get("worker", "0"))
+        if not 0 <= i < self.workers:
+            raise web.HTTPNotFound()
+        try:
+            status, body, h = await self.forward(i, "GET", "/metrics")
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return web.Response(status=503, text="worker unavailable")
+        return web.Response(status=status, body=body, headers={"Content-Type": h.get("Content-Type", "text/plain")})
+
+    def make_app(self) -> web.Application:
+        async def ok(request: web.Request):
+            return web.Response(text="OK")
+
+        async def webhook_get(request: web.Request):
+            return web.Response(text="Webhook endpoint is alive (POST only)")
+
+        app = web.Application()
+        app.router.add_get("/", ok)
+        app.router.add_get("/health", self.health)
+        app.router.add_get("/metrics", self.metrics)
+        app.router.add_post(config.WEBHOOK_PATH, self.webhook)
+        app.router.add_get(config.WEBHOOK_PATH, webhook_get)
+        if self.webapp_auth:
+            add_aiohttp_routes(app, self.webapp_auth)
+        app.on_startup.append(self.start)
+        app.on_cleanup.append(self.close)
+        return app
+
+class Supervisor:
+    """Запускает N воркеров (spawn), перезапускает упавших, гасит всех на выходе."""
+    def __init__(self, workers: int, mode: str, keyboard: str, processing: str):
+        self.workers = workers
+        self.mode = mode
+        self.args = (keyboard, processing)
+        self.ctx = multiprocessing.get_context("spawn")
+        self.procs: list = [None] * workers
+
+    def spawn(self, i: int, leader: bool):
+        p = self.ctx.Process(target=_worker_main, args=(i, self.mode, *self.args, leader), name=f"foody-worker-{i}")
+        p.start()
+        self.procs[i] = p
+        log.info("worker %d started (pid=%s, leader=%s)", i, p.pid, leader)
+
+    def start(self):
+        _share_send_limits(self.workers)
+        for i in range(self.workers):
+            self.spawn(i, leader=(i == 0))
+
+    def check(self):
+        for i, p in enumerate(self.procs):
+            if p is not None and not p.is_alive():
+                log.error("worker %d exited with %s — restarting", i, p.exitcode)
+                self.spawn(i, leader=False)
+
+    def stop(self, timeout: float = 30):
+        for p in self.procs:
+            if p is not None and p.is_alive():
+                p.terminate()  # SIGTERM → aiohttp on_shutdown → дренаж пула апдейтов
+        deadline = time.monotonic() + timeout
+        for p in self.procs:
+            if p is not None:
+                p.join(max(0.0, deadline - time.monotonic()))
+                if p.is_alive():
+                    p.kill()
+
+    async def watch(self, app=None):
+        async def loop():
+            while True:
+                await asyncio.sleep(1)
+                self.check()
+        self._watch = asyncio.create_task(loop())
+
+    async def unwatch(self, app=None):
+        self._watch.cancel()
+
+def run_workers(workers: int, mode: str, keyboard: str, processing: str):
+    if mode not in WORKER_MODES:
+        raise SystemExit(f"WORKER_MODE must be one of {WORKER_MODES}, got {mode!r}")
+    sup = Supervisor(workers, mode, keyboard, processing)
+    sup.start()
+    try:
+        if mode == "hash":
+            app = Acceptor(workers).make_app()
+            app.on_startup.append(sup.watch)
+            app.on_shutdown.append(sup.unwatch)
+            web.run_app(app, host="0.0.0.0", port=config.PORT)
+        else:
+            stop = False
+            def on_signal(*_):
+                nonlocal stop
+                stop = True
+            signal.signal(signal.SIGTERM, on_signal)
+            signal.signal(signal.SIGINT, on_signal)
+            while not stop:
+                time.sleep(1)
+                sup.check()
+    finally:
+        sup.stop()
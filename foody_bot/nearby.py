@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+nearby.py — ближайшие живые предложения по геопозиции покупателя (/nearby)
+• NearbyIndex: сетка lat/lng с шагом NEARBY_CELL_DEG → множество ресторанов с живыми офферами в ячейке;
+  поиск k ближайших — обход колец ячеек от точки запроса, пока k-я дистанция не меньше непросмотренного кольца
+• у каждого ресторана — dict живых офферов; распроданные (qty_left=0) снимаются upsert_offer/remove_offer,
+  просроченные — инкрементально: куча по expires_at разбирается только до «сейчас» (ленивое удаление);
+  обновление без смены expires_at (qty_left, цена) кучу не трогает, а когда устаревших записей в ней
+  больше 2× живых офферов — куча пересобирается из живых
+• ресторан без живых офферов из сетки убирается — поиск не тратит время на пустые точки
+• NearbyFeed: снимок ресторанов и офферов из источника раз в NEARBY_REFRESH сек (без запроса к БД на каждый
+  /nearby); источник — своя БД (db.py, DATABASE_URL) или бэкенд API_URL, подменяется любым async-callable → (restaurants, offers)
+ENV:
+  NEARBY=0 (1 — включить /nearby), NEARBY_CELL_DEG=0.01, NEARBY_LIMIT=5, NEARBY_RADIUS_KM=5, NEARBY_REFRESH=60,
+  NEARBY_RESTAURANTS_URL={API_URL}/api/v1/restaurants, NEARBY_OFFERS_URL={API_URL}/api/v1/offers
+"""
+import os, math, asyncio, heapq, logging, time
+from datetime import datetime, timezone
+from typing import NamedTuple
+import aiohttp
+from .config import API_URL
+from .fast_json import loads
+from .restaurants import Restaurant
+
+log = logging.getLogger("foody_bot")
+
+NEARBY = os.getenv("NEARBY", "0") in ("1","true","True")
+NEARBY_CELL_DEG = float(os.getenv("NEARBY_CELL_DEG", "0.01"))
+NEARBY_LIMIT = int(os.getenv("NEARBY_LIMIT", "5"))
+NEARBY_RADIUS_KM = float(os.getenv("NEARBY_RADIUS_KM", "5"))
+NEARBY_REFRESH = float(os.getenv("NEARBY_REFRESH", "60"))
+NEARBY_RESTAURANTS_URL = os.getenv("NEARBY_RESTAURANTS_URL", "") or f"{API_URL}/api/v1/restaurants"
+NEARBY_OFFERS_URL = os.getenv("NEARBY_OFFERS_URL", "") or f"{API_URL}/api/v1/offers"
+
+EARTH_KM = 6371.0088
+KM_PER_DEG = math.pi * EARTH_KM / 180
+COMPACT_MIN = 64  # маленькую кучу не пересобираем — дешевле дождаться expire
+
+class Offer(NamedTuple):
+    id: str
+    restaurant_id: str
+    title: str
+    price_cents: int
+    qty_left: int
+    expires_at: float  # unix time, UTC
+
+class Nearby(NamedTuple):
+    km: float
+    restaurant: Restaurant
+    offers: list[Offer]
+
+def distance_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_KM * math.asin(min(1.0, math.sqrt(a)))
+
+class NearbyIndex:
+    def __init__(self, cell_deg: float = NEARBY_CELL_DEG):
+        self.cell = cell_deg
+        self.restaurants: dict[str, Restaurant] = {}
+        self.offers: dict[str, dict[str, Offer]] = {}  # rid → {offer_id: Offer}, только живые
+        self.grid: dict[tuple[int, int], set[str]] = {}  # ячейка → rid с живыми офферами
+        self._offer_rid: dict[str, str] = {}
+        self._expiry: list = []  # куча (expires_at, offer_id); устаревшие записи пропускаются
+        self.expired = self.compactions = 0
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell), math.floor(lng / self.cell)
+
+    def _grid_add(self, r: Restaurant):
+        self.grid.setdefault(self._cell(r.lat, r.lng), set()).add(r.id)
+
+    def _grid_discard(self, r: Restaurant):
+        key = self._cell(r.lat, r.lng)
+        cell = self.grid.get(key)
+        if cell is not None:
+            cell.discard(r.id)
+            if not cell:
+                del self.grid[key]
+
+    def upsert_restaurant(self, r: Restaurant):
+        if r.lat is None or r.lng is None:
+            return
+        old = self.restaurants.get(r.id)
+        self.restaurants[r.id] = r
+        if r.id in self.offers:
+            if old is not None:
+                self._grid_discard(old)
+            self._grid_add(r)
+
+    def upsert_offer(self, o: Offer, now: float | None = None):
+        old = self.offer(o.id)
+        if (old is not None and old.restaurant_id == o.restaurant_id and old.expires_at == o.expires_at
+                and o.qty_left > 0 and o.expires_at > (now or time.time())):
+            self.offers[o.restaurant_id][o.id] = o  # запись кучи (expires_at, id) по-прежнему верна
+            return
+        self.remove_offer(o.id)
+        if o.qty_left <= 0 or o.expires_at <= (now or time.time()) or o.restaurant_id not in self.restaurants:
+            return
+        offers = self.offers.setdefault(o.restaurant_id, {})
+        if not offers:
+            self._grid_add(self.restaurants[o.restaurant_id])
+        offers[o.id] = o
+        self._offer_rid[o.id] = o.restaurant_id
+        heapq.heappush(self._expiry, (o.expires_at, o.id))
+        self._compact()
+
+    def remove_offer(self, offer_id: str):
+        rid = self._offer_rid.pop(offer_id, None)
+        if rid is None:
+            return
+        offers = self.offers[rid]
+        del offers[offer_id]
+        if not offers:
+            del self.offers[rid]
+            self._grid_discard(self.restaurants[rid])
+        self._compact()
+
+    def _compact(self):
+        # записи снятых и переписанных офферов до их expires_at лежат в куче мёртвым грузом
+        if len(self._expiry) > 2 * len(self._offer_rid) + COMPACT_MIN:
+            self._expiry = [(o.expires_at, oid) for offers in self.offers.values() for oid, o in offers.items()]
+            heapq.heapify(self._expiry)
+            self.compactions += 1
+
+    def offer(self, offer_id: str) -> Offer | None:
+        rid = self._offer_rid.get(offer_id)
+        return self.offers[rid][offer_id] if rid is not None else None
+
+    def expire(self, now: float | None = None) -> int:
+        """Снимает офферы с expires_at <= now; работа пропорциональна числу истёкших, а не всех."""
+        now = now or time.time()
+        n = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            exp, oid = heapq.heappop(self._expiry)
+            rid = self._offer_rid.get(oid)
+            if rid is not None and self.offers[rid][oid].expires_at == exp:
+                self.remove_offer(oid)
+                n += 1
+        self.expired += n
+        return n
+
+    def load(self, restaurants, offers, now: float | None = None):
+        """Полная замена содержимого снимком из источника."""
+        fresh = NearbyIndex(self.cell)
+        for r in restaurants:
+            fresh.upsert_restaurant(r)
+        for o in offers:
+            fresh.upsert_offer(o, now)
+        self.restaurants, self.offers, self.grid = fresh.restaurants, fresh.offers, fresh.grid
+        self._offer_rid, self._expiry = fresh._offer_rid, fresh._expiry
+
+    def _ring(self, cy: int, cx: int, r: int):
+        if r == 0:
+            yield cy, cx
+            return
+        for dx in range(-r, r + 1):
+            yield cy - r, cx + dx
+            yield cy + r, cx + dx
+        for dy in range(-r + 1, r):
+            yield cy + dy, cx - r
+            yield cy + dy, cx + r
+
+    def nearest(self, lat: float, lng: float, k: int = NEARBY_LIMIT, radius_km: float = NEARBY_RADIUS_KM,
+                now: float | None = None) -> list[Nearby]:
+        self.expire(now)
+        cy, cx = self._cell(lat, lng)
+        # наименьшая сторона ячейки в км (по долготе сжимается к полюсам)
+        side = self.cell * KM_PER_DEG * max(0.01, math.cos(math.radians(lat)))
+        max_ring = int(radius_km / side) + 1
+        found: list[tuple[float, str]] = []
+        for r in range(max_ring + 1):
+            for key in self._ring(cy, cx, r):
+                for rid in self.grid.get(key, ()):
+                    place = self.restaurants[rid]
+                    d = distance_km(lat, lng, place.lat, place.lng)
+                    if d <= radius_km:
+                        found.append((d, rid))
+            # всё за пределами колец 0..r не ближе r * side
+            if len(found) >= k and sorted(found)[k - 1][0] <= r * side:
+                break
+        found.sort()
+        return [
+            Nearby(d, self.restaurants[rid], sorted(self.offers[rid].values(), key=lambda o: o.expires_at))
+            for d, rid in found[:k]
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "restaurants": len(self.restaurants),
+            "live_restaurants": len(self.offers),
+            "offers": len(self._offer_rid),
+            "cells": len(self.grid),
+            "expired": self.expired,
+            "expiry_heap": len(self._expiry),
+            "compactions": self.compactions,
+        }
+
+def _items(data) -> list:
+    if isinstance(data, dict):
+        data = data.get("items") or data.get("results") or []
+    return data if isinstance(data, list) else []
+
+def _ts(v) -> float:
+    if isinstance(v, (int, float)):
+        return float(v)
+    dt = datetime.fromisoformat(str(v))
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+def parse_offer(d: dict) -> Offer:
+    return Offer(str(d["id"]), str(d["restaurant_id"]), str(d.get("title") or ""), int(d.get("price_cents") or 0),
+                 int(d.get("qty_left") or 0), _ts(d["expires_at"]))
+
+class BackendSource:
+    """Снимок ресторанов и офферов по HTTP с бэкенда (две ручки параллельно)."""
+    def __init__(self, restaurants_url: str = NEARBY_RESTAURANTS_URL, offers_url: str = NEARBY_OFFERS_URL):
+        self.urls = (restaurants_url, offers_url)
+        self._session: aiohttp.ClientSession | None = None
+
+    async def _get(self, url: str) -> list:
+        async with self._session.get(url) as r:
+            r.raise_for_status()
+            return _items(loads(await r.read()))
+
+    async def __call__(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+        rs, ofs = await asyncio.gather(*(self._get(u) for u in self.urls))
+        restaurants = [Restaurant(str(d["id"]), str(d.get("title") or ""), d.get("lat"), d.get("lng")) for d in rs]
+        offers = []
+        for d in ofs:
+            try:
+                offers.append(parse_offer(d))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return restaurants, offers
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+class NearbyFeed:
+    """Индекс + периодическое обновление снимком; хендлеры читают index напрямую."""
+    def __init__(self, source=None, interval: float = NEARBY_REFRESH, index: NearbyIndex | None = None):
+        self.index = index or NearbyIndex()
+        self.source = source or BackendSource()
+        self.interval = interval
+        self.loaded_at: float | None = None
+        self.failures = 0
+        self.listeners: list = []  # callable(index) после каждого снимка (nudges.py сверяет таймеры)
+        self._task: asyncio.Task | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.loaded_at is not None
+
+    async def refresh(self):
+        restaurants, offers = await self.source()
+        self.index.load(restaurants, offers)
+        self.loaded_at = time.time()
+        for listener in self.listeners:
+            listener(self.index)
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.failures += 1
+                log.warning("nearby refresh failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        close = getattr(self.source, "close", None)
+        if close:
+            await close()
+
+    def stats(self) -> dict:
+        return {**self.index.stats(), "loaded_at": self.loaded_at, "failures": self.failures}
+
+def make_nearby(repo=None) -> NearbyFeed | None:
+    if not NEARBY:
+        return None
+    return NearbyFeed(repo.snapshot if repo else None)
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+nudges.py — напоминания «предложение заканчивается через N минут» подписанным покупателям
+• подписка — кнопка 🔔 под ответом на геопозицию (/nearby, callback nudge:<rid>): ждать офферы этой точки
+• таймеры: на каждый живой оффер подписанной точки и каждое N из NUDGE_BEFORE — срабатывание в expires_at − N мин;
+  после каждого обновления NearbyFeed таймеры сверяются со снимком: новые ставятся, пропавшие и распроданные
+  снимаются, сдвинутый срок перевзводится
+• TimingWheel: иерархическое колесо (4 уровня по 256 слотов, тик NUDGE_TICK): add/cancel — O(1),
+  advance — O(тиков + сработавших), без кучи и пересортировки на сотнях тысяч таймеров
+• сработавшие за тик таймеры собираются в одно сообщение на чат (с кнопками брони 🛒, reserve.py); рассылка — фоновыми пачками по NUDGE_BATCH
+  с приоритетом BROADCAST (лимиты Telegram и 429 — в send_queue.py); заблокировавшие бота отписываются
+• состояние (таймеры и подписки) — журнал JSON-строк NUDGE_STATE: операции дописываются одной записью раз в тик,
+  при старте журнал проигрывается и сжимается в снимок (временный файл + rename), при росте — тоже;
+  сработавший таймер снимается в журнале до отправки — после рестарта он не повторится (at-most-once)
+• несколько воркеров (multiproc.py): журнал у каждого свой (NUDGE_STATE.<i>), подписка живёт в воркере,
+  куда пришёл чат, — одно напоминание не уходит дважды
+ENV:
+  NUDGES=0 (1 — включить, нужен NEARBY=1), NUDGE_BEFORE=30,10 (минут), NUDGE_TICK=1, NUDGE_BATCH=25,
+  NUDGE_STATE (пусто — без файла, состояние только в памяти; например nudges.jsonl), NUDGE_COMPACT=100000, NUDGE_MAX_SUBS=20
+"""
+import os, math, asyncio, logging, time
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.utils.markdown import html_decoration as html
+from .fast_json import loads, dumps
+from .keyboards import kb_nearby
+from .nearby import NearbyFeed, NearbyIndex, Offer
+from .reserve import offer_buttons, RESERVE
+from .send_queue import priority, PRIORITY_BROADCAST
+
+log = logging.getLogger("foody_bot")
+
+NUDGES = os.getenv("NUDGES", "0") in ("1","true","True")
+NUDGE_BEFORE = tuple(int(n) for n in os.getenv("NUDGE_BEFORE", "30,10").split(",") if n)
+NUDGE_TICK = float(os.getenv("NUDGE_TICK", "1"))
+NUDGE_BATCH = int(os.getenv("NUDGE_BATCH", "25"))
+NUDGE_STATE = os.getenv("NUDGE_STATE", "")
+NUDGE_COMPACT = int(os.getenv("NUDGE_COMPACT", "100000"))
+NUDGE_MAX_SUBS = int(os.getenv("NUDGE_MAX_SUBS", "20"))
+
+class TimingWheel:
+    """Уровень l — 2**bits слотов по 2**(bits*l) тиков; таймер верхнего уровня спускается ниже,
+    когда младший уровень делает оборот (каскад), и срабатывает из слота уровня 0 ровно в свой тик."""
+    def __init__(self, tick: float = NUDGE_TICK, now: float | None = None, levels: int = 4, bits: int = 8):
+        self.tick, self.bits, self.mask = tick, bits, (1 << bits) - 1
+        self.wheels = [[{} for _ in range(1 << bits)] for _ in range(levels)]
+        self.current = math.floor((time.time() if now is None else now) / tick)  # последний обработанный тик
+        self._slot: dict = {}  # key → слот, где лежит таймер
+
+    def __len__(self):
+        return len(self._slot)
+
+    def _place(self, key, deadline: int):
+        delta = deadline - self.current
+        if delta < 1:
+            deadline, delta = self.current + 1, 1  # уже просрочен — сработает на ближайшем тике
+        # уровень — по расстоянию до срока, слот — по абсолютному номеру тика
+        level = (delta.bit_length() - 1) // self.bits
+        if level >= len(self.wheels):
+            level = len(self.wheels) - 1  # дальше горизонта — в верхний уровень, каскад вернёт его туда же
+        slot = self.wheels[level][(deadline >> (self.bits * level)) & self.mask]
+        slot[key] = deadline
+        self._slot[key] = slot
+
+    def add(self, key, at: float):
+        """Таймер key на момент at (unix); существующий с тем же key перевзводится."""
+        if key in self._slot:
+            self.cancel(key)
+        self._place(key, math.ceil(at / self.tick))
+
+    def cancel(self, key) -> bool:
+        slot = self._slot.pop(key, None)
+        if slot is None:
+            return False
+        del slot[key]
+        return True
+
+    def advance(self, now: float) -> list:
+        """Проходит тики до now, возвращает ключи сработавших таймеров."""
+        target = math.floor(now / self.tick)
+        fired = []
+        while self.current < target:
+            if not self._slot:
+                self.current = target  # пустое колесо — тики проходить незачем
+                break
+            self.current = t = self.current + 1
+            for level in range(1, len(self.wheels)):
+                if (t >> (self.bits * (level - 1))) & self.mask:
+                    break
+                i = (t >> (self.bits * level)) & self.mask
+                slot, self.wheels[level][i] = self.wheels[level][i], {}
+                for key, deadline in slot.items():
+                    if deadline <= t:
+                        del self._slot[key]  # срок — этот самый тик: _place отложил бы его на следующий
+                        fired.append(key)
+                    else:
+                        self._place(key, deadline)
+            i = t & self.mask
+            slot = self.wheels[0][i]
+            if slot:
+                self.wheels[0][i] = {}
+                for key in slot:
+                    del self._slot[key]
+                fired.extend(slot)
+        return fired
+
+class NudgeLog:
+    """Журнал операций JSON-строками; append() копит в памяти, flush() — одна запись в файл."""
+    def __init__(self, path: str = NUDGE_STATE):
+        self.path = path
+        self.ops = 0  # строк в файле (для решения о сжатии)
+        self._buf: list[str] = []
+        self._f = None
+
+    def load(self) -> list[dict]:
+        if not self.path or not os.path.exists(self.path):
+            return []
+        ops = []
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    ops.append(loads(line))
+                except ValueError:
+                    continue  # оборванная последняя строка после падения
+        return ops
+
+    def append(self, op: dict):
+        if self.path:
+            self._buf.append(dumps(op))
+
+    def flush(self):
+        if not self._buf:
+            return
+        if self._f is None:
+            self._f = open(self.path, "a", encoding="utf-8")
+        self._f.write("\n".join(self._buf) + "\n")
+        self._f.flush()
+        self.ops += len(self._buf)
+        self._buf.clear()
+
+    def compact(self, ops):
+        """Переписывает журнал снимком ops; до rename старый файл остаётся целым."""
+        if not self.path:
+            return
+        self.close()
+        tmp = f"{self.path}.tmp"
+        n = 0
+        with open(tmp, "w", encoding="utf-8") as f:
+            for op in ops:
+                f.write(dumps(op) + "\n")
+                n += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.ops = n
+
+    def close(self):
+        self.flush()
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+def timer_key(offer_id: str, lead: int) -> str:
+    return f"{offer_id}:{lead}"
+
+def format_nudge(offers: list[Offer], index: NearbyIndex, now: float) -> str:
+    lines = ["⏰ Скоро закончится:"]
+    for o in sorted(offers, key=lambda o: o.expires_at):
+        place = index.restaurants.get(o.restaurant_id)
+        mins = max(1, int((o.expires_at - now) // 60))
+        lines.append(f"• <b>{html.quote(o.title)}</b> — {html.quote(place.title if place else '')}, "
+                     f"{o.price_cents / 100:.0f} ₽, осталось {o.qty_left}, ещё {mins} мин")
+    return "\n".join(lines)
+
+class NudgeScheduler:
+    def __init__(self, bot: Bot, feed: NearbyFeed, keyboard_mode: str, path: str = NUDGE_STATE,
+                 before: tuple = NUDGE_BEFORE, tick: float = NUDGE_TICK, batch: int = NUDGE_BATCH):
+        self.bot, self.feed, self.keyboard = bot, feed, keyboard_mode
+        self.before, self.batch = before, batch
+        self.wheel = TimingWheel(tick)
+        self.log = NudgeLog(path)
+        self.timers: dict[str, float] = {}  # key → at (unix)
+        self.subs: dict[str, set] = {}  # rid → чаты
+        self.chat_subs: dict[int, set] = {}  # чат → rid
+        self.fired = self.sent = self.skipped = self.failed = self.blocked = 0
+        self._task: asyncio.Task | None = None
+        self._sending: set[asyncio.Task] = set()
+        feed.listeners.append(self.reconcile)
+
+    # ---------- состояние ----------
+    def _set_timer(self, key: str, at: float):
+        if self.timers.get(key) == at:
+            return
+        self.timers[key] = at
+        self.wheel.add(key, at)
+        self.log.append({"op": "add", "key": key, "at": at})
+
+    def _drop_timer(self, key: str):
+        if self.timers.pop(key, None) is not None:
+            self.wheel.cancel(key)
+            self.log.append({"op": "del", "key": key})
+
+    def _schedule(self, rid: str, index: NearbyIndex, now: float, want: dict | None = None):
+        for o in index.offers.get(rid, {}).values():
+            for lead in self.before:
+                at = o.expires_at - lead * 60
+                if at > now:
+                    if want is None:
+                        self._set_timer(timer_key(o.id, lead), at)
+                    else:
+                        want[timer_key(o.id, lead)] = at
+
+    def reconcile(self, index: NearbyIndex, now: float | None = None):
+        """Таймеры = живые офферы подписанных точек; вызывается NearbyFeed после каждого снимка."""
+        now = now or time.time()
+        want: dict[str, float] = {}
+        for rid in self.subs:
+            self._schedule(rid, index, now, want)
+        for key in [k for k in self.timers if k not in want]:
+            self._drop_timer(key)
+        for key, at in want.items():
+            self._set_timer(key, at)
+
+    def toggle(self, chat_id: int, rid: str) -> bool | None:
+        """True — подписан, False — отписан, None — лимит подписок чата."""
+        rids = self.chat_subs.get(chat_id, set())
+        if rid in rids:
+            self._unsubscribe(chat_id, rid)
+            return False
+        if len(rids) >= NUDGE_MAX_SUBS:
+            return None
+        self.chat_subs.setdefault(chat_id, set()).add(rid)
+        self.subs.setdefault(rid, set()).add(chat_id)
+        self.log.append({"op": "sub", "chat": chat_id, "rid": rid})
+        if self.feed.ready:
+            self._schedule(rid, self.feed.index, time.time())
+        return True
+
+    def _unsubscribe(self, chat_id: int, rid: str | None = None):
+        self._forget(chat_id, rid)
+        self.log.append({"op": "unsub", "chat": chat_id, "rid": rid})
+
+    def _forget(self, chat_id: int, rid: str | None = None):
+        # лишние таймеры точки без подписчиков снимет ближайшая сверка
+        for r in [rid] if rid else list(self.chat_subs.get(chat_id, ())):
+            chats = self.subs.get(r)
+            if chats is not None:
+                chats.discard(chat_id)
+                if not chats:
+                    del self.subs[r]
+            rids = self.chat_subs.get(chat_id)
+            if rids is not None:
+                rids.discard(r)
+                if not rids:
+                    del self.chat_subs[chat_id]
+
+    def _snapshot(self):
+        for chat_id, rids in self.chat_subs.items():
+            for rid in rids:
+                yield {"op": "sub", "chat": chat_id, "rid": rid}
+        for key, at in self.timers.items():
+            yield {"op": "add", "key": key, "at": at}
+
+    def restore(self):
+        ops = self.log.load()
+        for op in ops:
+            kind = op.get("op")
+            if kind == "add":
+                self.timers[op["key"]] = op["at"]
+            elif kind == "del":
+                self.timers.pop(op["key"], None)
+            elif kind == "sub":
+                self.chat_subs.setdefault(op["chat"], set()).add(op["rid"])
+                self.subs.setdefault(op["rid"], set()).add(op["chat"])
+            elif kind == "unsub":
+                self._forget(op["chat"], op.get("rid"))
+        for key, at in self.timers.items():
+            self.wheel.add(key, at)  # просроченные за время простоя сработают на первом тике
+        self.log.compact(self._snapshot())
+        if ops:
+            log.info("nudges restored: %s timers, %s chats from %s ops", len(self.timers), len(self.chat_subs), len(ops))
+
+    # ---------- срабатывание ----------
+    def tick(self, now: float | None = None) -> int:
+        now = now or time.time()
+        due = self.wheel.advance(now)
+        index = self.feed.index
+        per_chat: dict[int, dict[str, Offer]] = {}
+        for key in due:
+            self.timers.pop(key, None)
+            self.log.append({"op": "del", "key": key})
+            o = index.offer(key.rpartition(":")[0])
+            if o is None or o.expires_at <= now:
+                self.skipped += 1
+                continue
+            for chat_id in self.subs.get(o.restaurant_id, ()):
+                per_chat.setdefault(chat_id, {})[o.id] = o  # 30- и 10-минутные сразу после простоя — одна строка
+        self.fired += len(due)
+        self.log.flush()  # снятие записано до отправки
+        if self.log.ops > NUDGE_COMPACT:
+            self.log.compact(self._snapshot())
+        if per_chat:
+            task = asyncio.ensure_future(self._deliver(list(per_chat.items()), index, now))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+        return len(due)
+
+    async def _deliver(self, items: list, index: NearbyIndex, now: float):
+        for i in range(0, len(items), self.batch):
+            await asyncio.gather(*(self._send(chat_id, list(offers.values()), index, now)
+                                   for chat_id, offers in items[i:i + self.batch]))
+
+    async def _send(self, chat_id: int, offers: list[Offer], index: NearbyIndex, now: float):
+        try:
+            with priority(PRIORITY_BROADCAST):
+                await self.bot.send_message(chat_id, format_nudge(offers, index, now),
+                                            reply_markup=kb_nearby(self.keyboard, (), offer_buttons(offers) if RESERVE else ()))
+            self.sent += 1
+        except TelegramForbiddenError:
+            self.blocked += 1
+            self._unsubscribe(chat_id)
+        except Exception as e:
+            self.failed += 1
+            log.warning("nudge to %s failed: %s", chat_id, e)
+
+    async def _loop(self):
+        # до первого снимка офферов не знаем, живы ли таймеры, — ждём, чтобы не снять их зря
+        while not self.feed.ready:
+            await asyncio.sleep(self.wheel.tick)
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                log.exception("nudge tick failed")
+            await asyncio.sleep(self.wheel.tick)
+
+    def start(self):
+        if self._task is None:
+            self.restore()
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._sending):
+            task.cancel()
+        await asyncio.gather(*self._sending, return_exceptions=True)
+        self.log.close()
+
+    def stats(self) -> dict:
+        return {
+            "timers": len(self.wheel),
+            "chats": len(self.chat_subs),
+            "restaurants": len(self.subs),
+            "fired": self.fired,
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "blocked": self.blocked,
+            "sending": len(self._sending),
+        }
+
+def make_nudges(bot: Bot, feed: NearbyFeed | None, keyboard_mode: str, worker: int | None = None) -> NudgeScheduler | None:
+    if not NUDGES or feed is None:
+        return None
+    path = f"{NUDGE_STATE}.{worker}" if NUDGE_STATE and worker is not None else NUDGE_STATE
+    return NudgeScheduler(bot, feed, keyboard_mode, path)
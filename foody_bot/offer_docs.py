@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+offer_docs.py — материалы /offer (PDF/XLSX): один список файлов и отправка документами по file_id
+• OFFER_DOCS — (подпись, имя файла в WEBAPP_MERCHANT_URL/docs/docs/) для всех мест, где нужны материалы:
+  URL-клавиатура KB_OFFER, документы ниже (раньше ссылка на ROI-калькулятор была
+  записана в каждой точке входа по-своему)
+• OFFER_DOCS_MODE=file_id: каждый файл загружается в Telegram один раз, его file_id хранится в OFFER_DOCS_CACHE
+  (sha256 содержимого → file_id); дальше /offer шлёт документ по file_id — файл отдаёт CDN Telegram,
+  запрос бота без тела файла и может уйти прямо в ответе на вебхук (inline_reply.py)
+• прогрев в фоне на старте: файлы читаются из OFFER_DOCS_DIR или скачиваются по URL, хэшируются;
+  для известного хэша загрузки нет, изменился файл — новый хэш, одна повторная загрузка.
+  С OFFER_DOCS_CHAT недостающие файлы загружает в этот служебный чат ведущий воркер, иначе — первый /offer
+• OFFER_DOCS_REFRESH — перепроверка файлов (If-None-Match / mtime), 0 — только на старте
+• OFFER_DOCS_GROUP=1 — все материалы одним sendMediaGroup вместо sendDocument на каждый
+• пока хэши не прочитаны или файлы недоступны — /offer отвечает URL-кнопками, как раньше; так же — если
+  загрузка недостающего файла в чат не удалась
+ENV:
+  OFFER_DOCS_MODE=url | file_id, OFFER_DOCS_DIR, OFFER_DOCS_CACHE=offer_docs.json, OFFER_DOCS_CHAT,
+  OFFER_DOCS_GROUP=0, OFFER_DOCS_REFRESH=3600, OFFER_DOCS_TIMEOUT=30
+"""
+import os, asyncio, hashlib, json, logging
+from typing import NamedTuple, TYPE_CHECKING
+from urllib.parse import quote
+import aiohttp
+from .config import WEBAPP_MERCHANT_URL
+from .send_queue import priority, PRIORITY_BROADCAST
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.types import Message
+
+log = logging.getLogger("foody_bot")
+
+OFFER_DOCS_MODE = os.getenv("OFFER_DOCS_MODE", "url")
+OFFER_DOCS_DIR = os.getenv("OFFER_DOCS_DIR", "")
+OFFER_DOCS_CACHE = os.getenv("OFFER_DOCS_CACHE", "offer_docs.json")
+OFFER_DOCS_CHAT = os.getenv("OFFER_DOCS_CHAT", "")
+OFFER_DOCS_GROUP = os.getenv("OFFER_DOCS_GROUP", "0") in ("1","true","True")
+OFFER_DOCS_REFRESH = float(os.getenv("OFFER_DOCS_REFRESH", "3600"))
+OFFER_DOCS_TIMEOUT = float(os.getenv("OFFER_DOCS_TIMEOUT", "30"))
+
+class OfferDoc(NamedTuple):
+    caption: str
+    filename: str
+
+OFFER_DOCS = (
+    OfferDoc("📄 Оффер (SMB)", "Foody_Offer_Brand_ru.pdf"),
+    OfferDoc("🏬 Оффер для сетей", "Foody_Offer_Chain_ru.pdf"),
+    OfferDoc("📊 ROI-калькулятор", "ROI_СпасениеЕды_калькулятор.xlsx"),
+)
+
+def doc_url(doc: OfferDoc) -> str:
+    return f"{WEBAPP_MERCHANT_URL}/docs/docs/{quote(doc.filename)}"
+
+class OfferDocs:
+    """sha256 и file_id материалов; ready — содержимое всех файлов известно (file_id могут ещё загружаться)."""
+    def __init__(self, bot: "Bot", docs=OFFER_DOCS, path: str = OFFER_DOCS_CACHE, source_dir: str = OFFER_DOCS_DIR,
+                 upload_chat: str = OFFER_DOCS_CHAT, group: bool = OFFER_DOCS_GROUP,
+                 interval: float = OFFER_DOCS_REFRESH):
+        self.bot, self.docs, self.path, self.source_dir = bot, tuple(docs), path, source_dir
+        self.upload_chat, self.group, self.interval = upload_chat, group, interval
+        self.hashes: list[str | None] = [None] * len(self.docs)
+        self.file_ids: dict[str, str] = {}  # sha256 → file_id (file_id действителен только для этого бота)
+        self._data: dict[str, bytes] = {}  # содержимое, пока у хэша нет file_id
+        self._validators: list[str | None] = [None] * len(self.docs)  # ETag / mtime последнего чтения
+        self._cache_mtime = 0.0
+        self._lock = asyncio.Lock()  # одновременные /offer не загружают один файл дважды
+        self._task: asyncio.Task | None = None
+        self._session: aiohttp.ClientSession | None = None
+        self.uploads = self.sent_by_id = self.fetch_errors = 0
+
+    @property
+    def ready(self) -> bool:
+        return None not in self.hashes
+
+    # ---------- кэш file_id ----------
+    def load_cache(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if mtime == self._cache_mtime:
+                return
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._cache_mtime = mtime
+        if isinstance(data, dict) and data.get("bot_id") == self.bot.id:
+            self.file_ids.update(data.get("files") or {})
+            for h in self.file_ids:
+                self._data.pop(h, None)
+
+    def save_cache(self):
+        if not self.path:
+            return
+        # только текущие хэши: старые версии файлов больше не отправляются
+        files = {h: self.file_ids[h] for h in self.hashes if h in self.file_ids}
+        tmp = f"{self.path}.tmp.{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"bot_id": self.bot.id, "files": files}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self._cache_mtime = os.stat(self.path).st_mtime
+
+    # ---------- содержимое ----------
+    async def _read(self, i: int) -> bytes | None:
+        """Содержимое файла или None, если он не менялся с прошлого чтения."""
+        doc = self.docs[i]
+        if self.source_dir:
+            path = os.path.join(self.source_dir, doc.filename)
+            st = os.stat(path)
+            mark = f"{st.st_mtime_ns}:{st.st_size}"
+            if mark == self._validators[i]:
+                return None
+            self._validators[i] = mark
+            return await asyncio.to_thread(_read_file, path)
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=OFFER_DOCS_TIMEOUT))
+        headers = {"If-None-Match": self._validators[i]} if self._validators[i] else None
+        async with self._session.get(doc_url(doc), headers=headers) as r:
+            if r.status == 304:
+                return None
+            r.raise_for_status()
+            self._validators[i] = r.headers.get("ETag")
+            return await r.read()
+
+    async def refresh(self):
+        changed = False
+        for i in range(len(self.docs)):
+            try:
+                data = await self._read(i)
+            except Exception as e:
+                self.fetch_errors += 1
+                log.warning("offer doc %s unavailable: %s", self.docs[i].filename, e)
+                continue
+            if data is None:
+                continue
+            h = hashlib.sha256(data).hexdigest()
+            if h != self.hashes[i]:
+                changed = True
+                self.hashes[i] = h
+                if h not in self.file_ids:
+                    self._data[h] = data
+        if changed:
+            self.load_cache()  # file_id мог уже загрузить другой воркер
+            live = set(self.hashes)
+            for h in list(self._data):
+                if h not in live:
+                    del self._data[h]
+        if self.upload_chat and self._data:
+            async with self._lock:
+                with priority(PRIORITY_BROADCAST):
+                    await self._upload(self.upload_chat, [i for i, h in enumerate(self.hashes) if h in self._data])
+
+    # ---------- отправка ----------
+    def _media(self, i: int, upload: bool):
+        from aiogram.types import BufferedInputFile
+        h = self.hashes[i]
+        if upload:
+            return BufferedInputFile(self._data[h], filename=self.docs[i].filename)
+        return self.file_ids[h]
+
+    def _remember(self, i: int, message) -> bool:
+        doc = getattr(message, "document", None)
+        if doc is None:
+            return False
+        h = self.hashes[i]
+        self.file_ids[h] = doc.file_id
+        self._data.pop(h, None)
+        return True
+
+    async def _upload(self, chat_id, todo: list[int]):
+        """Шлёт файлы todo в chat_id телом запроса и запоминает полученные file_id."""
+        from aiogram.types import InputMediaDocument
+        todo = [i for i in todo if self.hashes[i] in self._data]
+        if not todo:
+            return
+        if self.group and len(todo) > 1:
+            sent = await self.bot.send_media_group(chat_id, [
+                InputMediaDocument(media=self._media(i, True), caption=self.docs[i].caption) for i in todo])
+        else:
+            sent = [await self.bot.send_document(chat_id, self._media(i, True), caption=self.docs[i].caption)
+                    for i in todo]
+        learned = sum(self._remember(i, msg) for i, msg in zip(todo, sent))
+        self.uploads += learned
+        if learned:
+            self.save_cache()
+            log.info("offer docs uploaded: %s new file_id", learned)
+
+    async def answer(self, m: "Message"):
+        """Материалы в чат m по порядку OFFER_DOCS. Всё по file_id — метод возвращается хендлеру (можно инлайн),
+        иначе отправка здесь; загрузка не удалась — URL-кнопки, как без file_id."""
+        from aiogram.types import InputMediaDocument
+        from .keyboards import KB_OFFER
+        if any(h not in self.file_ids for h in self.hashes):
+            self.load_cache()
+        if any(h not in self.file_ids for h in self.hashes):
+            try:
+                async with self._lock:
+                    missing = {i for i, h in enumerate(self.hashes) if h not in self.file_ids}  # пока ждали — мог загрузить соседний /offer
+                    if missing:
+                        return await self._answer_uploading(m, missing)
+            except Exception as e:
+                log.warning("offer docs upload failed: %s", e)
+                return m.answer("Материалы:", reply_markup=KB_OFFER)
+        self.sent_by_id += len(self.docs)
+        if self.group and len(self.docs) > 1:
+            return m.answer_media_group([InputMediaDocument(media=self._media(i, False), caption=d.caption)
+                                         for i, d in enumerate(self.docs)])
+        for i, d in enumerate(self.docs[:-1]):
+            await m.answer_document(self._media(i, False), caption=d.caption)
+        return m.answer_document(self._media(len(self.docs) - 1, False), caption=self.docs[-1].caption)
+
+    async def _answer_uploading(self, m: "Message", missing: set[int]):
+        """Отправка с загрузкой недостающих файлов телом запроса; их file_id запоминаются."""
+        from aiogram.types import InputMediaDocument
+        if self.group:
+            # одна группа: загружаемые файлы и уже известные file_id вместе
+            sent = await m.bot.send_media_group(m.chat.id, [
+                InputMediaDocument(media=self._media(i, i in missing), caption=d.caption) for i, d in enumerate(self.docs)])
+        else:
+            sent = [await m.bot.send_document(m.chat.id, self._media(i, i in missing), caption=d.caption)
+                    for i, d in enumerate(self.docs)]
+        learned = sum(self._remember(i, sent[i]) for i in missing if i < len(sent))
+        self.uploads += learned
+        self.sent_by_id += len(self.docs) - len(missing)
+        if learned:
+            self.save_cache()
+        return None
+
+    # ---------- жизненный цикл ----------
+    async def _loop(self):
+        self.load_cache()
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                log.warning("offer docs refresh failed: %s", e)
+            if self.interval <= 0:
+                return
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "docs": len(self.docs),
+            "file_ids": sum(h in self.file_ids for h in self.hashes),
+            "pending_upload": len(self._data),
+            "uploads": self.uploads,
+            "sent_by_id": self.sent_by_id,
+            "fetch_errors": self.fetch_errors,
+        }
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def make_offer_docs(bot: "Bot", leader: bool = True) -> OfferDocs | None:
+    if OFFER_DOCS_MODE != "file_id":
+        return None
+    # служебный чат для прогрева — только у ведущего воркера, остальные берут file_id из общего кэша
+    return OfferDocs(bot, upload_chat=OFFER_DOCS_CHAT if leader else "")
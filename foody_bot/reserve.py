@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+reserve.py — бронь офферов кнопкой 🛒 (callback rsv:<offer_id>) с остатками в памяти процесса
+• Inventory: остаток qty_left каждого живого оффера; проверка и декремент — без await между ними,
+  поэтому одновременные нажатия в одном event loop не теряют обновлений и не уводят остаток в минус;
+  одна бронь на покупателя и оффер, отмена — кнопкой ✖ (rsvx:<offer_id>) возвращает единицу в остаток
+• write-behind: операции reserve/cancel копятся и уходят в бэкенд пачкой раз в RESERVE_FLUSH с
+  (или сразу при RESERVE_BATCH операциях) — всплеск из 1000 нажатий — это 1000 декрементов в памяти и пара запросов;
+  бэкенд недоступен — пачка возвращается в начало очереди и повторяется; пока в очереди RESERVE_MAX_PENDING
+  неотправленных операций, новые брони не принимаются («busy») — не обещаем покупателю то, что не дойдёт до бэкенда
+• остановка: цикл отменяется и дожидается, пачка, прерванная посреди запроса, возвращается в очередь,
+  затем последний синхронный flush
+• оверсейл: остаток мог уйти и мимо бота (касса, сайт) — бэкенд отвечает, какие брони не поместились (rejected),
+  и фактический qty_left; такие брони снимаются, покупателю приходит сообщение, остаток выравнивается
+  с учётом ещё не отправленных операций
+• пачку принимает бэкенд RESERVE_SYNC_URL или, с DATABASE_URL, своя БД (db.Repository.apply_reservations)
+• остатки берутся из снимков NearbyFeed; оффер с недавней активностью снимок не перетирает — его остаток
+  приходит из ответов на flush; распроданный оффер сразу пропадает из /nearby
+• несколько воркеров (WORKER_MODE=hash): кнопки брони акцептор раскладывает по offer_id (shard_key),
+  остаток оффера живёт ровно в одном процессе; при reuseport превышение ловит сверка оверсейла
+ENV:
+  RESERVE=0 (1 — включить; нужен бэкенд RESERVE_SYNC_URL или DATABASE_URL), RESERVE_FLUSH=0.5, RESERVE_BATCH=500,
+  RESERVE_MAX_PENDING=5000, RESERVE_SYNC_URL={API_URL}/api/v1/reservations/batch, RESERVE_SYNC_TIMEOUT=5
+"""
+import os, asyncio, logging, secrets, time
+from collections import Counter
+from typing import NamedTuple, TYPE_CHECKING
+import aiohttp
+from aiogram.utils.markdown import html_decoration as html
+from .config import API_URL
+from .fast_json import loads, dumps
+from .nearby import NearbyFeed, NearbyIndex, Offer
+from .update_pool import chat_key
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+log = logging.getLogger("foody_bot")
+
+RESERVE = os.getenv("RESERVE", "0") in ("1","true","True")
+RESERVE_FLUSH = float(os.getenv("RESERVE_FLUSH", "0.5"))
+RESERVE_BATCH = int(os.getenv("RESERVE_BATCH", "500"))
+RESERVE_MAX_PENDING = int(os.getenv("RESERVE_MAX_PENDING", "5000"))
+RESERVE_SYNC_URL = os.getenv("RESERVE_SYNC_URL", "") or f"{API_URL}/api/v1/reservations/batch"
+RESERVE_SYNC_TIMEOUT = float(os.getenv("RESERVE_SYNC_TIMEOUT", "5"))
+
+RESERVE_CB = "rsv:"
+RESERVE_CANCEL_CB = "rsvx:"
+
+def shard_key(data: dict):
+    """Ключ воркера для multiproc: кнопки брони — по офферу, остальное — по чату."""
+    cq = data.get("callback_query")
+    if isinstance(cq, dict):
+        cb = cq.get("data")
+        if isinstance(cb, str) and cb.startswith((RESERVE_CB, RESERVE_CANCEL_CB)):
+            return "offer:" + cb.partition(":")[2]
+    return chat_key(data)
+
+def offer_buttons(offers) -> tuple:
+    """((offer_id, подпись кнопки), ...) для kb_nearby."""
+    return tuple(
+        (o.id, f"🛒 {o.title[:30]} · {o.price_cents / 100:.0f} ₽")
+        for o in offers
+        if len(f"{RESERVE_CB}{o.id}".encode()) <= 64
+    )
+
+class Reservation(NamedTuple):
+    id: str
+    offer_id: str
+    user_id: int
+    chat_id: int
+    created: float
+
+class Stock:
+    __slots__ = ("offer", "qty_left", "holders", "touched")
+
+    def __init__(self, offer: Offer):
+        self.offer = offer
+        self.qty_left = offer.qty_left
+        self.holders: dict[int, Reservation] = {}  # user_id → бронь
+        self.touched = 0.0  # monotonic последней брони/отмены
+
+class BackendSink:
+    """POST пачки операций; ответ {"rejected": [id, ...], "qty_left": {offer_id: n}}."""
+    def __init__(self, url: str = RESERVE_SYNC_URL, timeout: float = RESERVE_SYNC_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self._session: aiohttp.ClientSession | None = None
+
+    async def __call__(self, ops: list[dict]) -> dict:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        async with self._session.post(self.url, data=dumps({"ops": ops}),
+                                      headers={"Content-Type": "application/json"}) as r:
+            r.raise_for_status()
+            data = loads(await r.read())
+        return data if isinstance(data, dict) else {}
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+class Inventory:
+    def __init__(self, bot: "Bot", feed: NearbyFeed, sink=None, interval: float = RESERVE_FLUSH,
+                 batch: int = RESERVE_BATCH, max_pending: int = RESERVE_MAX_PENDING):
+        self.bot, self.feed = bot, feed
+        self.sink = sink or BackendSink()
+        self.interval, self.batch, self.max_pending = interval, batch, max_pending
+        self.stock: dict[str, Stock] = {}
+        self._by_id: dict[str, Reservation] = {}
+        self._ops: list[dict] = []
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._sending: set[asyncio.Task] = set()
+        self.reserved = self.cancelled = self.sold_out = self.oversold = self.busy = 0
+        self.flushes = self.flushed = self.sync_errors = 0
+        feed.listeners.append(self.on_snapshot)
+
+    # ---------- остатки ----------
+    def on_snapshot(self, index: NearbyIndex):
+        now, quiet = time.time(), time.monotonic() - 2 * max(self.feed.interval, self.interval)
+        for oid, s in list(self.stock.items()):
+            if index.offer(oid) is None and (not s.holders or s.offer.expires_at <= now):
+                for r in s.holders.values():
+                    self._by_id.pop(r.id, None)
+                del self.stock[oid]
+        for offers in index.offers.values():
+            for o in list(offers.values()):
+                s = self.stock.get(o.id)
+                if s is None:
+                    self.stock[o.id] = Stock(o)
+                elif s.touched < quiet:
+                    s.offer, s.qty_left = o, o.qty_left
+                elif s.qty_left == 0:
+                    # снимок мог быть снят до последнего flush — активным офферам остаток даёт ответ бэкенда
+                    index.remove_offer(o.id)
+
+    def reserve(self, offer_id: str, user_id: int, chat_id: int) -> tuple[str, Reservation | None]:
+        """("ok" | "already" | "sold_out" | "gone" | "busy", бронь)."""
+        s = self.stock.get(offer_id)
+        if s is None or s.offer.expires_at <= time.time():
+            return "gone", None
+        r = s.holders.get(user_id)
+        if r is not None:
+            return "already", r
+        if s.qty_left <= 0:
+            self.sold_out += 1
+            return "sold_out", None
+        if len(self._ops) >= self.max_pending:
+            self.busy += 1  # бэкенд давно не принимает пачки — бронь не подтвердить
+            return "busy", None
+        # от проверки до декремента нет await — атомарно для всех корутин этого event loop
+        s.qty_left -= 1
+        s.touched = time.monotonic()
+        r = Reservation(secrets.token_hex(4), offer_id, user_id, chat_id, time.time())
+        s.holders[user_id] = self._by_id[r.id] = r
+        self._push({"op": "reserve", "id": r.id, "offer_id": offer_id, "user_id": user_id, "qty": 1})
+        if s.qty_left == 0:
+            self.feed.index.remove_offer(offer_id)  # распроданное не показываем в /nearby до следующего снимка
+        self.reserved += 1
+        return "ok", r
+
+    def cancel(self, offer_id: str, user_id: int) -> Reservation | None:
+        s = self.stock.get(offer_id)
+        r = s.holders.pop(user_id, None) if s is not None else None
+        if r is None:
+            return None
+        del self._by_id[r.id]
+        s.qty_left += 1
+        s.touched = time.monotonic()
+        self._push({"op": "cancel", "id": r.id, "offer_id": offer_id, "user_id": user_id, "qty": 1})
+        self.cancelled += 1
+        return r
+
+    def _push(self, op: dict):
+        self._ops.append(op)
+        if len(self._ops) >= self.batch:
+            self._wakeup.set()
+
+    # ---------- write-behind ----------
+    async def flush(self) -> bool:
+        if not self._ops:
+            return True
+        batch, self._ops = self._ops[:self.batch], self._ops[self.batch:]
+        try:
+            result = await self.sink(batch)
+        except BaseException as e:
+            self._ops[:0] = batch  # повторим той же пачкой, порядок операций сохраняется
+            if not isinstance(e, Exception):
+                raise  # отмена посреди запроса — пачка осталась в очереди для финального flush
+            self.sync_errors += 1
+            log.warning("reservation sync failed (%s ops queued): %s", len(self._ops), e)
+            return False
+        self.flushes += 1
+        self.flushed += len(batch)
+        self._reconcile(result)
+        return True
+
+    def _reconcile(self, result: dict):
+        rejected = set(result.get("rejected") or ())
+        if rejected:
+            # отмена отклонённой брони, ещё стоящая в очереди, вернула бы в остаток то, чего не списывали
+            self._ops = [op for op in self._ops if not (op["op"] == "cancel" and op["id"] in rejected)]
+        for rid in rejected:
+            r = self._by_id.pop(rid, None)
+            s = self.stock.get(r.offer_id) if r else None
+            if s is None or s.holders.get(r.user_id) is not r:
+                continue
+            # места под бронь у бэкенда не было — снимаем её, в остаток не возвращаем
+            del s.holders[r.user_id]
+            self.oversold += 1
+            self.notify(r.chat_id, f"😔 «{html.quote(s.offer.title)}» закончилось раньше, чем мы успели подтвердить бронь {r.id} — она снята.")
+        qty = result.get("qty_left") or {}
+        if qty:
+            # ещё не отправленные операции бэкенд не видел — учитываем их поверх его остатка
+            pending = Counter()
+            for op in self._ops:
+                pending[op["offer_id"]] += op["qty"] if op["op"] == "reserve" else -op["qty"]
+            for oid, n in qty.items():
+                s = self.stock.get(oid)
+                if s is None:
+                    continue
+                s.qty_left = max(0, int(n) - pending[oid])
+                if s.qty_left == 0:
+                    self.feed.index.remove_offer(oid)
+                else:
+                    self.feed.index.upsert_offer(s.offer._replace(qty_left=s.qty_left))
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._ops:
+                if not await self.flush():
+                    break  # бэкенд лежит — следующая попытка через interval
+
+    # ---------- сообщения ----------
+    def notify(self, chat_id: int, text: str, cancel_offer: str | None = None):
+        """Сообщение покупателю в фоне — хендлер не ждёт отправки (лимиты — в send_queue.py)."""
+        task = asyncio.ensure_future(self._send(chat_id, text, cancel_offer))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, chat_id: int, text: str, cancel_offer: str | None):
+        from .keyboards import kb_reserved
+        try:
+            await self.bot.send_message(chat_id, text, reply_markup=kb_reserved(cancel_offer) if cancel_offer else None)
+        except Exception as e:
+            log.warning("reservation message to %s failed: %s", chat_id, e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._ops:
+            if not await self.flush():
+                log.warning("reservation sync: %s ops not delivered on shutdown", len(self._ops))
+                break
+        for task in list(self._sending):
+            task.cancel()
+        await asyncio.gather(*self._sending, return_exceptions=True)
+        close = getattr(self.sink, "close", None)
+        if close:
+            await close()
+
+    def stats(self) -> dict:
+        return {
+            "offers": len(self.stock),
+            "active": len(self._by_id),
+            "reserved": self.reserved,
+            "cancelled": self.cancelled,
+            "sold_out": self.sold_out,
+            "busy": self.busy,
+            "oversold": self.oversold,
+            "pending_ops": len(self._ops),
+            "flushes": self.flushes,
+            "flushed": self.flushed,
+            "sync_errors": self.sync_errors,
+        }
+
+def make_inventory(bot: "Bot", feed: NearbyFeed | None, repo=None) -> Inventory | None:
+    if not RESERVE or feed is None:
+        return None
+    return Inventory(bot, feed, repo.apply_reservations if repo else None)
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+restaurants.py — проверка rid из deep-link (/start <rid>) по бэкенду API_URL (таблица restaurants)
+• TTLCache: LRU на OrderedDict + TTL на запись; найденные точки живут RID_CACHE_TTL,
+  404 — RID_NEGATIVE_TTL, остальные ошибки бэкенда — RID_ERROR_TTL (не долбим лежащий бэкенд)
+• coalescing: одновременные запросы одного rid ждут одну задачу загрузки — тысячи сканов QR одной
+  кампании дают один запрос к бэкенду
+• rid проверяется регуляркой до сети; точки нет (404, битый rid) → RestaurantNotFound, хендлер отвечает
+  «не найдена» и rid в ссылку не передаёт; проверить не удалось (бэкенд недоступен, не JSON, нет title) →
+  RestaurantLookupError, хендлер отвечает как раньше и передаёт rid без проверки
+• с DATABASE_URL точка читается из своей БД (db.py, loader) вместо HTTP — кэш и coalescing те же
+ENV:
+  RID_LOOKUP=0 (1 — проверять rid), RID_LOOKUP_URL={API_URL}/api/v1/restaurants/{rid},
+  RID_CACHE_SIZE=10000, RID_CACHE_TTL=300, RID_NEGATIVE_TTL=60, RID_ERROR_TTL=5, RID_LOOKUP_TIMEOUT=2
+"""
+import os, re, asyncio, logging, time
+from collections import OrderedDict
+from typing import NamedTuple
+from urllib.parse import quote
+import aiohttp
+from .config import API_URL
+from .fast_json import loads
+
+log = logging.getLogger("foody_bot")
+
+RID_LOOKUP = os.getenv("RID_LOOKUP", "0") in ("1","true","True")
+RID_LOOKUP_URL = os.getenv("RID_LOOKUP_URL", "") or f"{API_URL}/api/v1/restaurants/{{rid}}"
+RID_CACHE_SIZE = int(os.getenv("RID_CACHE_SIZE", "10000"))
+RID_CACHE_TTL = float(os.getenv("RID_CACHE_TTL", "300"))
+RID_NEGATIVE_TTL = float(os.getenv("RID_NEGATIVE_TTL", "60"))
+RID_ERROR_TTL = float(os.getenv("RID_ERROR_TTL", "5"))
+RID_LOOKUP_TIMEOUT = float(os.getenv("RID_LOOKUP_TIMEOUT", "2"))
+
+RID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+class Restaurant(NamedTuple):
+    id: str
+    title: str
+    lat: float | None = None
+    lng: float | None = None
+
+class RestaurantLookupError(Exception):
+    """Проверить rid не удалось: бэкенд не ответил, ответил ошибкой или непонятным телом."""
+
+class RestaurantNotFound(RestaurantLookupError):
+    """Бэкенд ответил 404 или rid не проходит регулярку."""
+
+_MISSING = object()
+
+class TTLCache:
+    def __init__(self, maxsize: int = RID_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key, default=_MISSING):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, expires = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float):
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+def parse_restaurant(data, rid: str) -> Restaurant | None:
+    if isinstance(data, dict) and isinstance(data.get("restaurant"), dict):
+        data = data["restaurant"]
+    if not isinstance(data, dict):
+        return None
+    title = data.get("title") or data.get("name")
+    if not title:
+        return None
+    return Restaurant(str(data.get("id") or rid), str(title), data.get("lat"), data.get("lng"))
+
+class RestaurantResolver:
+    def __init__(self, url: str = RID_LOOKUP_URL, maxsize: int = RID_CACHE_SIZE, ttl: float = RID_CACHE_TTL,
+                 negative_ttl: float = RID_NEGATIVE_TTL, error_ttl: float = RID_ERROR_TTL,
+                 timeout: float = RID_LOOKUP_TIMEOUT, loader=None):
+        self.url = url
+        self.loader = loader  # async rid → Restaurant | None вместо HTTP
+        self.cache = TTLCache(maxsize)
+        self.ttl, self.negative_ttl, self.error_ttl = ttl, negative_ttl, error_ttl
+        self.timeout = timeout
+        self._session: aiohttp.ClientSession | None = None
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.hits = self.misses = self.coalesced = self.invalid = self.backend_calls = self.errors = 0
+
+    async def resolve(self, rid: str) -> Restaurant:
+        """Restaurant; RestaurantLookupError — проверить rid не удалось."""
+        if not RID_RE.fullmatch(rid):
+            self.invalid += 1
+            raise RestaurantNotFound("invalid rid")
+        value = self.cache.get(rid)
+        if value is not _MISSING:
+            self.hits += 1
+            if isinstance(value, RestaurantLookupError):
+                raise type(value)(*value.args)
+            return value
+        task = self._inflight.get(rid)
+        if task is None:
+            self.misses += 1
+            task = self._inflight[rid] = asyncio.ensure_future(self._load(rid))
+            # исключение забирается здесь, даже если все ожидающие отменены
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        else:
+            self.coalesced += 1
+        # shield: отмена одного ожидающего (таймаут апдейта) не отменяет загрузку для остальных
+        return await asyncio.shield(task)
+
+    async def _load(self, rid: str) -> Restaurant:
+        try:
+            value = await self._fetch(rid)
+        except RestaurantLookupError as e:
+            self.errors += 1
+            log.warning("rid lookup failed for %s: %s", rid, e)
+            self.cache.set(rid, e, self.negative_ttl if isinstance(e, RestaurantNotFound) else self.error_ttl)
+            raise
+        finally:
+            self._inflight.pop(rid, None)
+        self.cache.set(rid, value, self.ttl)
+        return value
+
+    async def _fetch(self, rid: str) -> Restaurant:
+        if self.loader is not None:
+            self.backend_calls += 1
+            try:
+                value = await asyncio.wait_for(self.loader(rid), self.timeout)
+            except Exception as e:
+                raise RestaurantLookupError(f"{type(e).__name__}: {e}") from e
+            if value is None:
+                raise RestaurantNotFound("not found")
+            return value
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300),
+            )
+        self.backend_calls += 1
+        try:
+            async with self._session.get(self.url.format(rid=quote(rid))) as r:
+                if r.status == 404:
+                    raise RestaurantNotFound("HTTP 404")
+                if r.status >= 400:
+                    raise RestaurantLookupError(f"HTTP {r.status}")
+                value = parse_restaurant(loads(await r.read()), rid)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise RestaurantLookupError(f"{type(e).__name__}: {e}") from e
+        if value is None:
+            raise RestaurantLookupError("no title in response")
+        return value
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> dict:
+        return {
+            "cached": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalid": self.invalid,
+            "backend_calls": self.backend_calls,
+            "errors": self.errors,
+        }
+
+def make_resolver(repo=None) -> RestaurantResolver | None:
+    if not RID_LOOKUP:
+        return None
+    return RestaurantResolver(loader=repo.restaurant if repo else None)
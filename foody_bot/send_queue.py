@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+send_queue.py — планировщик исходящих вызовов Bot API (request-middleware для bot.session)
+• Лимиты Telegram: ~1 msg/s в чат (группы ~20 msg/min) и ~30 msg/s на бота — token bucket (GCRA)
+• Приоритеты: ответы на команды (REPLY) идут раньше рассылок (BROADCAST), см. send_priority()
+• retry_after (429) обрабатывается здесь: чат ставится на паузу, запрос повторяется из очереди
+• вызов кладётся в очередь и возвращает future: ожидание лимита чата, общего лимита и повторы после 429 идут
+  в фоновой задаче планировщика, корутина вызывающего только ждёт результат (или не ждёт — core.py)
+• close(): вызовы, не ушедшие из очереди, завершаются SendQueueClosed
+• stats() — задержка в очереди (p50/p99/max), размер очереди, число 429 и повторов
+Подключение:
+  sender = SendScheduler(); bot.session.middleware(sender)
+ENV:
+  SEND_GLOBAL_RATE=30, SEND_GLOBAL_BURST=30, SEND_CHAT_RATE=1, SEND_CHAT_BURST=3,
+  SEND_GROUP_RATE=0.33, SEND_MAX_RETRIES=3
+"""
+import os, asyncio, contextvars, heapq, itertools, logging
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+log = logging.getLogger("foody_bot")
+
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_GLOBAL_BURST = int(os.getenv("SEND_GLOBAL_BURST", "30"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+SEND_CHAT_BURST = int(os.getenv("SEND_CHAT_BURST", "3"))
+SEND_GROUP_RATE = float(os.getenv("SEND_GROUP_RATE", "0.33"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+
+PRIORITY_REPLY = 0
+PRIORITY_BROADCAST = 10
+
+# методы, которые Telegram считает «сообщениями в чат» для flood control
+LIMITED_PREFIXES = ("send", "copyMessage", "forwardMessage")
+
+send_priority: contextvars.ContextVar[int] = contextvars.ContextVar("send_priority", default=PRIORITY_REPLY)
+
+@contextmanager
+def priority(level: int):
+    """with priority(PRIORITY_BROADCAST): await bot.send_message(...)"""
+    token = send_priority.set(level)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+class TokenBucket:
+    """GCRA: reserve() сразу занимает слот и возвращает, сколько секунд ждать."""
+    __slots__ = ("interval", "tolerance", "tat")
+
+    def __init__(self, rate: float, burst: int):
+        self.interval = 1.0 / rate
+        self.tolerance = (max(1, burst) - 1) * self.interval
+        self.tat = 0.0
+
+    def reserve(self, now: float) -> float:
+        tat = max(self.tat, now)
+        self.tat = tat + self.interval
+        return max(0.0, tat - self.tolerance - now)
+
+    def pause(self, until: float):
+        self.tat = max(self.tat, until + self.tolerance)
+
+    def idle(self, now: float) -> bool:
+        return self.tat <= now
+
+class SendQueueClosed(RuntimeError):
+    """Планировщик остановлен, вызов из очереди так и не ушёл."""
+
+class _Job:
+    __slots__ = ("prio", "chat_id", "call", "fut", "attempt", "queued", "ctx")
+
+    def __init__(self, prio: int, chat_id, call: tuple, fut: asyncio.Future, queued: float):
+        self.prio, self.chat_id, self.call, self.fut, self.queued = prio, chat_id, call, fut, queued
+        self.attempt = 0
+        self.ctx = contextvars.copy_context()  # логи и метрики отправки — в контексте вызывающего
+
+class SendScheduler(BaseRequestMiddleware):
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE, global_burst: int = SEND_GLOBAL_BURST,
+                 chat_rate: float = SEND_CHAT_RATE, chat_burst: int = SEND_CHAT_BURST,
+                 group_rate: float = SEND_GROUP_RATE, max_retries: int = SEND_MAX_RETRIES,
+                 max_buckets: int = 10000):
+        self.chat_rate, self.chat_burst, self.group_rate = chat_rate, chat_burst, group_rate
+        self.max_retries = max_retries
+        self.max_buckets = max_buckets
+        self._global = TokenBucket(global_rate, global_burst)
+        self._chats: OrderedDict = OrderedDict()  # LRU: давно молчавший чат вытесняется первым
+        self._heap: list = []  # готовые к отправке: (приоритет, seq, job)
+        self._delayed: list = []  # ждут лимита чата или retry_after: (когда, seq, job)
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._sending: set[asyncio.Task] = set()
+        self._waits = deque(maxlen=2048)
+        self.sent = 0
+        self.throttled = 0  # пришёл 429
+        self.retried = 0
+        self.wait_max = 0.0
+
+    def _bucket(self, chat_id) -> TokenBucket:
+        b = self._chats.get(chat_id)
+        if b is None:
+            if len(self._chats) >= self.max_buckets:
+                self._chats.popitem(last=False)
+            group = isinstance(chat_id, str) or chat_id < 0
+            b = self._chats[chat_id] = TokenBucket(self.group_rate if group else self.chat_rate, self.chat_burst)
+        else:
+            self._chats.move_to_end(chat_id)
+        return b
+
+    def _schedule(self, job: _Job, now: float):
+        """Слот чата занимается сразу; до него вызов лежит в _delayed, ожидание — в _pump, не у вызывающего."""
+        delay = self._bucket(job.chat_id).reserve(now)
+        if delay > 0:
+            heapq.heappush(self._delayed, (now + delay, next(self._seq), job))
+        else:
+            heapq.heappush(self._heap, (job.prio, next(self._seq), job))
+        self._wakeup.set()
+
+    async def _pump(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            while self._delayed and self._delayed[0][0] <= now:
+                job = heapq.heappop(self._delayed)[2]
+                heapq.heappush(self._heap, (job.prio, next(self._seq), job))
+            while self._heap and self._heap[0][2].fut.done():
+                heapq.heappop(self._heap)  # вызывающий отменён
+            if not self._heap:
+                self._wakeup.clear()
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            delay = self._global.reserve(now)
+            if delay > 0:
+                await asyncio.sleep(delay)  # пока ждём, в кучу могут прийти более приоритетные
+            while self._heap:
+                job = heapq.heappop(self._heap)[2]
+                if not job.fut.done():
+                    self._start(job, loop.time())
+                    break
+
+    def _start(self, job: _Job, now: float):
+        waited = now - job.queued
+        self._waits.append(waited)
+        if waited > self.wait_max:
+            self.wait_max = waited
+        task = asyncio.create_task(self._send(job), context=job.ctx)
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, job: _Job):
+        make_request, bot, method = job.call
+        fut = job.fut
+        try:
+            result = await make_request(bot, method)
+        except TelegramRetryAfter as e:
+            self.throttled += 1
+            if job.attempt == self.max_retries or fut.done():
+                if not fut.done():
+                    fut.set_exception(e)
+                return
+            self.retried += 1
+            now = asyncio.get_running_loop().time()
+            self._bucket(job.chat_id).pause(now + e.retry_after)
+            log.warning("429 on %s chat=%s, retry in %ss", method.__api_method__, job.chat_id, e.retry_after)
+            job.attempt += 1
+            self._schedule(job, now)
+        except BaseException as e:
+            if not fut.done():
+                if isinstance(e, asyncio.CancelledError):
+                    fut.cancel()
+                else:
+                    fut.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            self.sent += 1
+            if not fut.done():
+                fut.set_result(result)
+
+    def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not method.__api_method__.startswith(LIMITED_PREFIXES):
+            return make_request(bot, method)
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._pump())
+        fut = loop.create_future()
+        now = loop.time()
+        self._schedule(_Job(send_priority.get(), chat_id, (make_request, bot, method), fut, now), now)
+        return fut
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.gather(*self._sending, return_exceptions=True)  # 429 в них вернёт вызов в очередь
+        # не ушедшие вызовы получают ошибку — иначе их ждали бы вечно
+        for _, _, job in self._heap + self._delayed:
+            if not job.fut.done():
+                job.fut.set_exception(SendQueueClosed("send scheduler closed"))
+        self._heap.clear()
+        self._delayed.clear()
+
+    def stats(self) -> dict:
+        w = sorted(self._waits)
+        pct = lambda p: round(w[min(len(w) - 1, int(len(w) * p))] * 1000, 1) if w else 0.0
+        return {
+            "queued": len(self._heap) + len(self._delayed),
+            "in_flight": len(self._sending),
+            "chats": len(self._chats),
+            "sent": self.sent,
+            "throttled": self.throttled,
+            "retried": self.retried,
+            "wait_p50_ms": pct(0.5),
+            "wait_p99_ms": pct(0.99),
+            "wait_max_ms": round(self.wait_max * 1000, 1),
+        }
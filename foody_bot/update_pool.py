@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+update_pool.py — ограниченный пул обработки апдейтов для вебхука
+• N воркеров разбирают очередь фиксированной длины (вместо create_task на каждый апдейт)
+• submit() возвращает False, если очередь полна → вебхук отвечает 503 и Telegram повторит доставку
+• drain() дожидается in-flight апдейтов на on_shutdown
+• stats() — глубина очереди и занятость воркеров для /health
+• ChatLanePool — апдейты одного chat.id строго по порядку, разные чаты параллельно
+ENV:
+  UPDATE_WORKERS (по умолчанию 8), UPDATE_QUEUE_MAX (по умолчанию 1000),
+  UPDATE_DRAIN_TIMEOUT (сек, по умолчанию 25),
+  UPDATE_ORDERING=chat (по умолчанию) | fifo
+"""
+import os, asyncio, logging
+from collections import deque
+
+log = logging.getLogger("foody_bot")
+
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "8"))
+UPDATE_QUEUE_MAX = int(os.getenv("UPDATE_QUEUE_MAX", "1000"))
+UPDATE_DRAIN_TIMEOUT = float(os.getenv("UPDATE_DRAIN_TIMEOUT", "25"))
+UPDATE_ORDERING = os.getenv("UPDATE_ORDERING", "chat")
+
+class UpdatePool:
+    def __init__(self, handler, workers: int = UPDATE_WORKERS, maxsize: int = UPDATE_QUEUE_MAX):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.maxsize = max(1, maxsize)
+        self._queue: asyncio.Queue = asyncio.Queue(self.maxsize)
+        self._tasks: list[asyncio.Task] = []
+        self.closing = False
+        self.busy = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+
+    def start(self):
+        if self._tasks:
+            return
+        self.closing = False
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        log.info("update pool started: workers=%s queue_max=%s", self.workers, self.maxsize)
+
+    def submit(self, data, *args) -> bool:
+        # args уходят в handler(data, *args) вместе с апдейтом (например, слот для ответа в вебхук)
+        if self.closing:
+            self.rejected += 1
+            return False
+        try:
+            self._queue.put_nowait((data, *args))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    async def _run(self, item: tuple):
+        self.busy += 1
+        try:
+            await self.handler(*item)
+        except Exception as e:
+            log.exception("update worker failed: %s", e)
+        finally:
+            self.busy -= 1
+            self.processed += 1
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._run(item)
+            finally:
+                self._queue.task_done()
+
+    async def drain(self, timeout: float = UPDATE_DRAIN_TIMEOUT):
+        # новые апдейты больше не принимаем — Telegram доставит их следующему инстансу
+        self.closing = True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            log.warning("update pool drain timeout: queued=%s busy=%s", self._queue.qsize(), self.busy)
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        log.info("update pool stopped: processed=%s rejected=%s", self.processed, self.rejected)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "busy": self.busy,
+            "queued": self._queue.qsize(),
+            "queue_max": self.maxsize,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "processed": self.processed,
+        }
+
+def chat_key(data: dict):
+    # chat.id из любого вида апдейта (message, edited_message, callback_query.message, ...),
+    # иначе from.id; None — апдейт без чата, обрабатывается без упорядочивания
+    for k, obj in data.items():
+        if k == "update_id" or not isinstance(obj, dict):
+            continue
+        chat = obj.get("chat") or (obj.get("message") or {}).get("chat")
+        if chat and "id" in chat:
+            return chat["id"]
+        user = obj.get("from") or obj.get("user")
+        if user and "id" in user:
+            return user["id"]
+    return None
+
+class ChatLanePool(UpdatePool):
+    """
+    Полосы по chat.id: в одной полосе апдейты идут строго по очереди, разные полосы
+    обрабатываются параллельно не более чем `workers` воркерами. В очереди воркеров лежат
+    ключи готовых полос (каждый не более одного раза), опустевшая полоса сразу удаляется —
+    память пропорциональна числу ожидающих апдейтов, а не числу когда-либо виденных чатов.
+    """
+    def __init__(self, handler, workers: int = UPDATE_WORKERS, maxsize: int = UPDATE_QUEUE_MAX, key=chat_key):
+        super().__init__(handler, workers=workers, maxsize=maxsize)
+        self.key = key
+        self._lanes: dict = {}
+        self._pending = 0
+
+    def submit(self, data, *args) -> bool:
+        if self.closing or self._pending >= self.maxsize:
+            self.rejected += 1
+            return False
+        k = self.key(data)
+        if k is None:
+            k = object()  # собственная одноразовая полоса
+        lane = self._lanes.get(k)
+        if lane is None:
+            self._lanes[k] = deque(((data, *args),))
+            self._queue.put_nowait(k)  # готовых полос не больше, чем ожидающих апдейтов
+        else:
+            lane.append((data, *args))  # полоса уже в очереди или в работе — воркер вернёт её сам
+        self._pending += 1
+        self.accepted += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            k = await self._queue.get()
+            lane = self._lanes[k]
+            try:
+                await self._run(lane.popleft())
+            finally:
+                self._pending -= 1
+                if lane:
+                    self._queue.put_nowait(k)  # в хвост — чтобы длинная полоса не душила остальные
+                else:
+                    del self._lanes[k]
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        st = super().stats()
+        st["queued"] = self._pending - self.busy
+        st["lanes"] = len(self._lanes)
+        return st
+
+def make_pool(handler) -> UpdatePool:
+    if UPDATE_ORDERING == "fifo":
+        return UpdatePool(handler)
+    return ChatLanePool(handler)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+webapp_auth.py — проверка initData Telegram Mini App для веб-аппов ЛК партнёра и витрины
+• POST WEBAPP_AUTH_PATH: initData (window.Telegram.WebApp.initData) — телом как есть, JSON {"initData": ...}
+  или заголовком Authorization: tma <initData>; ответ 200 {"ok": true, "user": {...}, "auth_date", ...}
+  или 401 {"ok": false, "error": ...}. Доверять можно только этому user — tg_uid/tg_uname в URL
+  (KEYBOARD_MODE=url_uid) подделываются правкой ссылки
+• подпись: hash = HMAC_SHA256(secret_key, data-check-string), secret_key = HMAC_SHA256("WebAppData", BOT_TOKEN) —
+  ключ считается один раз при создании валидатора, сравнение — hmac.compare_digest
+• auth_date старше WEBAPP_AUTH_MAX_AGE — отказ: перехваченная строка не живёт вечно
+• кэш проверенных: ключ — initData целиком (hash внутри неё; изменённое поле — другой ключ, снова HMAC),
+  живёт WEBAPP_AUTH_TTL, но не дольше срока самой initData; повторные вызовы веб-аппа с той же строкой —
+  поиск в dict без разбора и HMAC. Отказы не кэшируются — мусорные строки не вытесняют проверенные
+• CORS: ответ читают страницы WEBAPP_MERCHANT_URL / WEBAPP_BUYER_URL (+ WEBAPP_AUTH_ORIGINS), OPTIONS — preflight
+• с WORKERS>1 (hash) запрос проверяет сам акцептор multiproc.py — воркеры бота не участвуют
+ENV:
+  WEBAPP_AUTH=0, WEBAPP_AUTH_PATH=/webapp/auth, WEBAPP_AUTH_MAX_AGE=86400 (0 — без проверки), WEBAPP_AUTH_TTL=60,
+  WEBAPP_AUTH_CACHE=10000, WEBAPP_AUTH_ORIGINS (через запятую)
+"""
+import os, hashlib, hmac, time
+from urllib.parse import unquote_plus, urlsplit
+from . import config
+from .fast_json import loads
+from .restaurants import TTLCache
+
+WEBAPP_AUTH = os.getenv("WEBAPP_AUTH", "0") in ("1","true","True")
+WEBAPP_AUTH_PATH = os.getenv("WEBAPP_AUTH_PATH", "/webapp/auth")
+WEBAPP_AUTH_MAX_AGE = int(os.getenv("WEBAPP_AUTH_MAX_AGE", "86400"))
+WEBAPP_AUTH_TTL = float(os.getenv("WEBAPP_AUTH_TTL", "60"))
+WEBAPP_AUTH_CACHE = int(os.getenv("WEBAPP_AUTH_CACHE", "10000"))
+WEBAPP_AUTH_ORIGINS = os.getenv("WEBAPP_AUTH_ORIGINS", "")
+
+INIT_DATA_MAX = 4096  # initData Telegram — сотни байт; длиннее — не разбираем
+
+class InitDataError(ValueError):
+    """initData не прошла проверку; текст — причина для ответа 401."""
+
+def _origin(url: str) -> str:
+    u = urlsplit(url)
+    return f"{u.scheme}://{u.netloc}" if u.scheme and u.netloc else ""
+
+class InitDataValidator:
+    def __init__(self, token: str = config.BOT_TOKEN, max_age: int = WEBAPP_AUTH_MAX_AGE, ttl: float = WEBAPP_AUTH_TTL,
+                 maxsize: int = WEBAPP_AUTH_CACHE, origins: str = WEBAPP_AUTH_ORIGINS):
+        self._secret = hmac.new(b"WebAppData", token.encode(), hashlib.sha256).digest()
+        self.max_age, self.ttl = max_age, ttl
+        self.cache = TTLCache(maxsize)
+        extra = [o.strip().rstrip("/") for o in origins.split(",") if o.strip()]
+        self.origins = frozenset(filter(None, [_origin(config.WEBAPP_MERCHANT_URL), _origin(config.WEBAPP_BUYER_URL), *extra]))
+        self.hits = self.verified = self.rejected = 0
+
+    def validate(self, init_data: str, now: float | None = None) -> dict:
+        """Проверенные поля initData ({"user": ..., "auth_date": ..., ...}) или InitDataError."""
+        value = self.cache.get(init_data, None)
+        if value is not None:
+            self.hits += 1
+            return value
+        now = time.time() if now is None else now
+        try:
+            data = self._verify(init_data, now)
+        except InitDataError:
+            self.rejected += 1
+            raise
+        self.verified += 1
+        ttl = min(self.ttl, data["auth_date"] + self.max_age - now) if self.max_age else self.ttl
+        self.cache.set(init_data, data, ttl)
+        return data
+
+    def _verify(self, init_data: str, now: float) -> dict:
+        if not init_data or len(init_data) > INIT_DATA_MAX:
+            raise InitDataError("initData is empty or too long")
+        fields = parse_fields(init_data)
+        got = fields.pop("hash", "")
+        if not got:
+            raise InitDataError("hash is missing")
+        check = "\n".join(f"{k}={fields[k]}" for k in sorted(fields))
+        want = hmac.new(self._secret, check.encode(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(want, got):
+            raise InitDataError("bad signature")
+        try:
+            auth_date = int(fields.get("auth_date", ""))
+            user = loads(fields["user"]) if "user" in fields else None
+        except ValueError:
+            raise InitDataError("malformed fields") from None
+        if self.max_age and now - auth_date > self.max_age:
+            raise InitDataError("initData expired")
+        return {
+            "ok": True,
+            "user": user,
+            "auth_date": auth_date,
+            "query_id": fields.get("query_id"),
+            "start_param": fields.get("start_param"),
+            "chat_type": fields.get("chat_type"),
+            "chat_instance": fields.get("chat_instance"),
+        }
+
+    def cors(self, origin: str | None) -> dict:
+        if not origin or origin not in self.origins:
+            return {}
+        return {"Access-Control-Allow-Origin": origin, "Vary": "Origin"}
+
+    def preflight(self, origin: str | None) -> tuple[int, dict]:
+        headers = self.cors(origin)
+        if headers:
+            headers.update({
+                "Access-Control-Allow-Methods": "POST, OPTIONS",
+                "Access-Control-Allow-Headers": "Authorization, Content-Type",
+                "Access-Control-Max-Age": "86400",
+            })
+        return 204, headers
+
+    def handle(self, body: bytes, authorization: str | None, origin: str | None) -> tuple[int, dict, dict]:
+        """→ (status, JSON-ответ, заголовки CORS): транспорт (aiohttp / FastAPI / акцептор) только упаковывает."""
+        headers = self.cors(origin)
+        try:
+            return 200, self.validate(extract_init_data(body, authorization)), headers
+        except InitDataError as e:
+            return 401, {"ok": False, "error": str(e)}, headers
+
+    def stats(self) -> dict:
+        return {"cached": len(self.cache), "hits": self.hits, "verified": self.verified, "rejected": self.rejected}
+
+def parse_fields(init_data: str) -> dict:
+    """Разбор query string initData: как parse_qsl, но unquote — только у значений с экранированием
+    (в initData экранирован почти один user), повтор поля — отказ."""
+    fields = {}
+    for part in init_data.split("&"):
+        k, _, v = part.partition("=")
+        if "%" in k or "+" in k:
+            k = unquote_plus(k)
+        if k in fields:
+            raise InitDataError("duplicate fields")
+        fields[k] = unquote_plus(v) if "%" in v or "+" in v else v
+    return fields
+
+def extract_init_data(body: bytes, authorization: str | None) -> str:
+    if authorization and authorization[:4].lower() == "tma ":
+        return authorization[4:].strip()
+    body = body.strip()
+    if body.startswith(b"{"):
+        try:
+            data = loads(body)
+        except ValueError:
+            raise InitDataError("malformed JSON") from None
+        value = data.get("initData") or data.get("init_data") if isinstance(data, dict) else None
+        return value if isinstance(value, str) else ""
+    try:
+        return body.decode()
+    except UnicodeDecodeError:
+        raise InitDataError("initData is not UTF-8") from None
+
+def add_aiohttp_routes(app, validator: InitDataValidator):
+    """POST/OPTIONS WEBAPP_AUTH_PATH на aiohttp-приложении (бот или акцептор multiproc)."""
+    from aiohttp import web
+
+    async def auth(request: web.Request):
+        status, payload, headers = validator.handle(await request.read(), request.headers.get("Authorization"),
+                                                    request.headers.get("Origin"))
+        return web.json_response(payload, status=status, headers=headers)
+
+    async def preflight(request: web.Request):
+        status, headers = validator.preflight(request.headers.get("Origin"))
+        return web.Response(status=status, headers=headers)
+
+    app.router.add_post(WEBAPP_AUTH_PATH, auth)
+    app.router.add_route("OPTIONS", WEBAPP_AUTH_PATH, preflight)
+
+def make_webapp_auth() -> InitDataValidator | None:
+    if not WEBAPP_AUTH or not config.BOT_TOKEN:
+        return None
+    return InitDataValidator()
@@ -0,0 +1,48 @@
+from foody_bot.dedup import UpdateWindow
+
+def test_new_and_repeated_ids():
+    w = UpdateWindow(64)
+    assert w.add(100)
+    assert not w.add(100)
+    assert w.add(101)
+    assert w.add(99)  # пришёл позже соседа, но в окне и ещё не виден
+    assert not w.add(99)
+
+def test_id_below_window_resets_it():
+    # после долгой паузы Telegram начинает update_id заново с меньшего значения
+    w = UpdateWindow(64)
+    assert w.add(1000)
+    assert w.add(1000 - 63)  # ещё в окне — опоздавший апдейт
+    assert w.add(200)
+    assert w.resets == 1 and w.top == 200
+    assert not w.add(200)
+    assert w.add(201)
+    assert w.add(199)
+    assert w.add(1000 - 63)  # старый счётчик забыт целиком
+    assert w.resets == 1
+
+def test_moving_forward_frees_slots_of_the_same_ring_position():
+    w = UpdateWindow(64)
+    assert w.add(10)
+    assert w.add(10 + 64)  # тот же слот кольца: старая отметка снята сдвигом окна
+    assert not w.add(10 + 64)
+
+def test_jump_further_than_window_clears_everything():
+    w = UpdateWindow(64)
+    for uid in range(1, 65):
+        assert w.add(uid)
+    assert w.add(10_000)
+    assert all(w.add(uid) for uid in range(10_000 - 63, 10_000))
+
+def test_discard_lets_redelivery_through():
+    w = UpdateWindow(64)
+    assert w.add(5)
+    w.discard(5)
+    assert w.add(5)
+    w.discard(5 - 64)  # ниже окна — ничего не делает
+    assert not w.add(5)
+
+def test_size_rounds_to_whole_bytes():
+    w = UpdateWindow(70)
+    assert w.size == 64
+    assert len(w.bits) == 8
@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+from foody_bot import fsm_storage
+from foody_bot.fsm_storage import BoundedStorage, GENERATIONS, ENTRY_BYTES
+
+BOT = 42
+T0 = 1_700_000_000.0
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [T0]
+    monkeypatch.setattr(fsm_storage.time, "time", lambda: now[0])
+    return now
+
+def key(uid: int, chat: int | None = None) -> StorageKey:
+    return StorageKey(bot_id=BOT, chat_id=uid if chat is None else chat, user_id=uid)
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_state_and_data_roundtrip(clock):
+    s = BoundedStorage(BOT, ttl=3600, path="")
+    run(s.set_state(key(1), "Reserve:qty"))
+    run(s.set_data(key(1), {"offer_id": "o1", "qty": 2}))
+    run(s.set_state(key(-100, chat=-100), "Onboarding:rid"))
+    assert run(s.get_state(key(1))) == "Reserve:qty"
+    assert run(s.get_data(key(1))) == {"offer_id": "o1", "qty": 2}
+    assert run(s.get_state(key(-100, chat=-100))) == "Onboarding:rid"
+    assert run(s.get_state(key(2))) is None
+    # пустое состояние без данных — записи нет, а пустое хранилище не ложно (Dispatcher(storage=...) проверяет or)
+    run(s.set_state(key(1), None))
+    run(s.set_data(key(1), {}))
+    run(s.set_state(key(-100, chat=-100), None))
+    assert s.size == 0 and s.bytes == 0
+    assert s
+
+def test_entry_expires_a_generation_after_ttl(clock):
+    s = BoundedStorage(BOT, ttl=1600, path="")  # поколение — 100 с
+    run(s.set_state(key(1), "A:a"))
+    clock[0] = T0 + 1600
+    assert run(s.get_state(key(1))) == "A:a"  # чтение переносит запись в текущее поколение
+    clock[0] = T0 + 1600 + 1600 + 1.5 * s.step
+    run(s.set_state(key(2), "A:a"))  # сдвиг поколения снимает истёкшие целиком
+    assert s.expired == 1
+    assert run(s.get_state(key(1))) is None
+    assert s.bytes == ENTRY_BYTES
+
+def test_access_keeps_entry_alive(clock):
+    s = BoundedStorage(BOT, ttl=1600, path="")
+    run(s.set_state(key(1), "A:a"))
+    for _ in range(5):
+        clock[0] += 1000
+        assert run(s.get_state(key(1))) == "A:a"
+    assert s.expired == 0
+
+def test_generations_are_bounded_without_ttl(clock):
+    s = BoundedStorage(BOT, ttl=0, path="")
+    for uid in range(1, 4 * GENERATIONS):
+        run(s.set_state(key(uid), "A:a"))
+        clock[0] += s.step
+    run(s.get_state(key(10_000)))  # сдвиг поколения сливает самые старые
+    assert len(s.gens) <= 2 * GENERATIONS
+    assert run(s.get_state(key(1))) == "A:a"
+    assert s.size == 4 * GENERATIONS - 1
+
+def test_eviction_drops_oldest_first(clock):
+    limit = 100 * ENTRY_BYTES
+    s = BoundedStorage(BOT, ttl=3600, max_mb=limit / 2**20, path="")
+    for uid in range(1, 51):
+        run(s.set_state(key(uid), "A:a"))
+    clock[0] += s.step
+    run(s.get_state(key(1)))  # 1 — в новом поколении: вытесняться должен последним
+    for uid in range(51, 111):
+        run(s.set_state(key(uid), "A:a"))
+    assert s.bytes <= limit
+    kept = {k for d in s.gens.values() for k in d}
+    assert 1 in kept
+    assert s.evicted == 110 - len(kept)
+    # из старого поколения ушли самые ранние записи, поздние остались
+    old = [uid for uid in range(2, 51) if uid in kept]
+    assert old == list(range(51 - len(old), 51))
+
+def test_journal_restores_live_entries(clock, tmp_path):
+    path = str(tmp_path / "fsm.jsonl")
+    s = BoundedStorage(BOT, ttl=3600, path=path)
+    s.restore()
+    run(s.set_state(key(1), "Reserve:qty"))
+    run(s.set_data(key(1), {"offer_id": "o1"}))
+    run(s.set_state(key(2), "A:a"))
+    run(s.set_state(key(2), None))
+    run(s.set_state(key(3, chat=-5), "Group:x"))
+    s.log.flush()
+    s.log.close()
+
+    r = BoundedStorage(BOT, ttl=3600, path=path)
+    r.restore()
+    assert run(r.get_state(key(1))) == "Reserve:qty"
+    assert run(r.get_data(key(1))) == {"offer_id": "o1"}
+    assert run(r.get_state(key(2))) is None
+    assert run(r.get_state(key(3, chat=-5))) == "Group:x"
+    r.log.close()
+
+    clock[0] += 3600 + 2 * s.step
+    late = BoundedStorage(BOT, ttl=3600, path=path)
+    late.restore()  # всё истекло, пока процесс лежал
+    assert late.size == 0
+    late.log.close()
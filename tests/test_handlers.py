@@ -0,0 +1,49 @@
+import asyncio
+from aiogram.types import Message
+from foody_bot.handlers import start_with_arg
+from foody_bot.restaurants import Restaurant, RestaurantLookupError, RestaurantResolver
+
+def message(text: str) -> Message:
+    return Message.model_validate({
+        "message_id": 1, "date": 0, "text": text,
+        "chat": {"id": 5, "type": "private"},
+        "from": {"id": 5, "is_bot": False, "first_name": "A"},
+    })
+
+def resolver(loader) -> RestaurantResolver:
+    return RestaurantResolver(loader=loader)
+
+def start(rid: str, restaurants: RestaurantResolver):
+    return asyncio.run(start_with_arg(message(f"/start {rid}"), "url", restaurants, rid))
+
+def urls(method) -> list[str]:
+    return [b.url for row in method.reply_markup.inline_keyboard for b in row]
+
+async def known(rid):
+    return Restaurant(rid, "Пекарня <Б&Б>") if rid == "r1" else None
+
+async def down(rid):
+    raise ConnectionError("backend down")
+
+def test_found_restaurant_link_keeps_rid():
+    method = start("r1", resolver(known))
+    assert "Пекарня &lt;Б&amp;Б&gt;" in method.text
+    assert any("rid=r1" in u for u in urls(method))
+
+def test_not_found_rid_is_not_passed_to_the_link():
+    method = start("gone", resolver(known))
+    assert "не найдена" in method.text
+    assert not any("rid=" in u for u in urls(method))
+
+def test_invalid_rid_is_not_passed_to_the_link():
+    method = start("bad rid!", resolver(known))
+    assert "не найдена" in method.text
+    assert not any("rid=" in u for u in urls(method))
+
+def test_backend_failure_falls_back_to_unchecked_rid():
+    r = resolver(down)
+    method = start("r2", r)
+    assert "не найдена" not in method.text
+    assert any("rid=r2" in u for u in urls(method))
+    assert r.errors == 1
+    assert isinstance(r.cache.get("r2"), RestaurantLookupError)
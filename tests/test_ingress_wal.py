@@ -0,0 +1,142 @@
+import asyncio, os
+from types import SimpleNamespace
+from foody_bot.core import BotCore
+from foody_bot.ingress_wal import IngressWAL, read_segment, HEADER
+
+def raw(i: int) -> bytes:
+    return b'{"update_id": %d, "message": {"text": "%s"}}' % (i, b"x" * 200)
+
+def segments(path) -> list[str]:
+    return sorted(f for f in os.listdir(path) if f.endswith(".wal"))
+
+async def write(path, n: int, done=(), close=True, **opts) -> IngressWAL:
+    wal = IngressWAL(str(path), **opts)
+    wal.start()
+    seqs = await asyncio.gather(*(wal.append(raw(i)) for i in range(1, n + 1)))
+    for seq in seqs:
+        if seq in done:
+            wal.done(seq)
+    if close:
+        await wal.close()
+    return wal
+
+def reopen(path, **opts) -> tuple[IngressWAL, list]:
+    wal = IngressWAL(str(path), **opts)
+    return wal, wal.open()
+
+def test_replays_only_unfinished_updates_in_order(tmp_path):
+    asyncio.run(write(tmp_path, 10, done={2, 3, 7}))
+    wal, pending = reopen(tmp_path)
+    assert [seq for seq, _ in pending] == [1, 4, 5, 6, 8, 9, 10]
+    assert pending[0][1] == raw(1)
+    assert wal.replayed == 7
+    assert wal.seq == 10  # новые seq продолжают старые
+    wal._f.close()
+
+def test_replay_after_crash_without_close(tmp_path):
+    async def crash():
+        wal = await write(tmp_path, 5, done={1}, close=False)
+        # отметка done ушла бы с ближайшей пачкой — процесс упал раньше, файл не закрыт штатно
+        wal._f.close()
+    asyncio.run(crash())
+    _, pending = reopen(tmp_path)
+    assert [seq for seq, _ in pending] == [1, 2, 3, 4, 5]
+
+def test_torn_tail_is_ignored(tmp_path):
+    asyncio.run(write(tmp_path, 3))
+    seg = os.path.join(tmp_path, segments(tmp_path)[-1])
+    with open(seg, "ab") as f:
+        f.write(HEADER.pack(1, 4, 1000, 0) + b"half a reco")  # запись оборвалась посреди тела
+    assert [seq for _, seq, _ in read_segment(seg)] == [1, 2, 3]
+    _, pending = reopen(tmp_path)
+    assert [seq for seq, _ in pending] == [1, 2, 3]
+
+def test_processed_updates_are_not_replayed_twice(tmp_path):
+    async def replay_and_finish():
+        wal, pending = reopen(tmp_path)
+        wal.start()
+        for seq, _ in pending:
+            wal.done(seq)
+        await wal.close()
+    asyncio.run(write(tmp_path, 4))
+    asyncio.run(replay_and_finish())
+    _, pending = reopen(tmp_path)
+    assert pending == []
+
+def test_segments_trimmed_from_head_only(tmp_path):
+    small = {"segment_mb": 1 / 1024, "batch": 2}  # ~1 КиБ: несколько апдейтов на сегмент
+    asyncio.run(write(tmp_path, 20, done=set(range(1, 21)) - {12}, **small))
+    # 12 не обработан: его сегмент и все более новые остаются, более старые удалены
+    wal, pending = reopen(tmp_path, **small)
+    assert [seq for seq, _ in pending] == [12]
+    first = min(int(name[:-4]) for name in segments(tmp_path))
+    assert first == wal._seg_of[12]
+    assert all(n >= first for n in wal._segments)
+
+    async def finish():
+        wal.start()
+        wal.done(12)
+        await wal.close()
+    asyncio.run(finish())
+    assert len(segments(tmp_path)) == 1  # остался только текущий сегмент
+
+def test_cancelled_processing_stays_in_journal(tmp_path):
+    """drain() по таймауту отменяет занятые воркеры — их апдейты должны проиграться при следующем старте."""
+    started = None
+
+    async def feed_update(bot, update):
+        started.set()
+        await asyncio.sleep(60)
+
+    async def main():
+        nonlocal started
+        started = asyncio.Event()
+        wal = IngressWAL(str(tmp_path))
+        wal.start()
+        core = SimpleNamespace(dp=SimpleNamespace(feed_update=feed_update), bot=None, wal=wal)
+        seq_ok = await wal.append(raw(1))
+        seq_busy = await wal.append(raw(2))
+
+        async def quick(bot, update):
+            return None
+        core.dp.feed_update = quick
+        await BotCore.process_update(core, {"update_id": 1}, None, seq_ok)
+        core.dp.feed_update = feed_update
+        task = asyncio.create_task(BotCore.process_update(core, {"update_id": 2}, None, seq_busy))
+        await started.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await wal.close()
+
+    asyncio.run(main())
+    _, pending = reopen(tmp_path)
+    assert [seq for seq, _ in pending] == [2]
+
+def test_failed_write_does_not_hide_later_records(tmp_path):
+    async def main():
+        wal = IngressWAL(str(tmp_path), fsync=False)
+        wal.start()
+        first = await wal.append(raw(1))
+        write = wal._write
+
+        def torn(data):
+            wal._f.write(data[:len(data) // 2])  # диск кончился посреди пачки
+            wal._f.flush()
+            raise OSError(28, "No space left on device")
+        wal._write = torn
+        try:
+            await wal.append(raw(2))
+        except OSError:
+            pass
+        else:
+            raise AssertionError("append must fail")
+        wal._write = write
+        later = await wal.append(raw(3))
+        wal.done(first)
+        await wal.close()
+        return later
+
+    later = asyncio.run(main())
+    assert segments(tmp_path) == ["0000000001.wal"]
+    _, pending = reopen(tmp_path)
+    assert pending == [(later, raw(3))]
@@ -0,0 +1,40 @@
+import asyncio, logging
+from foody_bot import logs
+from foody_bot.logs import BoundedQueueHandler, SampleFilter, sample_update
+
+def record(level=logging.INFO, msg="x") -> logging.LogRecord:
+    return logging.LogRecord("foody_bot.updates", level, "", 0, msg, (), None)
+
+def test_full_queue_never_blocks_and_warnings_evict_oldest():
+    h = BoundedQueueHandler(2)
+    h.enqueue(record(msg="a"))
+    h.enqueue(record(msg="b"))
+    h.enqueue(record(msg="c"))  # INFO в полную очередь — выброшена
+    h.enqueue(record(logging.ERROR, "err"))  # вытесняет самую старую
+    assert [h.queue.get_nowait().msg for _ in range(2)] == ["b", "err"]
+    assert h.dropped == 2
+
+def test_sampling_is_decided_once_per_update():
+    f = SampleFilter(0.5)
+
+    async def lines(uid: int) -> list[bool]:
+        sample_update(uid)
+        return [f.filter(record()) for _ in range(20)]
+
+    decisions = []
+    for uid in range(1, 201):
+        kept = asyncio.run(lines(uid))
+        assert len(set(kept)) == 1
+        decisions.append(kept[0])
+        assert asyncio.run(lines(uid)) == kept  # в другой задаче — то же решение
+    assert 60 < sum(decisions) < 140
+    sample_update(None)
+    assert f.filter(record(logging.WARNING))
+
+def test_dispatcher_middleware_marks_the_update():
+    async def handler(update, data):
+        return logs._update_id.get()
+
+    class Update:
+        update_id = 77
+    assert asyncio.run(logs.sample_middleware(handler, Update(), {})) == 77
@@ -0,0 +1,33 @@
+from foody_bot.nearby import NearbyIndex, Offer, COMPACT_MIN
+from foody_bot.restaurants import Restaurant
+
+NOW = 1_700_000_000.0
+
+def index() -> NearbyIndex:
+    idx = NearbyIndex()
+    idx.upsert_restaurant(Restaurant("r1", "Пекарня", lat=55.75, lng=37.61))
+    return idx
+
+def offer(oid: str, qty: int = 5, expires: float = NOW + 3600) -> Offer:
+    return Offer(oid, "r1", "Набор", 30000, qty, expires)
+
+def test_qty_updates_do_not_grow_the_expiry_heap():
+    idx = index()
+    for qty in range(10, 0, -1):
+        idx.upsert_offer(offer("o1", qty), NOW)
+    assert len(idx._expiry) == 1
+    assert idx.offer("o1").qty_left == 1
+    idx.upsert_offer(offer("o1", 1, NOW + 7200), NOW)  # продлили — новая запись, старая устареет
+    assert idx.expire(NOW + 3600) == 0
+    assert idx.offer("o1") is not None
+
+def test_heap_is_compacted_when_mostly_stale():
+    idx = index()
+    idx.upsert_offer(offer("keep"), NOW)
+    for i in range(10 * COMPACT_MIN):
+        idx.upsert_offer(offer(f"o{i}"), NOW)
+        idx.remove_offer(f"o{i}")
+    assert idx.compactions > 0
+    assert len(idx._expiry) <= 2 * len(idx._offer_rid) + COMPACT_MIN
+    assert idx.expire(NOW + 3600) == 1
+    assert idx.offers == {}
@@ -0,0 +1,58 @@
+import asyncio, hashlib
+from types import SimpleNamespace
+from aiogram.methods import SendDocument, SendMessage
+from aiogram.types import Message
+from foody_bot.offer_docs import OfferDocs, OfferDoc
+
+DOCS = (OfferDoc("A", "a.pdf"), OfferDoc("B", "b.pdf"), OfferDoc("C", "c.xlsx"))
+
+class FakeBot:
+    id = 42
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.sent: list[str] = []
+
+    async def send_document(self, chat_id, document, caption=None):
+        if self.fail and not isinstance(document, str):
+            raise ConnectionError("upload failed")
+        self.sent.append(caption)
+        return SimpleNamespace(document=SimpleNamespace(file_id=f"id-{caption}"))
+
+    async def __call__(self, method):
+        self.sent.append(method.caption)
+
+def docs(bot: FakeBot, known: set[int]) -> OfferDocs:
+    d = OfferDocs(bot, docs=DOCS, path="", source_dir="", upload_chat="")
+    for i, doc in enumerate(DOCS):
+        data = doc.filename.encode()
+        d.hashes[i] = h = hashlib.sha256(data).hexdigest()
+        if i in known:
+            d.file_ids[h] = f"id-{doc.caption}"
+        else:
+            d._data[h] = data
+    return d
+
+def message(bot: FakeBot) -> Message:
+    return Message.model_validate({"message_id": 1, "date": 0, "chat": {"id": 5, "type": "private"}},
+                                  context={"bot": bot})
+
+def test_documents_keep_offer_docs_order_while_uploading():
+    bot = FakeBot()
+    d = docs(bot, known={0, 2})
+    assert asyncio.run(d.answer(message(bot))) is None
+    assert bot.sent == ["A", "B", "C"]
+    assert d.uploads == 1 and d.sent_by_id == 2
+
+    bot.sent.clear()
+    method = asyncio.run(d.answer(message(bot)))  # теперь всё по file_id — последний документ уходит хендлеру
+    assert isinstance(method, SendDocument) and method.document == "id-C"
+    assert bot.sent == ["A", "B"]
+
+def test_failed_upload_falls_back_to_url_buttons():
+    bot = FakeBot(fail=True)
+    d = docs(bot, known={0})
+    method = asyncio.run(d.answer(message(bot)))
+    assert isinstance(method, SendMessage)
+    assert len(method.reply_markup.inline_keyboard) == len(DOCS)
+    assert d.uploads == 0
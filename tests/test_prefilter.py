@@ -0,0 +1,49 @@
+from aiogram import Dispatcher, F, Router
+from aiogram.filters import StateFilter
+from foody_bot.command_router import CommandRouter
+from foody_bot.fast_json import UpdatePrefilter
+
+async def handler(m):
+    pass
+
+def msg(**fields) -> dict:
+    return {"update_id": 1, "message": {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}, **fields}}
+
+def dispatcher(*routers) -> Dispatcher:
+    dp = Dispatcher()
+    commands = CommandRouter(name="commands")
+    commands.command("start", words=("start",))(handler)
+    commands.command("offer")(handler)
+    commands.message(F.location)(handler)
+    dp.include_router(commands)
+    for r in routers:
+        dp.include_router(r)
+    return dp
+
+def test_commands_words_and_fields_come_from_handlers():
+    p = UpdatePrefilter.for_dispatcher(dispatcher())
+    assert p(msg(text="/offer"))
+    assert p(msg(text="/unknown"))  # незнакомая команда — ответит сам бот, дешевле не угадывать
+    assert p(msg(text="start"))
+    assert p(msg(location={"latitude": 55.7, "longitude": 37.6}))
+    assert not p(msg(text="привет"))
+    assert not p(msg(sticker={"file_id": "x"}))
+    assert not p({"update_id": 2, "poll": {}})
+
+def test_field_filter_with_state_still_narrows():
+    r = Router()
+    r.message(F.contact, StateFilter("Reserve:phone"))(handler)
+    p = UpdatePrefilter.for_dispatcher(dispatcher(r))
+    assert p(msg(contact={"phone_number": "1", "first_name": "A"}))
+    assert not p(msg(text="привет"))
+
+def test_text_or_state_handlers_disable_narrowing():
+    for register in (lambda r: r.message()(handler),
+                     lambda r: r.message(StateFilter("Reserve:qty"))(handler),
+                     lambda r: r.message(F.text)(handler),
+                     lambda r: r.message(F.text.startswith("#"))(handler)):
+        r = Router()
+        register(r)
+        p = UpdatePrefilter.for_dispatcher(dispatcher(r))
+        assert p(msg(text="привет"))
+        assert p(msg(sticker={"file_id": "x"}))
@@ -0,0 +1,61 @@
+import random
+import pytest
+from foody_bot.nudges import TimingWheel
+
+def run(wheel: TimingWheel, until: int) -> dict:
+    """Тик за тиком до until; → ключ → тик срабатывания."""
+    fired = {}
+    for t in range(wheel.current + 1, until + 1):
+        for key in wheel.advance(t):
+            assert key not in fired
+            fired[key] = t
+    return fired
+
+def test_fires_exactly_on_deadline_across_levels():
+    w = TimingWheel(tick=1, now=0)
+    rnd = random.Random(7)
+    deadlines = {k: rnd.randint(1, 70_000) for k in range(3000)}
+    for k, d in deadlines.items():
+        w.add(k, d)
+    assert run(w, 70_000) == deadlines
+    assert len(w) == 0
+
+@pytest.mark.parametrize("deadline", [256, 512, 65536, 65536 + 256, 3 * 65536])
+def test_deadline_on_cascade_tick_is_not_late(deadline):
+    w = TimingWheel(tick=1, now=0)
+    w.add("k", deadline)
+    assert run(w, deadline + 1) == {"k": deadline}
+
+def test_deadline_on_cascade_tick_with_advance_in_one_jump():
+    w = TimingWheel(tick=1, now=0)
+    w.add("a", 256)
+    w.add("b", 257)
+    assert w.advance(256) == ["a"]
+    assert w.advance(257) == ["b"]
+
+def test_overdue_timer_fires_on_next_tick():
+    w = TimingWheel(tick=1, now=100)
+    w.add("late", 50)
+    assert w.advance(100) == []
+    assert w.advance(101) == ["late"]
+
+def test_cancel_and_rearm():
+    w = TimingWheel(tick=1, now=0)
+    w.add("a", 10)
+    w.add("b", 300)
+    assert w.cancel("a")
+    assert not w.cancel("a")
+    w.add("b", 20)  # тот же ключ — перевзвод, не второй таймер
+    assert len(w) == 1
+    assert run(w, 400) == {"b": 20}
+
+def test_tick_length_rounds_deadline_up():
+    w = TimingWheel(tick=2, now=0)
+    w.add("k", 5)  # срок 5 с при тике 2 с — тик 3 (6 с), не раньше срока
+    assert w.advance(4) == []
+    assert w.advance(6) == ["k"]
+
+def test_beyond_horizon_still_fires_on_time():
+    w = TimingWheel(tick=1, now=0, levels=2, bits=4)  # горизонт 256 тиков
+    w.add("far", 1000)
+    assert run(w, 1001) == {"far": 1000}